@@ -0,0 +1,5 @@
+"""
+Benchmarks do G5 Futebol System
+-------------------------------
+Suíte de performance dos hot paths de serviços e analytics (ver benchmarks/suite.py).
+"""
@@ -0,0 +1,216 @@
+"""
+Suíte de Benchmarks (Services & Analytics)
+------------------------------------------
+Semeia bancos SQLite de vários tamanhos (múltiplos de uma temporada de todas as categorias)
+com o gerador sintético e cronometra os hot paths do app. Os resultados vão para um JSON e
+são comparados com um baseline salvo para detectar regressões antes do deploy.
+
+Uso:
+    python manage.py bench                              # escalas 1x e 10x
+    python manage.py bench --escalas 1 10 100 --saida bench.json
+    python manage.py bench --salvar-baseline            # grava benchmarks/baseline.json
+"""
+
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from config import CURRENT_YEAR
+from modules.database import Base
+from modules.services import AtletaService, TreinoService, AgregadoService, RankingService
+from modules.analytics import AnalyticsEngine
+from modules.cache import df_cache
+from modules.utils import gerar_dados_sinteticos
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DIR_BANCOS = os.path.join(tempfile.gettempdir(), "g5_bench")
+ATLETAS_POR_CATEGORIA = 25
+CATEGORIA = "Sub 14"
+
+
+def preparar_banco(escala: int, seed: int = 42):
+    """
+    Retorna um engine para o banco da escala (N temporadas de todas as categorias).
+    Bancos já semeados são reaproveitados entre execuções.
+    """
+    import modules.models  # noqa: F401 (registra os models no Base)
+    # Impressão digital do schema (colunas + índices) no nome: bancos de versões antigas não são reaproveitados
+    schema = "|".join(
+        f"{t.name}:{','.join(c.name for c in t.columns)}:{','.join(sorted(i.name for i in t.indexes))}"
+        for t in Base.metadata.sorted_tables
+    )
+    assinatura = hashlib.sha1(schema.encode()).hexdigest()[:8]
+    os.makedirs(DIR_BANCOS, exist_ok=True)
+    caminho = os.path.join(DIR_BANCOS, f"bench_{escala}x_s{seed}_{assinatura}.db")
+    novo = not os.path.exists(caminho)
+    engine = create_engine(f"sqlite:///{caminho}")
+    if novo:
+        Base.metadata.create_all(bind=engine)
+        temporadas = range(CURRENT_YEAR - escala + 1, CURRENT_YEAR + 1)
+        try:
+            gerar_dados_sinteticos(ATLETAS_POR_CATEGORIA, temporadas=temporadas, seed=seed, engine=engine)
+        except BaseException:
+            engine.dispose()
+            os.remove(caminho)
+            raise
+    return engine
+
+
+def cronometrar(fn, repeticoes: int, preparar=None) -> dict:
+    """Executa `fn` N vezes (com `preparar()` antes de cada uma, fora do tempo) e retorna ms"""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "min_ms": round(min(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+    }
+
+
+def medir_escala(escala: int, repeticoes: int, seed: int = 42) -> dict:
+    """Cronometra todos os hot paths em um banco da escala informada"""
+    engine = preparar_banco(escala, seed)
+    db = Session(bind=engine)
+    try:
+        atleta_service = AtletaService(db)
+        treino_service = TreinoService(db)
+        agregado_service = AgregadoService(db)
+        analytics = AnalyticsEngine()
+
+        df = treino_service.get_dataframe_performances(CATEGORIA)
+        stats = agregado_service.estatisticas_categoria(CATEGORIA)
+        atleta_nome, atleta_id = stats['atleta'].iloc[0], int(stats['atleta_id'].iloc[0])
+
+        def salvar_matriz():
+            matriz = treino_service.carregar_matriz_mes(CATEGORIA, CURRENT_YEAR, 1)
+            perf = matriz["perf"].copy()
+            # Alterna 10 células (em dias com treino) entre "2" e "3": sempre há diff real e o banco não cresce
+            cols = [f"{d.day}" for d in sorted(matriz["treinos"])]
+            for i in range(min(10, len(perf), len(cols))):
+                perf.loc[i, cols[i]] = "3" if perf.loc[i, cols[i]] == "2" else "2"
+            treino_service.salvar_matriz_mes(CATEGORIA, matriz, matriz["tipos"], perf)
+
+        resultados = {
+            "filtrar_por_categoria": cronometrar(lambda: atleta_service.filtrar_por_categoria(CATEGORIA), repeticoes),
+            "get_dataframe_performances (frio)": cronometrar(
+                lambda: treino_service.get_dataframe_performances(CATEGORIA), repeticoes, preparar=df_cache.invalidar),
+            "get_dataframe_performances (histórico)": cronometrar(
+                lambda: treino_service.get_dataframe_performances(CATEGORIA, temporadas=range(CURRENT_YEAR - escala + 1, CURRENT_YEAR + 1)),
+                repeticoes, preparar=df_cache.invalidar),
+            "get_dataframe_performances (cache)": cronometrar(
+                lambda: treino_service.get_dataframe_performances(CATEGORIA), repeticoes),
+            "carregar_matriz_mes": cronometrar(
+                lambda: treino_service.carregar_matriz_mes(CATEGORIA, CURRENT_YEAR, 1), repeticoes),
+            "salvar_matriz_mes": cronometrar(salvar_matriz, repeticoes),
+            "serie_media_categoria (temporada)": cronometrar(
+                lambda: treino_service.serie_media_categoria(CATEGORIA), repeticoes),
+            "serie_media_categoria (histórico)": cronometrar(
+                lambda: treino_service.serie_media_categoria(CATEGORIA, datetime.date(CURRENT_YEAR - escala + 1, 1, 1)), repeticoes),
+            "gerar_ranking_evolucao": cronometrar(lambda: analytics.gerar_ranking_evolucao(df), repeticoes),
+            "ranking_de_agregados": cronometrar(
+                lambda: analytics.ranking_de_agregados(agregado_service.estatisticas_categoria(CATEGORIA)), repeticoes),
+            "leaderboard (clube)": cronometrar(lambda: RankingService(db).leaderboard(), repeticoes),
+            "alertas_criticos": cronometrar(lambda: analytics.alertas_criticos(df), repeticoes),
+            "calcular_kpis_atleta": cronometrar(lambda: analytics.calcular_kpis_atleta(df, atleta_nome), repeticoes),
+            "kpis_categoria": cronometrar(lambda: analytics.kpis_categoria(df), repeticoes),
+            "kpis_de_agregados": cronometrar(
+                lambda: analytics.kpis_de_agregados(agregado_service.estatisticas_categoria(CATEGORIA), atleta_id), repeticoes),
+        }
+        return {"linhas_categoria": len(df), "operacoes": resultados}
+    finally:
+        db.close()
+        engine.dispose()
+        df_cache.invalidar()
+
+
+def executar(escalas, repeticoes: int = 5, seed: int = 42) -> dict:
+    """Roda a suíte em todas as escalas e retorna o relatório completo"""
+    relatorio = {
+        "meta": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "repeticoes": repeticoes,
+            "seed": seed,
+        },
+        "escalas": {},
+    }
+    for escala in escalas:
+        print(f"[bench] escala {escala}x ...", flush=True)
+        relatorio["escalas"][f"{escala}x"] = medir_escala(escala, repeticoes, seed)
+    return relatorio
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float = 0.25, piso_ms: float = 1.0) -> list:
+    """
+    Compara medianas com o baseline. Uma operação regrediu se ficou mais de `tolerancia`
+    (fração) mais lenta e a diferença absoluta passa de `piso_ms` (ruído de timer).
+    Retorna lista de regressões (escala, operacao, baseline_ms, atual_ms, variacao).
+    """
+    regressoes = []
+    for escala, dados in atual["escalas"].items():
+        base_ops = baseline.get("escalas", {}).get(escala, {}).get("operacoes", {})
+        for op, tempos in dados["operacoes"].items():
+            if op not in base_ops:
+                continue
+            antes, agora = base_ops[op]["mediana_ms"], tempos["mediana_ms"]
+            if agora > antes * (1 + tolerancia) and agora - antes > piso_ms:
+                regressoes.append((escala, op, antes, agora, agora / antes - 1 if antes else float("inf")))
+    return regressoes
+
+
+def imprimir(relatorio: dict, baseline: dict = None):
+    """Tabela de resultados no terminal (com variação vs baseline quando houver)"""
+    for escala, dados in relatorio["escalas"].items():
+        print(f"\n== {escala} ({dados['linhas_categoria']} performances em {CATEGORIA}) ==")
+        base_ops = (baseline or {}).get("escalas", {}).get(escala, {}).get("operacoes", {})
+        for op, tempos in dados["operacoes"].items():
+            linha = f"  {op:<38} {tempos['mediana_ms']:>10.2f} ms"
+            if op in base_ops and base_ops[op]["mediana_ms"]:
+                linha += f"   ({tempos['mediana_ms'] / base_ops[op]['mediana_ms'] - 1:+.0%} vs baseline)"
+            print(linha)
+
+
+def main(escalas=(1, 10), repeticoes=5, seed=42, saida="bench_results.json",
+         baseline=BASELINE_PADRAO, salvar_baseline=False, tolerancia=0.25) -> int:
+    """Executa, grava o JSON, compara com o baseline. Retorna 1 se houver regressão."""
+    relatorio = executar(escalas, repeticoes, seed)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    base = None
+    if os.path.exists(baseline) and not salvar_baseline:
+        with open(baseline, encoding="utf-8") as f:
+            base = json.load(f)
+    imprimir(relatorio, base)
+    print(f"\nResultados em {saida}")
+
+    if salvar_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"Baseline salvo em {baseline}")
+        return 0
+    if base is None:
+        print("Sem baseline para comparar (use --salvar-baseline).")
+        return 0
+
+    regressoes = comparar(relatorio, base, tolerancia)
+    for escala, op, antes, agora, var in regressoes:
+        print(f"REGRESSÃO [{escala}] {op}: {antes:.2f} ms -> {agora:.2f} ms ({var:+.0%})")
+    return 1 if regressoes else 0
@@ -5,13 +5,55 @@ Define constantes globais, paletas de cores e configurações do sistema G5 Fute
 """
 
 import os
-from datetime import datetime
+import tempfile
+from datetime import datetime, date, timedelta
 
 # --- SYSTEM PATHS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_NAME = "g5_system.db"
 DB_PATH = os.path.join(BASE_DIR, DB_NAME)
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+SINTETICO_DB_PATH = os.path.join(BASE_DIR, "g5_sintetico.db") # Destino padrão de `manage.py seed` (fora do banco em uso)
+
+# --- DATABASE ENGINE PROFILES ---
+# Perfil ativo escolhido por variável de ambiente (G5_DB_PROFILE)
+DB_PROFILE = os.environ.get("G5_DB_PROFILE", "concorrente")
+DB_PROFILES = {
+    # Comportamento clássico do SQLite (journal de rollback), um usuário por vez
+    "padrao": {
+        "pragmas": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000},
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+    },
+    # Vários treinadores editando ao mesmo tempo: WAL (leitores não bloqueiam o escritor)
+    "concorrente": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",      # Seguro com WAL, bem mais rápido que FULL
+            "cache_size": -64000,         # ~64 MB de page cache por conexão
+            "mmap_size": 268435456,       # 256 MB de leitura via mmap
+            "temp_store": "MEMORY",
+            "busy_timeout": 10000,        # Espera o lock de escrita em vez de "database is locked"
+        },
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+    },
+    # Cargas em massa (seed/import) fora do horário de uso
+    "bulk": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "cache_size": -256000,
+            "temp_store": "MEMORY",
+            "busy_timeout": 30000,
+        },
+        "pool_size": 2,
+        "max_overflow": 0,
+        "pool_timeout": 60,
+    },
+}
 
 # --- CATEGORIES LOGIC ---
 CURRENT_YEAR = 2026
@@ -25,6 +67,40 @@ CATEGORY_RULES = {
     "Sub 10": [2016],
     "Sub 9":  [2017]
 }
+SEM_CATEGORIA = "Sem Categoria"
+
+def anos_da_categoria(categoria):
+    """Retorna os anos de nascimento que compõem a categoria (lista vazia se não existir)"""
+    return list(CATEGORY_RULES.get(categoria, []))
+
+def categoria_do_ano(ano_nasc):
+    """Retorna a categoria de um ano de nascimento segundo CATEGORY_RULES"""
+    for cat, anos in CATEGORY_RULES.items():
+        if ano_nasc in anos:
+            return cat
+    return SEM_CATEGORIA
+
+# --- SEASONS ---
+# Temporada "quente": as consultas dos serviços leem só a janela dela, salvo pedido explícito
+TEMPORADA_ATUAL = int(os.environ.get("G5_TEMPORADA", CURRENT_YEAR))
+TEMPORADA_MES_INICIO = 1 # Mês em que a temporada começa (1 = ano civil); a temporada leva o ano do início
+# Temporadas encerradas (fechar_temporada) saem do banco principal para este arquivo
+ARQUIVO_DB_PATH = os.environ.get("G5_ARQUIVO_DB", os.path.join(BASE_DIR, "g5_arquivo.db"))
+
+def janela_temporada(temporada=None) -> tuple:
+    """(primeiro dia, último dia) da temporada (padrão: TEMPORADA_ATUAL)"""
+    temporada = TEMPORADA_ATUAL if temporada is None else int(temporada)
+    inicio = date(temporada, TEMPORADA_MES_INICIO, 1)
+    return inicio, date(temporada + 1, TEMPORADA_MES_INICIO, 1) - timedelta(days=1)
+
+def temporada_da_data(dia) -> int:
+    """Temporada a que uma data pertence"""
+    return dia.year if dia.month >= TEMPORADA_MES_INICIO else dia.year - 1
+
+def meses_da_temporada(temporada=None) -> list:
+    """[(ano, mês), ...] da temporada, em ordem"""
+    inicio, _ = janela_temporada(temporada)
+    return [(inicio.year + (inicio.month - 1 + i) // 12, (inicio.month - 1 + i) % 12 + 1) for i in range(12)]
 
 # --- TRAINING TYPES (ROWS) ---
 TRAINING_TYPES = [
@@ -32,6 +108,19 @@ TRAINING_TYPES = [
     "Coletivo", "Amistoso", "Paulista", "Academia",
     "Teste Físico", "Palestra", "Regenerativo"
 ]
+# Treino.tipos_mask: bit i = TRAINING_TYPES[i] (tipos novos só podem ser acrescentados ao final)
+TRAINING_TYPE_BITS = {tipo: 1 << i for i, tipo in enumerate(TRAINING_TYPES)}
+
+def tipos_para_mask(tipos) -> int:
+    """Lista de tipos de treino -> bitmask (tipos desconhecidos são ignorados)"""
+    mask = 0
+    for tipo in tipos:
+        mask |= TRAINING_TYPE_BITS.get(tipo, 0)
+    return mask
+
+def mask_para_tipos(mask: int) -> list:
+    """Bitmask -> lista de tipos, na ordem de TRAINING_TYPES"""
+    return [tipo for tipo, bit in TRAINING_TYPE_BITS.items() if mask & bit]
 
 # --- FLAGS & LEGENDS ---
 LEGEND_ATHLETE = {
@@ -53,6 +142,64 @@ LEGEND_TRAINING = {
 }
 VALID_TRAINING_FLAGS = list(LEGEND_TRAINING.keys())
 
+# --- BACKUP / EXPORT ---
+EXPORT_CHUNK = 5000         # Linhas lidas por bloco (yield_per) no export
+IMPORT_LOTE = 20_000        # Células (performances) por transação na importação de planilhas
+
+# --- PERFIL / BASELINE DA CATEGORIA ---
+BASELINE_JANELA_RECENTE = 5 # Nº de datas de treino mais recentes na "Evolução Recente" da categoria
+
+# --- AGREGADOS MATERIALIZADOS ---
+AGG_ULTIMAS_N = 5           # Nº de notas recentes guardadas por atleta (>= ALERT_JANELA_NOTAS)
+
+# --- PROFILING DE SQL (POR RENDER) ---
+PROFILER_MAX_RELATORIOS = 50   # Renders mantidos em memória para o painel
+PROFILER_TOP_LENTAS = 5        # Queries mais lentas guardadas por render
+PROFILER_N1_LIMIAR = 5         # Mesmo statement repetido >= N vezes (params diferentes) = suspeita N+1
+QUERY_LOG_PATH = os.environ.get("G5_QUERY_LOG") # Log rotativo opcional (JSON por linha)
+
+# --- JOBS EM SEGUNDO PLANO ---
+JOBS_MAX_THREADS = 2        # Workers do pool de threads (export, analytics)
+JOBS_MAX_PROCESSOS = 1      # Workers do pool de processos (cargas pesadas fora do processo do Streamlit)
+JOBS_MAX_RETIDOS = 20       # Jobs finalizados mantidos com resultado (os mais antigos são descartados)
+JOBS_REFRESH_S = 2          # Intervalo de atualização do progresso na UI enquanto há jobs rodando
+JOBS_DIR = os.environ.get("G5_JOBS_DIR", os.path.join(tempfile.gettempdir(), "g5_jobs")) # Arquivos gerados
+
+# --- CACHE DE ANALYTICS ---
+CACHE_MAX_ENTRADAS = 16     # Nº máximo de DataFrames em cache (LRU)
+CACHE_MAX_MB = 256          # Teto de memória do cache
+
+# --- LEITURA COLUNAR (ANALYTICS) ---
+LEITURA_BLOCO = 50_000      # Linhas por fetchmany nos loaders de analytics (memória x nº de chamadas ao cursor)
+
+# --- FOTOS DOS ATLETAS ---
+FOTOS_DIR = os.environ.get("G5_FOTOS_DIR", os.path.join(ASSETS_DIR, "fotos")) # Originais e miniaturas (por hash)
+FOTO_MAX_MB = 10            # Tamanho máximo do arquivo enviado
+FOTO_MINIATURAS = {"lista": 64, "perfil": 256} # Lado (px) das miniaturas quadradas por uso
+FOTO_QUALIDADE = 85         # Qualidade JPEG das miniaturas
+FOTO_CACHE_MAX_MB = 32      # Teto do LRU de miniaturas em memória
+
+# --- RELATÓRIOS MENSAIS (PDF) ---
+RELATORIOS_PROCESSOS = min(4, os.cpu_count() or 1) # Processos que renderizam os PDFs (1 = no próprio processo)
+RELATORIOS_LOTE = 25        # Atletas por tarefa enviada a um processo (menos pickling/IPC por PDF)
+
+# --- KPIs DO ELENCO (ANALYTICS) ---
+KPI_JANELA_FORMA = 5        # Treinos na média móvel da forma recente
+KPI_SPAN_EWM = 5            # Span da média exponencial (mais peso aos treinos recentes)
+KPI_JANELA_TENDENCIA = 10   # Últimos treinos usados na inclinação da tendência (nota por treino)
+
+# --- RANKING (SCORE G5) ---
+RANKING_MIN_NOTAS = 3       # Nº mínimo de treinos com nota para entrar no ranking
+RANKING_TOP_K = 10          # Tamanho do ranking (Top Evolução)
+
+# --- SÉRIES TEMPORAIS (DASHBOARD) ---
+SERIE_MAX_PONTOS = 366      # Teto de pontos por série (1 temporada = diária); períodos maiores viram semana/mês/ano
+
+# --- ALERTAS (ANALYTICS) ---
+ALERT_MIN_FALTAS = 3        # Nº de faltas a partir do qual o atleta entra em alerta
+ALERT_JANELA_NOTAS = 3      # Nº de treinos mais recentes usados na média recente
+ALERT_NOTA_CORTE = 1.8      # Média recente abaixo deste valor gera alerta de performance
+
 # --- UI THEME COLORS (DARK MODE) ---
 class Colors:
     # Cores Principais
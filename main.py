@@ -5,34 +5,39 @@ Interface focada em Dark Mode e Usabilidade Otimizada.
 Updates: Gráfico de Radar (Comparativo) e Exportação Excel.
 """
 
+import time
+_inicio_script = time.perf_counter()
+
+import os
 import streamlit as st
-import pandas as pd
 import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
 
-from config import Colors, CATEGORY_RULES, TRAINING_TYPES, VALID_ATHLETE_FLAGS, VALID_TRAINING_FLAGS, LEGEND_ATHLETE
+from config import Colors, CATEGORY_RULES, VALID_ATHLETE_FLAGS, VALID_TRAINING_FLAGS, LEGEND_ATHLETE, JOBS_REFRESH_S, TEMPORADA_ATUAL, meses_da_temporada, janela_temporada, RANKING_MIN_NOTAS, RANKING_TOP_K
 from modules.database import db_engine
-from modules.services import AtletaService, TreinoService
-from modules.analytics import AnalyticsEngine
-from modules.utils import populate_dummy_data
+from modules.services import AtletaService, TreinoService, AgregadoService, RankingService
+from modules.profiling import query_profiler, tempos_inicializacao
+from modules.jobs import job_manager, FINALIZADOS, CONCLUIDO, ERRO
+# plotly, analytics e pandas (direto) são importados nas páginas que os usam
+
+tempos_inicializacao.iniciar(_inicio_script)
+tempos_inicializacao.registrar("imports", _inicio_script)
 
 # Init DB & Dummy Data
 st.set_page_config(page_title="G5 Futebol Gestão", page_icon="⚽", layout="wide")
-db_engine.init_tables()
 
-if 'populated' not in st.session_state:
-    populate_dummy_data()
-    st.session_state.populated = True
 
-if 'db' not in st.session_state:
-    st.session_state.db = next(db_engine.get_db())
+@st.cache_resource(show_spinner=False)
+def inicializar_app():
+    """Uma vez por processo (não por sessão nem por rerun): schema/migrações e dados de demonstração"""
+    with tempos_inicializacao.etapa("init: banco (create_all + migrações)"):
+        db_engine.init_tables()
+    with tempos_inicializacao.etapa("init: dados de demonstração"):
+        from modules.utils import populate_dummy_data
+        populate_dummy_data()
+    return True
 
-db = st.session_state.db
-atleta_service = AtletaService(db)
-treino_service = TreinoService(db)
-analytics = AnalyticsEngine()
+
+inicializar_app()
 
 # --- CSS DARK MODE OTIMIZADO ---
 st.markdown(f"""
@@ -69,119 +74,177 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # --- SIDEBAR ---
-with st.sidebar:
-    st.image("https://img.icons8.com/color/96/football2--v1.png", width=50)
-    st.title("G5 Gestão")
-    st.success("Sistema Online")
-    st.markdown("---")
-    menu = st.radio("Menu Principal", ["Dashboard", "Gestão de Treinos (Matriz)", "Perfil Atleta", "Configurações"], index=0)
-
-    st.markdown("---")
-    # Export Button (Backup)
-    st.markdown("### 💾 Backup")
-    if st.button("Gerar Export Excel"):
-        # Export logic
-        output = BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        
-        # Dump Atletas
-        atl_df = pd.DataFrame([vars(a) for a in atleta_service.listar_atletas()])
-        if not atl_df.empty:
-            atl_df.drop(columns=['_sa_instance_state'], errors='ignore').to_excel(writer, sheet_name='Atletas', index=False)
-            
-        # Dump Treinos (brute force all active cats)
-        # (Simplificacao: exporta SO da categoria atual selecionada na session ou nada se for complexo,
-        #  aqui vamos exportar Atletas apenas como demo rápido ou Performance RAW)
-        writer.close()
-        processed_data = output.getvalue()
-        
-        st.download_button(
-            label="Baixar Excel (.xlsx)",
-            data=processed_data,
-            file_name=f"G5_Backup_{datetime.date.today()}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+def render_sidebar(db):
+    """Sidebar: menu principal e backup. Retorna a página selecionada."""
+    with st.sidebar:
+        st.image("https://img.icons8.com/color/96/football2--v1.png", width=50)
+        st.title("G5 Gestão")
+        st.success("Sistema Online")
+        st.markdown("---")
+        menu = st.radio("Menu Principal", list(PAGINAS.keys()), index=0)
 
-# --- CONTROLLER ---
+        st.markdown("---")
+        # Export Button (Backup) - gerado em segundo plano, o download aparece ao concluir
+        st.markdown("### 💾 Backup")
+        job = job_manager.job(st.session_state.get("job_export"))
+        if job is None or job.status in FINALIZADOS:
+            if st.button("Gerar Export Excel"):
+                from modules.jobs import tarefa_export_excel
+                st.session_state.job_export = job_manager.submeter("Export Excel", tarefa_export_excel)
+                st.rerun()
+        if job is not None:
+            if job.status == CONCLUIDO and os.path.exists(job.resultado["arquivo"]):
+                with open(job.resultado["arquivo"], "rb") as f:
+                    st.download_button(
+                        label="Baixar Excel (.xlsx)",
+                        data=f,
+                        file_name=f"G5_Backup_{datetime.date.fromtimestamp(job.finalizado)}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    )
+            elif job.status == ERRO:
+                st.error(f"Falha no export: {job.erro}")
+            elif job.status not in FINALIZADOS:
+                render_progresso_jobs([job.id])
+
+    return menu
+
+# --- JOBS (SEGUNDO PLANO) ---
+def _progresso_jobs(ids):
+    """Progresso e cancelamento dos jobs em andamento; ao terminarem, dispara um rerun completo"""
+    ativos = [j for j in map(job_manager.job, ids) if j is not None and j.status not in FINALIZADOS]
+    if not ativos:
+        st.rerun()
+    for job in ativos:
+        st.progress(job.progresso, text=f"{job.nome}: {job.mensagem or job.status}")
+        if st.button("Cancelar", key=f"cancelar_{job.id}"):
+            job_manager.cancelar(job.id)
+
+def render_progresso_jobs(ids):
+    """Fragmento auto-atualizado (JOBS_REFRESH_S) só enquanto houver job rodando"""
+    if any(j is not None and j.status not in FINALIZADOS for j in map(job_manager.job, ids)):
+        st.fragment(_progresso_jobs, run_every=JOBS_REFRESH_S)(ids)
+
+# --- PÁGINAS ---
+
+def pagina_dashboard(db):
+    import plotly.express as px
+    from modules.analytics import AnalyticsEngine
 
-if menu == "Dashboard":
+    analytics = AnalyticsEngine()
+    atleta_service = AtletaService(db)
+    treino_service = TreinoService(db)
+    agregado_service = AgregadoService(db)
     st.title("📊 Dashboard")
+    st.caption(f"Temporada {TEMPORADA_ATUAL}")
     cat = st.selectbox("Categoria", list(CATEGORY_RULES.keys()), index=2)
     df = treino_service.get_dataframe_performances(cat)
-    
+    # Período livre (inclusive temporadas arquivadas) do gráfico de evolução e do ranking do clube,
+    # que não dependem de a categoria ter dados na temporada
+    padrao = janela_temporada()
+    primeira, ultima = treino_service.intervalo_datas()
+    periodo = st.date_input("Período", value=padrao, min_value=min(primeira or padrao[0], padrao[0]),
+                            max_value=max(ultima or padrao[1], padrao[1]), format="DD/MM/YYYY")
+    inicio, fim = periodo if len(periodo) == 2 else padrao
+
     if df.empty:
         st.info("Sem dados.")
     else:
+        resumo = agregado_service.resumo_categoria(cat)
         c1, c2, c3 = st.columns(3)
-        c1.metric("Treinos", df['data'].nunique())
-        c2.metric("Média Nota", f"{df['nota'].mean():.2f}")
-        c3.metric("Frequência", f"{(len(df[df['presenca']=='P'])/len(df))*100:.0f}%")
+        c1.metric("Treinos", resumo["treinos"])
+        c2.metric("Média Nota", f"{resumo['media']:.2f}")
+        c3.metric("Frequência", f"{resumo['frequencia']:.0f}%")
         
         st.divider()
         col_chart, col_rank = st.columns([2, 1])
         
         with col_chart:
             st.subheader("📈 Evolução da Média da Categoria")
-            daily = df.groupby('data')['nota'].mean().reset_index()
-            fig = px.line(daily, x='data', y='nota', markers=True, template="plotly_dark")
+            # A granularidade acompanha o tamanho do intervalo
+            serie = treino_service.serie_media_categoria(cat, inicio, fim)
+            fig = px.line(serie["serie"], x='periodo', y='media', markers=True, template="plotly_dark",
+                          labels={"periodo": "Período", "media": "Média"}, hover_data=["notas"])
+            st.caption(f"Média por {serie['granularidade']} ({len(serie['serie'])} pontos)")
             fig.update_traces(line_color=Colors.PRIMARY)
             fig.update_layout(yaxis_range=[0.5, 3.5])
             st.plotly_chart(fig, use_container_width=True)
             
         with col_rank:
             st.subheader("🏆 Ranking")
-            rank = analytics.gerar_ranking_evolucao(df)
+            rank = analytics.ranking_de_agregados(agregado_service.estatisticas_categoria(cat))
             st.dataframe(rank[['atleta', 'Score G5']].head(5), use_container_width=True, hide_index=True)
 
+        st.subheader("📋 KPIs do Elenco (por tendência)")
+        kpis = analytics.kpis_categoria(df)
+        # Miniaturas do LRU de fotos (não decodifica os originais a cada rerun)
+        from modules.fotos import foto_store
+        fotos = atleta_service.fotos(kpis['atleta_id'])
+        kpis.insert(0, 'foto', [foto_store.data_uri(fotos.get(int(i))) for i in kpis['atleta_id']])
+        st.dataframe(kpis.drop(columns=['atleta_id']), use_container_width=True, hide_index=True, column_config={
+            "foto": st.column_config.ImageColumn("Foto", width="small"),
+            "atleta": "Atleta",
+            "treinos": "Treinos",
+            "frequencia": st.column_config.ProgressColumn("Frequência (%)", format="%.0f%%", min_value=0, max_value=100),
+            "media": st.column_config.NumberColumn("Média", format="%.2f"),
+            "forma_movel": st.column_config.NumberColumn("Forma (móvel)", format="%.2f"),
+            "forma_ewm": st.column_config.NumberColumn("Forma (exp.)", format="%.2f"),
+            "tendencia": st.column_config.NumberColumn("Tendência (nota/treino)", format="%+.3f"),
+        })
+
+        st.subheader("🗂️ Sessões por Tipo na Temporada")
+        por_tipo = treino_service.contagem_por_tipo(categoria=cat)
+        if not por_tipo.empty:
+            fig_tipos = px.bar(x=por_tipo.columns, y=por_tipo.iloc[0].to_numpy(), labels={"x": "Tipo", "y": "Sessões"},
+                               template="plotly_dark")
+            fig_tipos.update_traces(marker_color=Colors.SECONDARY)
+            st.plotly_chart(fig_tipos, use_container_width=True)
+
+    # Todas as categorias em uma consulta, no mesmo período do gráfico de evolução
+    st.subheader("🏅 Top Evolução do Clube")
+    r1, r2, r3 = st.columns(3)
+    top_k = r1.number_input("Top", 1, 100, RANKING_TOP_K)
+    min_notas = r2.number_input("Mínimo de treinos com nota", 1, 500, RANKING_MIN_NOTAS)
+    por_categoria = r3.toggle("Top por categoria")
+    ranking = RankingService(db).leaderboard(inicio, fim, min_notas=int(min_notas), top_k=int(top_k),
+                                             por_categoria=por_categoria)
+    st.dataframe(ranking.drop(columns=['atleta_id']), use_container_width=True, hide_index=True, column_config={
+        "atleta": "Atleta",
+        "categoria": "Categoria",
+        "treinos": "Treinos",
+        "notas": "Notas",
+        "frequencia": st.column_config.NumberColumn("Frequência (%)", format="%.0f%%"),
+        "media": st.column_config.NumberColumn("Média", format="%.2f"),
+        "desvio": st.column_config.NumberColumn("Desvio", format="%.2f"),
+        "score": st.column_config.NumberColumn("Score G5", format="%.3f"),
+        "pos_categoria": "Pos. Categoria",
+        "pos_geral": "Pos. Clube",
+        "percentil_categoria": st.column_config.NumberColumn("Percentil Cat.", format="%.0f"),
+        "percentil_geral": st.column_config.NumberColumn("Percentil Clube", format="%.0f"),
+    })
 
-elif menu == "Gestão de Treinos (Matriz)":
+
+def pagina_matriz(db):
+    treino_service = TreinoService(db)
     st.title("📅 Gestão de Treinos")
     
     # Filtros
-    c1, c2 = st.columns([2, 1])
+    c1, c2, c3 = st.columns([2, 1, 1])
     sel_cat = c1.selectbox("Categoria", list(CATEGORY_RULES.keys()), index=2)
-    sel_mes = c2.selectbox("Mês", range(1, 13), index=0)
-    
-    import calendar
-    _, num_days = calendar.monthrange(2026, sel_mes)
-    days = [datetime.date(2026, sel_mes, d) for d in range(1, num_days+1)]
-    days_cols = [f"{d.day}" for d in days]
+    temporadas = treino_service.temporadas_disponiveis()
+    sel_temp = c2.selectbox("Temporada", temporadas, index=temporadas.index(TEMPORADA_ATUAL))
+    sel_ano, sel_mes = c3.selectbox("Mês", meses_da_temporada(sel_temp), index=0, format_func=lambda am: f"{am[1]:02d}/{am[0]}")
     
-    treinos_cache = {d: treino_service.get_treino_do_dia(d, sel_cat) for d in days}
+    matriz = treino_service.carregar_matriz_mes(sel_cat, sel_ano, sel_mes)
+    days_cols = matriz["colunas"]
     
     with st.expander("🛠️ Checklist: O que foi treinado?", expanded=True):
-        type_grid_rows = []
-        for tipo in TRAINING_TYPES:
-            row = {"Tipo": tipo}
-            for d in days:
-                is_checked = False
-                t = treinos_cache.get(d)
-                if t and t.tipos_realizados and tipo in t.tipos_realizados.split(','):
-                        is_checked = True
-                row[f"{d.day}"] = is_checked
-            type_grid_rows.append(row)
-        
-        df_types = pd.DataFrame(type_grid_rows)
+        df_types = matriz["tipos"]
         cfg_types = {"Tipo": st.column_config.TextColumn(disabled=True, width="medium")}
         for d_str in days_cols: cfg_types[d_str] = st.column_config.CheckboxColumn(d_str, width="small")
         edited_types = st.data_editor(df_types, column_config=cfg_types, hide_index=True, use_container_width=True, key="grid_types")
 
     st.subheader("Desempenho dos Atletas")
-    atletas = sorted(atleta_service.filtrar_por_categoria(sel_cat), key=lambda x: x.nome)
-    
-    perf_rows = []
-    for atl in atletas:
-        row = {"ID": atl.id, "Atleta": atl.nome}
-        for d in days:
-            t = treinos_cache.get(d)
-            val = None
-            if t:
-                p = next((perf for perf in t.performances if perf.atleta_id == atl.id), None)
-                if p: val = p.flag_atleta if p.flag_atleta else p.presenca
-            row[f"{d.day}"] = val
-        perf_rows.append(row)
-        
-    df_perf = pd.DataFrame(perf_rows)
+    df_perf = matriz["perf"]
     cfg_perf = {
         "ID": st.column_config.NumberColumn(disabled=True, width="small"),
         "Atleta": st.column_config.TextColumn(disabled=True, width="medium")
@@ -192,51 +255,24 @@ elif menu == "Gestão de Treinos (Matriz)":
     edited_perf = st.data_editor(df_perf, column_config=cfg_perf, hide_index=True, use_container_width=True, height=600, key="grid_perf")
 
     if st.button("💾 SALVAR TUDO", type="primary"):
-        # Save Logic (Same Simplified)
-        progress = st.progress(0)
-        # 1. Save Types
-        for i, d in enumerate(days):
-            d_str = f"{d.day}"
-            tipos = [r["Tipo"] for _, r in edited_types.iterrows() if r[d_str]]
-            t = treinos_cache.get(d)
-            if not t and tipos:
-                t = treino_service.criar_sessao_treino(d, sel_cat, tipos)
-                treinos_cache[d] = t
-            elif t:
-                t.tipos_realizados = ",".join(tipos)
-                db.add(t)
-        db.commit()
-        
-        # 2. Save Perfs
-        for idx, row in edited_perf.iterrows():
-            aid = row['ID']
-            for d in days:
-                v = row[f"{d.day}"]
-                if v:
-                    t = treinos_cache.get(d)
-                    if not t:
-                        t = treino_service.criar_sessao_treino(d, sel_cat, [])
-                        treinos_cache[d] = t
-                    
-                    p = next((x for x in t.performances if x.atleta_id == aid), None)
-                    if not p:
-                        from modules.models import Performance
-                        p = Performance(treino_id=t.id, atleta_id=aid)
-                        db.add(p)
-                    
-                    is_n = v in ["1","2","3"]
-                    nota = int(v) if is_n else None
-                    pres = "P" if is_n else ("F" if v=="F" else "J")
-                    if p.flag_atleta != v:
-                        p.flag_atleta = v; p.presenca = pres; p.nota = nota; db.add(p)
-                        
-            progress.progress(idx/len(edited_perf))
-        db.commit()
-        st.success("Salvo!")
-        st.experimental_rerun()
-
-
-elif menu == "Perfil Atleta":
+        # Grava só o diff em relação ao estado carregado (uma transação)
+        alteradas = treino_service.salvar_matriz_mes(sel_cat, matriz, edited_types, edited_perf)
+        st.session_state.matriz_msg = f"Salvo! {alteradas} células alteradas."
+        st.rerun()
+
+    if 'matriz_msg' in st.session_state:
+        st.success(st.session_state.pop('matriz_msg'))
+
+
+def pagina_perfil(db):
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from modules.analytics import AnalyticsEngine
+
+    analytics = AnalyticsEngine()
+    atleta_service = AtletaService(db)
+    treino_service = TreinoService(db)
+    agregado_service = AgregadoService(db)
     st.title("👤 Perfil Individual")
     c_cat, c_atl = st.columns(2)
     sel_cat = c_cat.selectbox("Categoria", list(CATEGORY_RULES.keys()), index=2)
@@ -246,29 +282,44 @@ elif menu == "Perfil Atleta":
     
     if sel_nome:
         atleta = opcoes_atl[sel_nome]
-        df_cat = treino_service.get_dataframe_performances(sel_cat)
-        df_ind = df_cat[df_cat['atleta'] == sel_nome].sort_values('data')
-        
+        df_ind = treino_service.get_historico_atleta(atleta.id, sel_cat)
+
+        from modules.fotos import foto_store
+        c_foto, c_upload = st.columns([1, 3])
+        miniatura = foto_store.miniatura(atleta.foto_path, "perfil")
+        if miniatura:
+            c_foto.image(miniatura, caption=atleta.nome)
+        else:
+            c_foto.caption("Sem foto")
+        enviada = c_upload.file_uploader("Foto do atleta", type=["jpg", "jpeg", "png", "webp", "gif"],
+                                         key=f"foto_{atleta.id}")
+        if enviada is not None and c_upload.button("Salvar foto"):
+            try:
+                atleta_service.definir_foto(atleta.id, enviada.getvalue())
+                st.rerun()
+            except ValueError as e:
+                c_upload.error(str(e))
+
         st.divider()
         
         # --- RADAR CHART (COMPARATIVO) ---
         st.subheader("⚡ Análise de Habilidades (Radar)")
         
         # Calcular Métricas
-        stats = analytics.calcular_kpis_atleta(df_ind, sel_nome)
+        stats = analytics.kpis_de_agregados(agregado_service.estatisticas_categoria(sel_cat), atleta.id)
         avg_nota_atleta = stats['Média Geral'] if stats else 0
         freq_atleta = stats['Frequência (%)'] if stats else 0
+        consist_atleta = analytics.consistencia(df_ind['nota'].astype(float).std())
         
-        # Médias da Categoria
-        avg_nota_cat = df_cat['nota'].mean()
-        freq_cat = (len(df_cat[df_cat['presenca']=='P'])/len(df_cat))*100
+        # Baseline da Categoria (uma consulta agregada no banco)
+        baseline = treino_service.get_baseline_categoria(sel_cat)
         
         # Dados do Radar
         categories = ['Média Técnica', 'Frequência (%)', 'Consistência', 'Evolução Recente']
         # Normalizando para escala 0-100 visualmente (Nota * 33, Freq, etc)
         
-        val_atl = [avg_nota_atleta * 33, freq_atleta, 80, stats['Média Recente (5)']*33 if stats else 0]
-        val_cat = [avg_nota_cat * 33, freq_cat, 70, avg_nota_cat * 33] # Dummy consistencia/recente cat
+        val_atl = [avg_nota_atleta * 33, freq_atleta, consist_atleta, stats['Média Recente (5)']*33 if stats else 0]
+        val_cat = [baseline['media'] * 33, baseline['frequencia'], analytics.consistencia(baseline['desvio']), baseline['media_recente'] * 33]
         
         fig = go.Figure()
         
@@ -303,14 +354,183 @@ elif menu == "Perfil Atleta":
         
         with c_hist:
             st.subheader("Performance Diária")
+            if st.toggle("Incluir temporadas anteriores (arquivo)"):
+                df_ind = treino_service.get_historico_atleta(
+                    atleta.id, sel_cat, temporadas=treino_service.temporadas_disponiveis(incluir_arquivo=True))
             if not df_ind.empty:
-                df_ind['Cor'] = df_ind['nota'].apply(lambda n: Colors.SUCCESS if n==3 else (Colors.WARNING if n==2 else Colors.DANGER))
+                df_ind['Cor'] = df_ind['nota'].map({3: Colors.SUCCESS, 2: Colors.WARNING}).fillna(Colors.DANGER)
                 fig_bar = px.bar(df_ind, x='data', y='nota', template="plotly_dark")
                 fig_bar.update_traces(marker_color=df_ind['Cor'])
                 st.plotly_chart(fig_bar, use_container_width=True)
 
-elif menu == "Configurações":
+
+def pagina_configuracoes(db):
+    import pandas as pd
+    from sqlalchemy import text
+
     st.title("Configurações")
     st.info("Versão 1.2 - Premium Edition")
     st.text("Cores: Dark Neon Mode")
     st.text(f"Database: {db_engine.engine.url}")
+    st.text(f"Perfil do engine: {db_engine.profile} (journal_mode={db.execute(text('PRAGMA journal_mode')).scalar()})")
+
+    st.subheader("⚡ Cache de Analytics")
+    from modules.cache import df_cache
+    cache_stats = df_cache.stats()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Hits", cache_stats["hits"])
+    k2.metric("Misses", cache_stats["misses"])
+    k3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0f}%")
+    k4.metric("Memória", f"{cache_stats['memoria_mb']} MB")
+    st.caption(f"Entradas: {cache_stats['entradas']} · Versão dos dados: {cache_stats['versao']} · Evictions: {cache_stats['evictions']}")
+
+    st.subheader("🖼️ Fotos (miniaturas em memória)")
+    from modules.fotos import foto_store
+    fotos_stats = foto_store.stats()
+    f1, f2, f3, f4 = st.columns(4)
+    f1.metric("Miniaturas", fotos_stats["miniaturas"])
+    f2.metric("Hit Rate", f"{fotos_stats['hit_rate']:.0f}%")
+    f3.metric("Geradas", fotos_stats["geradas"])
+    f4.metric("Memória", f"{fotos_stats['memoria_mb']} MB")
+
+    st.subheader("⏱️ Inicialização (partida a frio x último rerun)")
+    tempos = tempos_inicializacao.relatorio()
+    if tempos:
+        st.dataframe(pd.DataFrame(tempos), use_container_width=True, hide_index=True, column_config={
+            "etapa": "Etapa",
+            "frio_ms": st.column_config.NumberColumn("1º run do processo (ms)", format="%.1f"),
+            "rerun_ms": st.column_config.NumberColumn("Último rerun (ms)", format="%.1f"),
+        })
+        st.caption("Init do banco e dados de demonstração rodam uma vez por processo; imports já feitos custam ~0 no rerun.")
+
+    st.subheader("🔎 SQL por Página (últimos renders)")
+    relatorios = query_profiler.relatorios()
+    if not relatorios:
+        st.caption("Nenhum render medido ainda.")
+    else:
+        st.dataframe(pd.DataFrame([
+            {"Quando": r["quando"], "Página": r["pagina"], "Queries": r["queries"], "SQL (ms)": r["sql_ms"],
+             "Render (ms)": r["render_ms"], "Suspeitas N+1": len(r["suspeitas_n1"])}
+            for r in relatorios
+        ]), use_container_width=True, hide_index=True)
+
+        # Último render de cada página: queries mais lentas e padrões N+1
+        ultimos = {}
+        for r in relatorios:
+            ultimos.setdefault(r["pagina"], r)
+        for pagina, r in ultimos.items():
+            with st.expander(f"{pagina} — {r['queries']} queries, {r['sql_ms']} ms"):
+                for s in r["suspeitas_n1"]:
+                    st.warning(f"N+1: {s['execucoes']}x ({s['params_distintos']} params distintos, {s['tempo_ms']} ms)\n\n{s['sql']}")
+                st.dataframe(pd.DataFrame(r["lentas"]), use_container_width=True, hide_index=True)
+
+    render_temporadas(db)
+    render_tarefas()
+
+
+def render_temporadas(db):
+    """Temporadas no banco quente e no arquivo; arquiva as encerradas em segundo plano"""
+    from modules.jobs import tarefa_fechar_temporada
+    from modules.temporadas import listar_temporadas
+
+    st.subheader("🗄️ Temporadas")
+    conn = db.connection()
+    quentes, arquivadas = listar_temporadas(conn), listar_temporadas(conn, arquivo=True)
+    t1, t2, t3 = st.columns(3)
+    t1.metric("Atual", TEMPORADA_ATUAL)
+    t2.metric("No banco principal", ", ".join(map(str, quentes)) or "-")
+    t3.metric("Arquivadas", ", ".join(map(str, arquivadas)) or "-")
+    encerradas = [t for t in quentes if t < TEMPORADA_ATUAL]
+    if encerradas:
+        c1, c2 = st.columns([1, 2])
+        sel = c1.selectbox("Temporada encerrada", encerradas)
+        c2.caption("Move treinos e performances para o banco de arquivo; consultas padrão passam a ler só a temporada atual.")
+        if c2.button(f"Arquivar temporada {sel}"):
+            # Thread (não processo): o pool do engine é recriado no processo do app para anexar o arquivo
+            job_manager.submeter(f"Arquivar temporada {sel}", tarefa_fechar_temporada, sel, invalida_cache=True)
+
+
+def render_tarefas():
+    """Painel de jobs: dispara operações pesadas em segundo plano e coleta os resultados"""
+    import pandas as pd
+    from modules.jobs import tarefa_analytics_categorias, tarefa_reconstruir_agregados, tarefa_banco_sintetico, tarefa_relatorios
+
+    st.subheader("🧵 Tarefas em Segundo Plano")
+    c1, c2 = st.columns(2)
+    if c1.button("Analytics de todas as categorias"):
+        job_manager.submeter("Analytics (todas as categorias)", tarefa_analytics_categorias)
+    if c2.button("Recalcular agregados"):
+        job_manager.submeter("Recalcular agregados", tarefa_reconstruir_agregados, processo=True)
+    with st.expander("Relatórios mensais por atleta (PDF, .zip)"):
+        r1, r2 = st.columns(2)
+        meses = meses_da_temporada()
+        hoje = datetime.date.today()
+        ano_mes = r1.selectbox("Mês", meses, index=meses.index((hoje.year, hoje.month)) if (hoje.year, hoje.month) in meses else 0,
+                               format_func=lambda am: f"{am[1]:02d}/{am[0]}", key="relatorios_mes")
+        categorias = r2.multiselect("Categorias (vazio = clube todo)", list(CATEGORY_RULES.keys()), key="relatorios_cat")
+        if st.button("Gerar relatórios"):
+            # Thread: a renderização abre o próprio pool de processos
+            job_manager.submeter(f"Relatórios {ano_mes[1]:02d}/{ano_mes[0]}", tarefa_relatorios, *ano_mes,
+                                 categorias=categorias or None)
+    with st.expander("Banco sintético (teste de carga, arquivo separado)"):
+        s1, s2, s3 = st.columns(3)
+        n_atl = s1.number_input("Atletas por categoria", 1, 1000, 25)
+        n_temp = s2.number_input("Temporadas", 1, 10, 1)
+        seed = s3.number_input("Seed", 0, 10**6, 42)
+        if st.button("Gerar banco sintético"):
+            job_manager.submeter("Banco sintético", tarefa_banco_sintetico, processo=True,
+                                 atletas_por_categoria=int(n_atl), seed=int(seed),
+                                 temporadas=list(range(datetime.date.today().year - int(n_temp) + 1, datetime.date.today().year + 1)))
+
+    jobs = job_manager.listar()
+    if not jobs:
+        st.caption("Nenhuma tarefa submetida.")
+        return
+    st.dataframe(pd.DataFrame([
+        {"ID": j.id, "Tarefa": j.nome, "Pool": "processo" if j.processo else "thread", "Status": j.status,
+         "Progresso (%)": round(j.progresso * 100), "Duração (s)": round(j.duracao, 1) if j.duracao is not None else None,
+         "Detalhe": j.erro or j.mensagem}
+        for j in jobs
+    ]), use_container_width=True, hide_index=True)
+    render_progresso_jobs([j.id for j in jobs])
+
+    # Resultados retidos: coletados aqui até serem descartados
+    for job in jobs:
+        if job.status != CONCLUIDO:
+            continue
+        with st.expander(f"Resultado: {job.nome} ({job.id})"):
+            if job.tarefa == "tarefa_analytics_categorias":
+                cat = st.selectbox("Categoria", list(job.resultado.keys()), key=f"cat_{job.id}")
+                st.dataframe(job.resultado[cat]["ranking"], use_container_width=True, hide_index=True)
+                for alerta in job.resultado[cat]["alertas"]:
+                    st.warning(f"{alerta['atleta']}: {alerta['msg']}")
+            elif job.tarefa == "tarefa_relatorios" and os.path.exists(job.resultado["arquivo"]):
+                st.caption(f"{job.resultado['relatorios']} relatórios")
+                with open(job.resultado["arquivo"], "rb") as f:
+                    st.download_button("Baixar relatórios (.zip)", data=f, key=f"baixar_{job.id}",
+                                       file_name=f"G5_{job.nome.replace(' ', '_').replace('/', '-')}.zip",
+                                       mime="application/zip")
+            else:
+                st.json(job.resultado)
+            if st.button("Descartar", key=f"descartar_{job.id}"):
+                job_manager.descartar(job.id)
+                st.rerun()
+
+
+PAGINAS = {
+    "Dashboard": pagina_dashboard,
+    "Gestão de Treinos (Matriz)": pagina_matriz,
+    "Perfil Atleta": pagina_perfil,
+    "Configurações": pagina_configuracoes,
+}
+
+# --- CONTROLLER ---
+# Uma sessão por rerun: fechada ao final (inclusive em st.rerun/st.stop), sem estado velho entre reruns.
+# Queries do rerun são medidas e marcadas com a página (painel em Configurações).
+try:
+    with db_engine.sessao() as db, query_profiler.render() as render, tempos_inicializacao.etapa("render"):
+        menu = render_sidebar(db)
+        render["pagina"] = menu
+        PAGINAS[menu](db)
+finally:
+    tempos_inicializacao.concluir()
@@ -0,0 +1,212 @@
+"""
+G5 Futebol System - Comandos de Manutenção (CLI)
+------------------------------------------------
+Tarefas administrativas executadas fora do Streamlit.
+
+Uso:
+    python manage.py agregados      # Reconstrói os agregados materializados
+    python manage.py export         # Backup completo (xlsx ou parquet)
+    python manage.py import ARQ...  # Importa planilhas (CSV/XLSX) no layout da Matriz
+    python manage.py temporada      # Lista temporadas / arquiva as encerradas
+    python manage.py relatorios     # PDFs mensais por atleta (.zip)
+    python manage.py seed           # Dados sintéticos em volume (load test, banco separado)
+    python manage.py bench          # Benchmarks dos hot paths vs baseline
+"""
+
+import argparse
+import datetime
+import sys
+
+from config import DB_PATH, EXPORT_CHUNK, IMPORT_LOTE, RELATORIOS_PROCESSOS, SINTETICO_DB_PATH
+from modules.database import db_engine
+
+
+def cmd_agregados(args):
+    """Rebuild completo dos agregados por atleta / atleta-mês"""
+    from modules.services import AgregadoService
+    db = db_engine.SessionLocal()
+    try:
+        AgregadoService(db).reconstruir()
+    finally:
+        db.close()
+    print("Agregados reconstruídos.")
+
+
+def cmd_export(args):
+    """Backup completo de Atletas, Treinos e Performances"""
+    from modules.export import exportar_excel, exportar_parquet
+    db = db_engine.SessionLocal()
+    try:
+        if args.formato == "parquet":
+            saida = args.saida or f"G5_Backup_{datetime.date.today()}"
+            contagem = exportar_parquet(db, saida, chunk=args.chunk)
+        else:
+            saida = args.saida or f"G5_Backup_{datetime.date.today()}.xlsx"
+            contagem = exportar_excel(db, saida, chunk=args.chunk)
+    finally:
+        db.close()
+    print(f"Backup gerado em {saida}: " + ", ".join(f"{k}={v}" for k, v in contagem.items()))
+
+
+def cmd_import(args):
+    """Importa fichas de treino no layout da Matriz (atleta x dia), relatando células inválidas"""
+    import csv
+    import glob
+    import time
+    from modules.importer import importar_matriz
+    caminhos = sorted({c for padrao in args.arquivos for c in (glob.glob(padrao) or [padrao])})
+    inicio = time.perf_counter()
+    resultado = importar_matriz(caminhos, categoria=args.categoria, ano=args.ano, mes=args.mes, lote=args.lote)
+    erros = resultado.pop("erros")
+    print(f"Importado em {time.perf_counter() - inicio:.1f}s: " + ", ".join(f"{k}={v}" for k, v in resultado.items()))
+    for e in erros[:args.max_erros]:
+        print(f"  {e['arquivo']}{'[' + e['aba'] + ']' if e['aba'] else ''} linha {e['linha']} "
+              f"col {e['coluna']!r}: {e['motivo']} ({e['valor']!r})")
+    if len(erros) > args.max_erros:
+        print(f"  ... mais {len(erros) - args.max_erros} erro(s)")
+    if args.relatorio and erros:
+        with open(args.relatorio, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(erros[0]))
+            writer.writeheader()
+            writer.writerows(erros)
+        print(f"Relatório de erros em {args.relatorio}")
+    sys.exit(1 if erros else 0)
+
+
+def cmd_temporada(args):
+    """Lista as temporadas (quentes e arquivadas) ou arquiva temporadas encerradas"""
+    from modules.temporadas import fechar_temporada, listar_temporadas
+    for temporada in sorted(args.fechar or []):
+        contagem = fechar_temporada(temporada)
+        print(f"Temporada {temporada} arquivada: " + ", ".join(f"{k}={v}" for k, v in contagem.items()))
+    with db_engine.engine.connect() as conn:
+        print("Quentes: " + (", ".join(map(str, listar_temporadas(conn))) or "-"))
+        print("Arquivadas: " + (", ".join(map(str, listar_temporadas(conn, arquivo=True))) or "-"))
+
+
+def cmd_relatorios(args):
+    """PDF do mês de cada atleta (categorias ou clube), renderizados em paralelo e gravados num .zip"""
+    import time
+    from modules.relatorios import gerar_relatorios
+    hoje = datetime.date.today()
+    ano, mes = args.ano or hoje.year, args.mes or hoje.month
+    saida = args.saida or f"G5_Relatorios_{ano}-{mes:02d}.zip"
+    inicio = time.perf_counter()
+    db = db_engine.SessionLocal()
+    try:
+        resultado = gerar_relatorios(db, ano, mes, saida, categorias=args.categorias, processos=args.processos)
+    finally:
+        db.close()
+    print(f"{resultado['relatorios']} relatórios em {saida} ({time.perf_counter() - inicio:.1f}s)")
+
+
+def cmd_seed(args):
+    """
+    Gera dados sintéticos em volume para dimensionar consultas e telas. O destino padrão é um banco
+    separado (SINTETICO_DB_PATH); o banco em uso só recebe a carga se for passado explicitamente em --db.
+    """
+    import os
+    import time
+    from modules.utils import gerar_dados_sinteticos
+    destino = os.path.abspath(args.db)
+    if destino == os.path.abspath(DB_PATH):
+        engine = db_engine.engine
+    else:
+        from sqlalchemy import create_engine
+        from modules.database import Base
+        from modules.migrations import aplicar_migracoes
+        engine = create_engine(f"sqlite:///{destino}")
+        Base.metadata.create_all(engine)
+        aplicar_migracoes(engine)
+    inicio = time.perf_counter()
+    try:
+        contagem = gerar_dados_sinteticos(
+            atletas_por_categoria=args.atletas,
+            categorias=args.categorias,
+            temporadas=args.temporadas,
+            seed=args.seed,
+            lote=args.lote,
+            engine=engine,
+        )
+    finally:
+        if engine is not db_engine.engine:
+            engine.dispose()
+    print(f"Gerado em {destino} em {time.perf_counter() - inicio:.1f}s: " + ", ".join(f"{k}={v}" for k, v in contagem.items()))
+
+
+def cmd_bench(args):
+    """Suíte de benchmarks (sai com código 1 se houver regressão vs baseline)"""
+    from benchmarks import suite
+    codigo = suite.main(
+        escalas=args.escalas,
+        repeticoes=args.repeticoes,
+        seed=args.seed,
+        saida=args.saida,
+        baseline=args.baseline or suite.BASELINE_PADRAO,
+        salvar_baseline=args.salvar_baseline,
+        tolerancia=args.tolerancia,
+    )
+    sys.exit(codigo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="manage.py", description="G5 Futebol - comandos de manutenção")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("agregados", help="Reconstrói os agregados materializados por atleta")
+    p.set_defaults(func=cmd_agregados)
+
+    p = sub.add_parser("export", help="Exporta o backup completo do banco")
+    p.add_argument("--formato", choices=["xlsx", "parquet"], default="xlsx")
+    p.add_argument("--saida", help="Arquivo .xlsx ou diretório parquet (padrão: G5_Backup_<data>)")
+    p.add_argument("--chunk", type=int, default=EXPORT_CHUNK, help="Linhas por bloco de leitura")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="Importa planilhas CSV/XLSX no layout da Matriz (atleta x dia)")
+    p.add_argument("arquivos", nargs="+", help="Arquivos ou padrões glob (ex: 'fichas/*.xlsx')")
+    p.add_argument("--categoria", help="Categoria (padrão: identificada no nome do arquivo/aba, ex: Sub14_2026-03)")
+    p.add_argument("--ano", type=int, help="Ano (padrão: identificado no nome do arquivo/aba)")
+    p.add_argument("--mes", type=int, help="Mês (padrão: identificado no nome do arquivo/aba)")
+    p.add_argument("--lote", type=int, default=IMPORT_LOTE, help="Células por transação")
+    p.add_argument("--relatorio", help="CSV com todas as células rejeitadas")
+    p.add_argument("--max-erros", type=int, default=20, help="Erros exibidos no terminal")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("temporada", help="Lista as temporadas e arquiva as encerradas")
+    p.add_argument("--fechar", nargs="+", type=int, metavar="ANO", help="Temporadas a mover para o banco de arquivo")
+    p.set_defaults(func=cmd_temporada)
+
+    p = sub.add_parser("relatorios", help="Gera o PDF mensal de cada atleta num .zip")
+    p.add_argument("--ano", type=int, help="Ano (padrão: atual)")
+    p.add_argument("--mes", type=int, choices=range(1, 13), metavar="MES", help="Mês 1-12 (padrão: atual)")
+    p.add_argument("--categorias", nargs="+", help="Categorias (padrão: clube todo)")
+    p.add_argument("--processos", type=int, default=RELATORIOS_PROCESSOS, help="Processos de renderização (1 = sem pool)")
+    p.add_argument("--saida", help="Arquivo .zip (padrão: G5_Relatorios_<AAAA-MM>.zip)")
+    p.set_defaults(func=cmd_relatorios)
+
+    p = sub.add_parser("seed", help="Gera dados sintéticos em volume (load test)")
+    p.add_argument("--atletas", type=int, default=25, help="Atletas por categoria")
+    p.add_argument("--categorias", nargs="+", help="Categorias (padrão: todas)")
+    p.add_argument("--temporadas", nargs="+", type=int, help="Anos das temporadas (padrão: ano atual)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--lote", type=int, default=50_000, help="Linhas por executemany")
+    p.add_argument("--db", default=SINTETICO_DB_PATH, help="Banco SQLite de destino (padrão: g5_sintetico.db, separado do banco em uso)")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("bench", help="Roda a suíte de benchmarks e compara com o baseline")
+    p.add_argument("--escalas", nargs="+", type=int, default=[1, 10], help="Múltiplos de uma temporada de todas as categorias")
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--saida", default="bench_results.json", help="Arquivo JSON de resultados")
+    p.add_argument("--baseline", help="Baseline para comparação (padrão: benchmarks/baseline.json)")
+    p.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como novo baseline")
+    p.add_argument("--tolerancia", type=float, default=0.25, help="Fração de piora tolerada (0.25 = 25%%)")
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    db_engine.init_tables()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
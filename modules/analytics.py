@@ -6,6 +6,7 @@ Responsável por cálculos estatísticos, rankings e detecção de padrões.
 
 import pandas as pd
 import numpy as np
+from config import ALERT_MIN_FALTAS, ALERT_JANELA_NOTAS, ALERT_NOTA_CORTE, KPI_JANELA_FORMA, KPI_SPAN_EWM, KPI_JANELA_TENDENCIA, RANKING_MIN_NOTAS, RANKING_TOP_K
 
 class AnalyticsEngine:
     
@@ -21,12 +22,12 @@ class AnalyticsEngine:
         presencas = len(df[df['presenca'] == 'P'])
         freq = (presencas / total_treinos) * 100 if total_treinos > 0 else 0
         
-        # Média de notas (ignora NaNs)
-        media_notas = df['nota'].mean()
+        # Média de notas (ignora NaNs; Int8 -> float para NA virar NaN)
+        notas = df['nota'].astype('float64')
+        media_notas = notas.mean()
         
         # Tendência (Últimos 5 treinos vs Anterior)
-        last_5 = df.tail(5)
-        media_recente = last_5['nota'].mean()
+        media_recente = notas.tail(5).mean()
         
         return {
             "Total Treinos": total_treinos,
@@ -37,43 +38,154 @@ class AnalyticsEngine:
         }
 
     @staticmethod
-    def gerar_ranking_evolucao(df_all: pd.DataFrame):
+    def kpis_categoria(df_all: pd.DataFrame, janela: int = KPI_JANELA_FORMA, span: int = KPI_SPAN_EWM,
+                       janela_tendencia: int = KPI_JANELA_TENDENCIA) -> pd.DataFrame:
         """
-        Gera um ranking baseado na consistência (Desvio Padrão Inverso) e Média.
-        Top Evolução = Alta Média + Baixo Desvio Padrão.
+        KPIs de todos os atletas da categoria em uma passada agrupada (sem laço por atleta):
+            treinos, frequencia (%), media,
+            forma_movel -> média das notas nos últimos `janela` treinos (média móvel)
+            forma_ewm   -> média exponencial das notas (span), mais peso aos treinos recentes
+            tendencia   -> inclinação da reta nota x treino nos últimos `janela_tendencia` treinos
+        Retorna um DataFrame por atleta (atleta_id, atleta, ...) ordenado pela tendência.
         """
+        colunas = ['atleta_id', 'atleta', 'treinos', 'frequencia', 'media', 'forma_movel', 'forma_ewm', 'tendencia']
         if df_all.empty:
-            return pd.DataFrame()
-            
-        # Agrupa por atleta
-        stats = df_all.groupby('atleta')['nota'].agg(['mean', 'std', 'count']).reset_index()
-        stats = stats[stats['count'] >= 3] # Mínimo 3 treinos para ranking
+            return pd.DataFrame(columns=colunas)
+
+        df = df_all.sort_values(['atleta_id', 'data'], kind='stable').reset_index(drop=True)
+        chave = df['atleta_id']
+        notas = df['nota'].astype('float64')
+        g = notas.groupby(chave, sort=False)
+        ordem = df.groupby('atleta_id', sort=False).cumcount(ascending=False) # 0 = treino mais recente
+        ultimos = ordem.index[ordem == 0]
+
+        def no_ultimo_treino(serie_agrupada):
+            # Janela agrupada (índice atleta_id, linha) -> valor da janela que termina no último treino
+            return serie_agrupada.droplevel(0).loc[ultimos].set_axis(chave[ultimos])
+
+        kpis = pd.DataFrame({
+            'atleta': df.groupby('atleta_id', sort=False)['atleta'].first(),
+            'treinos': g.size(),
+            'frequencia': (df['presenca'] == 'P').groupby(chave, sort=False).mean() * 100,
+            'media': g.mean(),
+            'forma_movel': no_ultimo_treino(g.rolling(janela, min_periods=1).mean()),
+            'forma_ewm': no_ultimo_treino(g.ewm(span=span, ignore_na=True).mean()),
+        })
+
+        # Tendência: mínimos quadrados com somas agrupadas (x = nº do treino, y = nota)
+        x = df.groupby('atleta_id', sort=False).cumcount().astype('float64')
+        recentes = (ordem < janela_tendencia) & notas.notna()
+        somas = pd.DataFrame({'n': 1.0, 'x': x, 'y': notas, 'xx': x * x, 'xy': x * notas})[recentes] \
+            .groupby(chave[recentes], sort=False).sum()
+        denominador = somas['n'] * somas['xx'] - somas['x'] ** 2
+        kpis['tendencia'] = ((somas['n'] * somas['xy'] - somas['x'] * somas['y']) / denominador.where(denominador > 0))
+
+        kpis = kpis.rename_axis('atleta_id').reset_index()
+        return kpis[colunas].sort_values('tendencia', ascending=False, na_position='last').reset_index(drop=True)
+
+    @staticmethod
+    def consistencia(desvio: float) -> float:
+        """Converte o desvio padrão das notas (escala 1-3) em Consistência 0-100 (100 = sem oscilação)"""
+        if desvio is None or np.isnan(desvio):
+            return 0.0
+        return round(100 * (1 - min(desvio, 2.0) / 2.0), 1)
+
+    @staticmethod
+    def kpis_de_agregados(stats: pd.DataFrame, atleta_id: int):
+        """Mesmos KPIs de calcular_kpis_atleta, lidos de AgregadoService.estatisticas_categoria"""
+        if stats.empty:
+            return None
+        linha = stats[stats['atleta_id'] == atleta_id]
+        if linha.empty:
+            return None
+        linha = linha.iloc[0]
+
+        total_treinos = int(linha['total'])
+        freq = (linha['presencas'] / total_treinos) * 100 if total_treinos > 0 else 0
+        media_notas = linha['mean']
+        ultimas = [n for n in linha['ultimas'][-5:] if n is not None]
+        media_recente = np.mean(ultimas) if ultimas else np.nan
+
+        return {
+            "Total Treinos": total_treinos,
+            "Frequência (%)": round(freq, 1),
+            "Média Geral": round(media_notas, 2),
+            "Média Recente (5)": round(media_recente, 2),
+            "Tendência": "⬆️" if media_recente > media_notas else "⬇️"
+        }
+
+    @staticmethod
+    def _score_g5(stats: pd.DataFrame):
+        """Aplica o Score G5 sobre estatísticas por atleta (colunas atleta, mean, std, count)"""
+        stats = stats[stats['count'] >= RANKING_MIN_NOTAS].copy() # Mínimo de treinos para ranking
         
         stats['std'] = stats['std'].fillna(0) # Se só 1 treino, std é NaN
         
         # Score = Média * (1 - (StdDev / 5)) -> Penaliza instabilidade
         stats['Score G5'] = stats['mean'] * (1 - (stats['std'] / 10))
         
-        return stats.sort_values('Score G5', ascending=False).head(10)
+        return stats.sort_values('Score G5', ascending=False).head(RANKING_TOP_K)
 
     @staticmethod
-    def alertas_criticos(df_all: pd.DataFrame):
-        """Retorna lista de atletas que precisam de atenção (Faltas > 3 ou Média < 1.5)"""
+    def gerar_ranking_evolucao(df_all: pd.DataFrame):
+        """
+        Gera um ranking baseado na consistência (Desvio Padrão Inverso) e Média.
+        Top Evolução = Alta Média + Baixo Desvio Padrão.
+        """
         if df_all.empty:
-            return []
+            return pd.DataFrame()
             
+        # Agrupa por atleta_id (homônimos são atletas distintos); o nome é só para exibição
+        notas = df_all['nota'].astype('float64')
+        stats = notas.groupby(df_all['atleta_id'], sort=False).agg(['mean', 'std', 'count'])
+        stats.insert(0, 'atleta', df_all.groupby('atleta_id', sort=False)['atleta'].first())
+        return AnalyticsEngine._score_g5(stats.reset_index(drop=True))
+
+    @staticmethod
+    def ranking_de_agregados(stats: pd.DataFrame):
+        """Ranking Score G5 lido dos agregados materializados (custo ~ nº de atletas)"""
+        if stats.empty:
+            return pd.DataFrame()
+        return AnalyticsEngine._score_g5(stats[['atleta', 'mean', 'std', 'count']])
+
+    @staticmethod
+    def alertas_criticos(df_all: pd.DataFrame, min_faltas: int = ALERT_MIN_FALTAS,
+                         janela: int = ALERT_JANELA_NOTAS, nota_corte: float = ALERT_NOTA_CORTE):
+        """
+        Retorna lista de atletas que precisam de atenção (Faltas >= min_faltas ou média dos
+        últimos `janela` treinos < nota_corte). Calcula todos os atletas em uma passada agrupada,
+        com os treinos ordenados por data.
+        """
+        if df_all.empty:
+            return []
+
+        # Chave atleta_id (homônimos são atletas distintos); o nome é só para exibição
+        ordem = pd.unique(df_all['atleta_id'])
+        df = df_all.sort_values('data', kind='stable')
+
+        # Contagem de faltas por atleta
+        faltas = (df['presenca'] == 'F').groupby(df['atleta_id']).sum()
+
+        # Janela de notas recentes por atleta
+        recentes = df.groupby('atleta_id').tail(janela)
+        media_recente = recentes['nota'].astype('float64').groupby(recentes['atleta_id']).mean()
+
+        stats = pd.DataFrame({
+            "atleta": df.groupby('atleta_id')['atleta'].first(),
+            "faltas": faltas,
+            "media_recente": media_recente,
+        }).reindex(ordem)
+        stats["alerta_faltas"] = stats["faltas"] >= min_faltas
+        stats["alerta_nota"] = stats["media_recente"] < nota_corte
+        stats = stats[stats["alerta_faltas"] | stats["alerta_nota"]]
+
         alertas = []
-        for atleta in df_all['atleta'].unique():
-            df_g = df_all[df_all['atleta'] == atleta]
-            
-            # Checa Faltas
-            faltas = len(df_g[df_g['presenca'] == 'F'])
-            if faltas >= 3:
-                alertas.append({"atleta": atleta, "tipo": "Faltas", "msg": f"{faltas} Faltas registradas"})
-                
-            # Checa Notas Baixas Recentes
-            last_3 = df_g.tail(3)
-            if not last_3.empty and last_3['nota'].mean() < 1.8:
-                alertas.append({"atleta": atleta, "tipo": "Performance", "msg": "Média recente crítica (< 1.8)"})
-                
+        for atleta_id, row in stats.iterrows():
+            if row["alerta_faltas"]:
+                alertas.append({"atleta_id": int(atleta_id), "atleta": row["atleta"], "tipo": "Faltas",
+                                "msg": f"{int(row['faltas'])} Faltas registradas"})
+            if row["alerta_nota"]:
+                alertas.append({"atleta_id": int(atleta_id), "atleta": row["atleta"], "tipo": "Performance",
+                                "msg": f"Média recente crítica (< {nota_corte})"})
+
         return alertas
@@ -0,0 +1,112 @@
+"""
+Módulo de Cache (DataFrame Cache)
+---------------------------------
+Cache process-wide dos DataFrames de Analytics.
+As chaves carregam a versão dos dados: toda escrita nos serviços chama `invalidar()`,
+que incrementa a versão e descarta as entradas antigas. Escritas de fora do processo
+(`manage.py import`/`seed`, outro worker do Streamlit) não passam por `invalidar()`: elas são
+detectadas por uma versão externa (ver `observar`), conferida a cada leitura. Evicção LRU por
+nº de entradas e por teto de memória.
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config import CACHE_MAX_ENTRADAS, CACHE_MAX_MB
+
+
+class DataFrameCache:
+    """Cache LRU de DataFrames com contador de versão de dados"""
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._itens = OrderedDict() # chave -> (DataFrame, bytes)
+        self.versao = 0
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._versao_externa = None # callable -> valor que muda a cada commit no banco
+        self._externa_vista = None
+
+    def observar(self, versao_externa):
+        """
+        Registra `versao_externa()` (ex: PRAGMA data_version do SQLite). Quando o valor muda entre
+        duas leituras, o banco foi alterado por outra conexão e o cache é invalidado.
+        """
+        self._versao_externa = versao_externa
+
+    def _sincronizar(self):
+        """Invalida o cache se a versão externa mudou desde a última leitura"""
+        externa = self._versao_externa()
+        with self._lock:
+            if externa != self._externa_vista:
+                self._externa_vista = externa
+                self.versao += 1
+                self._itens.clear()
+                self.bytes_usados = 0
+
+    def get_or_load(self, chave: tuple, loader) -> pd.DataFrame:
+        """
+        Retorna o DataFrame da chave (na versão atual) ou carrega com `loader()` e guarda.
+        A versão é capturada antes da carga: se houver escrita durante a consulta, o resultado
+        fica sob a versão antiga e nunca será servido.
+        """
+        if self._versao_externa is not None:
+            self._sincronizar()
+        with self._lock:
+            chave_v = (self.versao,) + tuple(chave)
+            item = self._itens.get(chave_v)
+            if item is not None:
+                self._itens.move_to_end(chave_v)
+                self.hits += 1
+                return item[0].copy(deep=False)
+            self.misses += 1
+
+        df = loader()
+        tamanho = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            if chave_v[0] == self.versao and tamanho <= self.max_bytes:
+                antigo = self._itens.pop(chave_v, None)
+                if antigo is not None:
+                    self.bytes_usados -= antigo[1]
+                self._itens[chave_v] = (df, tamanho)
+                self.bytes_usados += tamanho
+                self._evict()
+        return df.copy(deep=False)
+
+    def _evict(self):
+        """Remove as entradas menos usadas até respeitar os limites (chamar com o lock)"""
+        while self._itens and (len(self._itens) > self.max_entradas or self.bytes_usados > self.max_bytes):
+            _, (_, tamanho) = self._itens.popitem(last=False)
+            self.bytes_usados -= tamanho
+            self.evictions += 1
+
+    def invalidar(self):
+        """Chamado após toda escrita: nova versão de dados e descarte das entradas"""
+        with self._lock:
+            self.versao += 1
+            self._itens.clear()
+            self.bytes_usados = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "versao": self.versao,
+                "entradas": len(self._itens),
+                "memoria_mb": round(self.bytes_usados / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            }
+
+
+# Instância Global (process-wide)
+df_cache = DataFrameCache()
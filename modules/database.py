@@ -5,13 +5,41 @@ Gerencia a conexão com o SQLite e fornece a sessão do SQLAlchemy.
 Implementa o padrão Singleton para conexão.
 """
 
-from sqlalchemy import create_engine
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from config import DB_PATH
+from config import DB_PATH, DB_PROFILE, DB_PROFILES, ARQUIVO_DB_PATH
+from modules.cache import df_cache
 
 # Base declarativa para os Models herdarem
 Base = declarative_base()
 
+# Schema sob o qual o banco de arquivo (temporadas encerradas) é anexado às conexões
+ARQUIVO_SCHEMA = "arquivo"
+
+
+@event.listens_for(Engine, "connect")
+def _registrar_funcoes(dbapi_conn, _registro):
+    """
+    sqrt() em Python para builds do SQLite sem as funções matemáticas (desvio padrão no SQL).
+    Registrado para toda conexão SQLite de qualquer engine (app, benchmarks, banco sintético,
+    arquivo), já que os serviços rodam sobre o engine ao qual a sessão estiver ligada.
+    """
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    try:
+        dbapi_conn.execute("SELECT sqrt(1)")
+    except sqlite3.OperationalError:
+        dbapi_conn.create_function(
+            "sqrt", 1, lambda x: math.sqrt(x) if x is not None and x >= 0 else None, deterministic=True
+        )
+
+
 class DatabaseEngine:
     """
     Gerenciador de Conexão com Banco de Dados.
@@ -26,12 +54,73 @@ class DatabaseEngine:
             cls._instance._initialize()
         return cls._instance
     
-    def _initialize(self):
-        """Inicializa o Engine SQLite"""
+    def _initialize(self, profile: str = DB_PROFILE):
+        """Inicializa o Engine SQLite com o perfil de configuração (config.DB_PROFILES)"""
+        self.profile = profile
+        cfg = DB_PROFILES[profile]
+        pragmas = cfg["pragmas"]
         # check_same_thread=False é necessário para SQLite com Streamlit/Multithreading
         connection_url = f"sqlite:///{DB_PATH}"
-        self.engine = create_engine(connection_url, connect_args={"check_same_thread": False}, echo=False)
+        self.engine = create_engine(
+            connection_url,
+            connect_args={"check_same_thread": False, "timeout": pragmas.get("busy_timeout", 5000) / 1000},
+            pool_size=cfg["pool_size"],
+            max_overflow=cfg["max_overflow"],
+            pool_timeout=cfg["pool_timeout"],
+            echo=False
+        )
+        event.listen(self.engine, "connect", lambda dbapi_conn, _: self._aplicar_pragmas(dbapi_conn, pragmas))
+        event.listen(self.engine, "checkout", lambda dbapi_conn, registro, _: self._anexar_arquivo(dbapi_conn, registro))
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._init_lock = threading.Lock()
+        self._tabelas_prontas = False
+        self._versao_lock = threading.Lock()
+        self._conn_versao = None
+
+    @staticmethod
+    def _aplicar_pragmas(dbapi_conn, pragmas: dict):
+        """Aplica os PRAGMAs do perfil em cada nova conexão do pool"""
+        cursor = dbapi_conn.cursor()
+        for nome, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nome}={valor}")
+        cursor.close()
+
+    @staticmethod
+    def _anexar_arquivo(dbapi_conn, registro, caminho: str = ARQUIVO_DB_PATH):
+        """
+        Anexa o banco de arquivo como schema `arquivo` assim que ele existir. Conferido a cada
+        checkout do pool, não só ao conectar: o arquivo pode ser criado por fechar_temporada em
+        outro processo (`manage.py temporada --fechar`) com as conexões do app já abertas.
+        """
+        if registro.info.get(ARQUIVO_SCHEMA) or not os.path.exists(caminho):
+            return
+        if not any(linha[1] == ARQUIVO_SCHEMA for linha in dbapi_conn.execute("PRAGMA database_list")):
+            dbapi_conn.execute(f"ATTACH DATABASE ? AS {ARQUIVO_SCHEMA}", (caminho,))
+        registro.info[ARQUIVO_SCHEMA] = True
+
+    def versao_dados(self) -> int:
+        """
+        PRAGMA data_version de uma conexão dedicada, fora do pool e que nunca escreve: o valor muda
+        a cada commit de qualquer outra conexão no arquivo, inclusive de outros processos
+        (`manage.py import`, outro worker). Usado pelo df_cache para detectar escritas externas.
+        """
+        with self._versao_lock:
+            if self._conn_versao is None:
+                self._conn_versao = sqlite3.connect(DB_PATH, check_same_thread=False)
+            return self._conn_versao.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def sessao(self):
+        """
+        Sessão com escopo de uma unidade de trabalho (no app, um rerun do Streamlit).
+        Sempre fechada ao sair, inclusive em st.rerun/st.stop: transação pendente é desfeita,
+        a conexão volta ao pool e nenhum objeto fica velho no identity map para o próximo rerun.
+        """
+        db = self.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
         
     def get_db(self):
         """Dependency Injection para obter sessão de banco"""
@@ -42,10 +131,36 @@ class DatabaseEngine:
             db.close()
             
     def init_tables(self):
-        """Cria as tabelas no banco de dados se não existirem"""
-        # Importar models aqui para garantir que Base conheça eles antes do create_all
-        import modules.models
-        Base.metadata.create_all(bind=self.engine)
+        """
+        Cria as tabelas no banco de dados se não existirem e aplica as migrações pendentes.
+        Roda uma vez por processo: chamadas seguintes (ex: reruns do Streamlit) retornam direto.
+        """
+        with self._init_lock:
+            if self._tabelas_prontas:
+                return
+            # Importar models aqui para garantir que Base conheça eles antes do create_all
+            import modules.models
+            Base.metadata.create_all(bind=self.engine)
+            from modules.migrations import aplicar_migracoes
+            aplicar_migracoes(self.engine)
+            self._backfill_agregados()
+            self._tabelas_prontas = True
+
+    def _backfill_agregados(self):
+        """Constrói os agregados materializados em bancos que já tinham performances antes deles"""
+        with self.engine.connect() as conn:
+            vazio = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM agregados_atleta)")).scalar()
+            tem_dados = conn.execute(text("SELECT EXISTS (SELECT 1 FROM performances)")).scalar()
+        if vazio and tem_dados:
+            from modules.services import AgregadoService
+            db = self.SessionLocal()
+            try:
+                AgregadoService(db).reconstruir()
+            finally:
+                db.close()
 
 # Instância Global
 db_engine = DatabaseEngine()
+
+# Escritas de outros processos no banco também invalidam o cache de analytics
+df_cache.observar(db_engine.versao_dados)
@@ -0,0 +1,138 @@
+"""
+Módulo de Exportação (Backup)
+-----------------------------
+Exporta Atletas, Treinos e Performances de todas as categorias. Temporadas já encerradas
+(banco de arquivo, ver modules.temporadas) entram em abas/arquivos próprios, com os ids do arquivo.
+Leitura em blocos (yield_per) e escrita em streaming (openpyxl write-only ou row groups
+Parquet), mantendo a memória constante conforme o banco cresce.
+Também é exposto via linha de comando: `python manage.py export`.
+"""
+
+from sqlalchemy import select, func, Integer, Float, Date
+from sqlalchemy.orm import Session
+
+from config import EXPORT_CHUNK
+from modules.models import Atleta, Treino, Performance
+from modules.temporadas import TREINOS_ARQUIVO, PERFORMANCES_ARQUIVO, arquivo_anexado
+
+# Aba/arquivo -> tabela exportada
+TABELAS_BACKUP = {
+    "Atletas": Atleta.__table__,
+    "Treinos": Treino.__table__,
+    "Performances": Performance.__table__,
+}
+# Temporadas encerradas, exportadas quando o banco de arquivo está anexado
+TABELAS_ARQUIVO = {
+    "Treinos_Arquivo": TREINOS_ARQUIVO,
+    "Performances_Arquivo": PERFORMANCES_ARQUIVO,
+}
+
+
+def tabelas_backup(db: Session) -> dict:
+    """Tabelas do backup completo: as do banco quente e, se houver temporadas arquivadas, as do arquivo"""
+    if arquivo_anexado(db.connection()):
+        return {**TABELAS_BACKUP, **TABELAS_ARQUIVO}
+    return dict(TABELAS_BACKUP)
+
+
+def _iter_blocos(db: Session, tabela, chunk: int):
+    """Itera as linhas de uma tabela em blocos de `chunk` linhas, ordenadas por id"""
+    result = db.execute(
+        select(*tabela.columns).order_by(tabela.c.id).execution_options(yield_per=chunk)
+    )
+    for bloco in result.partitions():
+        yield bloco
+
+
+def _progresso_blocos(db: Session, tabelas: dict, progresso):
+    """
+    Adapta `progresso(fracao, mensagem)` para ser chamado a cada bloco exportado.
+    Retorna avancar(nome, n_linhas) ou None se não houver callback.
+    """
+    if progresso is None:
+        return None
+    total = sum(db.execute(select(func.count()).select_from(t)).scalar() for t in tabelas.values())
+    feitas = 0
+
+    def avancar(nome: str, n: int):
+        nonlocal feitas
+        feitas += n
+        progresso(feitas / total if total else 1.0, nome)
+    return avancar
+
+
+def exportar_excel(db: Session, destino, chunk: int = EXPORT_CHUNK, progresso=None) -> dict:
+    """
+    Gera o backup .xlsx (uma aba por tabela, ver `tabelas_backup`) com Workbook write-only.
+    `destino` pode ser um caminho ou um arquivo binário aberto. `progresso(fracao, mensagem)`,
+    se informado, é chamado a cada bloco. Retorna {aba: nº de linhas}.
+    """
+    from openpyxl import Workbook
+
+    tabelas = tabelas_backup(db)
+    avancar = _progresso_blocos(db, tabelas, progresso)
+    wb = Workbook(write_only=True)
+    contagem = {}
+    for aba, tabela in tabelas.items():
+        ws = wb.create_sheet(aba)
+        ws.append([c.name for c in tabela.columns])
+        total = 0
+        for bloco in _iter_blocos(db, tabela, chunk):
+            for row in bloco:
+                ws.append(list(row))
+            total += len(bloco)
+            if avancar:
+                avancar(aba, len(bloco))
+        contagem[aba] = total
+    wb.save(destino)
+    return contagem
+
+
+def _schema_arrow(tabela):
+    import pyarrow as pa
+
+    tipos = []
+    for c in tabela.columns:
+        if isinstance(c.type, Integer):
+            tipo = pa.int64()
+        elif isinstance(c.type, Float):
+            tipo = pa.float64()
+        elif isinstance(c.type, Date):
+            tipo = pa.date32()
+        else:
+            tipo = pa.string()
+        tipos.append(pa.field(c.name, tipo))
+    return pa.schema(tipos)
+
+
+def exportar_parquet(db: Session, destino_dir: str, chunk: int = EXPORT_CHUNK, progresso=None) -> dict:
+    """
+    Gera o backup em Parquet (um arquivo por tabela em `destino_dir`, um row group por bloco).
+    Requer pyarrow (dependência opcional). `progresso` como em exportar_excel. Retorna {tabela: nº de linhas}.
+    """
+    import os
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Export Parquet requer o pacote 'pyarrow' (pip install pyarrow)") from e
+
+    os.makedirs(destino_dir, exist_ok=True)
+    tabelas = tabelas_backup(db)
+    avancar = _progresso_blocos(db, tabelas, progresso)
+    contagem = {}
+    for nome, tabela in tabelas.items():
+        schema = _schema_arrow(tabela)
+        caminho = os.path.join(destino_dir, f"{nome.lower()}.parquet")
+        total = 0
+        with pq.ParquetWriter(caminho, schema) as writer:
+            for bloco in _iter_blocos(db, tabela, chunk):
+                colunas = list(zip(*bloco))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=campo.type) for col, campo in zip(colunas, schema)], schema=schema
+                ))
+                total += len(bloco)
+                if avancar:
+                    avancar(nome, len(bloco))
+        contagem[nome] = total
+    return contagem
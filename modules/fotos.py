@@ -0,0 +1,165 @@
+"""
+Módulo de Fotos (Atletas)
+-------------------------
+Armazém de fotos endereçado por conteúdo. O upload é gravado uma única vez sob o SHA-256
+dos bytes (`<hash>.<ext>`, valor guardado em Atleta.foto_path). As miniaturas quadradas de
+cada uso (config.FOTO_MINIATURAS) são geradas uma vez e gravadas em disco. Um LRU em memória
+serve os bytes nas páginas, então listar o elenco com fotos não decodifica a imagem original
+a cada rerun. Como a chave é o conteúdo, nenhuma entrada precisa ser invalidada: outra foto
+é outra chave.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from config import FOTOS_DIR, FOTO_MAX_MB, FOTO_MINIATURAS, FOTO_QUALIDADE, FOTO_CACHE_MAX_MB
+
+# Formatos aceitos (Pillow) -> extensão do original
+FORMATOS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+_CHAVE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp|gif)$")
+
+logger = logging.getLogger("g5.fotos")
+
+
+def _gravar_atomico(caminho: str, conteudo: bytes):
+    """Grava em um temporário e renomeia: leitores nunca veem um arquivo pela metade"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+class FotoStore:
+    """Originais por hash de conteúdo, miniaturas em disco e LRU de miniaturas em memória"""
+
+    def __init__(self, diretorio: str = FOTOS_DIR, max_bytes: int = FOTO_CACHE_MAX_MB * 1024 * 1024):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._itens = OrderedDict() # (chave, lado) -> bytes
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+        self.geradas = 0
+
+    def caminho_original(self, chave: str) -> str:
+        return os.path.join(self.diretorio, "originais", chave[:2], chave)
+
+    def caminho_miniatura(self, chave: str, lado: int) -> str:
+        return os.path.join(self.diretorio, "miniaturas", str(lado), chave[:2], chave.split(".")[0] + ".jpg")
+
+    def salvar(self, conteudo: bytes) -> str:
+        """
+        Valida a imagem e grava o original sob o hash do conteúdo (idempotente: o mesmo arquivo
+        enviado de novo não é regravado). Retorna a chave para Atleta.foto_path.
+        Levanta ValueError para arquivos grandes demais ou que não são imagens aceitas.
+        """
+        if len(conteudo) > FOTO_MAX_MB * 1024 * 1024:
+            raise ValueError(f"Foto maior que {FOTO_MAX_MB} MB")
+        try:
+            with Image.open(io.BytesIO(conteudo)) as img:
+                formato = img.format
+                img.verify()
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Arquivo de imagem inválido: {e}") from e
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato não suportado: {formato} (use {', '.join(FORMATOS)})")
+
+        chave = f"{hashlib.sha256(conteudo).hexdigest()}.{FORMATOS[formato]}"
+        caminho = self.caminho_original(chave)
+        if not os.path.exists(caminho):
+            _gravar_atomico(caminho, conteudo)
+        return chave
+
+    def miniatura(self, chave: Optional[str], uso: str = "lista") -> Optional[bytes]:
+        """
+        Bytes JPEG da miniatura quadrada de `uso` (LRU -> disco -> gera a partir do original).
+        None se não houver foto (chave vazia, fora do padrão ou original ausente).
+        """
+        if not chave or not _CHAVE.match(chave):
+            return None
+        lado = FOTO_MINIATURAS[uso]
+        item = (chave, lado)
+        with self._lock:
+            dados = self._itens.get(item)
+            if dados is not None:
+                self._itens.move_to_end(item)
+                self.hits += 1
+                return dados
+            self.misses += 1
+
+        caminho = self.caminho_miniatura(chave, lado)
+        if os.path.exists(caminho):
+            with open(caminho, "rb") as f:
+                dados = f.read()
+        else:
+            dados = self._gerar(chave, lado)
+            if dados is None:
+                return None
+            _gravar_atomico(caminho, dados)
+
+        with self._lock:
+            if item not in self._itens and len(dados) <= self.max_bytes:
+                self._itens[item] = dados
+                self.bytes_usados += len(dados)
+                self._evict()
+        return dados
+
+    def data_uri(self, chave: Optional[str], uso: str = "lista") -> Optional[str]:
+        """Miniatura como data URI (para st.column_config.ImageColumn)"""
+        dados = self.miniatura(chave, uso)
+        return f"data:image/jpeg;base64,{base64.b64encode(dados).decode()}" if dados else None
+
+    def _gerar(self, chave: str, lado: int) -> Optional[bytes]:
+        """
+        Decodifica o original (JPEG já em escala reduzida via draft) e recorta/redimensiona para lado x lado.
+        None se o original não existir ou estiver corrompido (a página mostra "Sem foto").
+        """
+        original = self.caminho_original(chave)
+        if not os.path.exists(original):
+            return None
+        try:
+            with Image.open(original) as img:
+                img.draft("RGB", (lado, lado))
+                img = ImageOps.exif_transpose(img).convert("RGB")
+                img = ImageOps.fit(img, (lado, lado), Image.Resampling.LANCZOS)
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e: # UnidentifiedImageError é um OSError
+            logger.warning("Foto %s ilegível: %s", chave, e)
+            return None
+        saida = io.BytesIO()
+        img.save(saida, "JPEG", quality=FOTO_QUALIDADE, optimize=True)
+        with self._lock:
+            self.geradas += 1
+        return saida.getvalue()
+
+    def _evict(self):
+        """Remove as miniaturas menos usadas até respeitar o teto de memória (chamar com o lock)"""
+        while self._itens and self.bytes_usados > self.max_bytes:
+            _, dados = self._itens.popitem(last=False)
+            self.bytes_usados -= len(dados)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "miniaturas": len(self._itens),
+                "memoria_mb": round(self.bytes_usados / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "geradas": self.geradas,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            }
+
+
+# Instância Global (process-wide)
+foto_store = FotoStore()
@@ -0,0 +1,394 @@
+"""
+Módulo de Importação (Planilhas da Matriz)
+------------------------------------------
+Importa fichas de treino em CSV/XLSX no mesmo layout da Matriz de Treinos:
+uma linha por atleta ("Atleta" e, opcionalmente, "ID") e uma coluna por dia ("1".."31").
+Linhas especiais, identificadas pela 1ª coluna de rótulo:
+    "Treino"               -> avaliação geral do dia (VALID_TRAINING_FLAGS)
+    nome de TRAINING_TYPES -> checklist do tipo no dia ("x", "1", "sim"...)
+Os arquivos são lidos linha a linha (csv / openpyxl read-only). Células inválidas entram no
+relatório de erros sem interromper a carga; o restante é gravado com upserts em lote, uma
+transação por lote. Também é exposto via linha de comando: `python manage.py import`.
+"""
+
+import codecs
+import csv
+import os
+import re
+import unicodedata
+import zipfile
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import (CATEGORY_RULES, TRAINING_TYPE_BITS, VALID_ATHLETE_FLAGS,
+                    VALID_TRAINING_FLAGS, IMPORT_LOTE, anos_da_categoria)
+from modules.cache import df_cache
+from modules.models import Atleta, Treino, Performance
+
+ROTULO_TREINO = "treino"
+MARCADO = {"x", "1", "s", "sim", "true", "verdadeiro", "ok"}
+DESMARCADO = {"", "0", "n", "nao", "não", "false", "falso", "-"}
+
+# "Sub 14", "sub14", "SUB-14" + "2026-03", "2026_3", "03-2026"
+_RE_CATEGORIA = re.compile(r"sub[\s_-]*(\d+)", re.IGNORECASE)
+_RE_ANO_MES = re.compile(r"(?<!\d)(\d{4})[\s_.-](\d{1,2})(?!\d)|(?<!\d)(\d{1,2})[\s_.-](\d{4})(?!\d)")
+
+
+def _texto(valor) -> str:
+    """Valor de célula (str, int, float do Excel, None) -> texto normalizado"""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _chave_nome(nome: str) -> str:
+    """Chave de comparação de nomes: sem acento, caixa e espaços extras"""
+    sem_acento = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode()
+    return " ".join(sem_acento.casefold().split())
+
+
+# Rótulo normalizado da linha de checklist -> bit do tipo
+_BITS_POR_ROTULO = {_chave_nome(tipo): bit for tipo, bit in TRAINING_TYPE_BITS.items()}
+
+
+def identificar(*textos) -> dict:
+    """
+    Extrai categoria, ano e mês de nomes de arquivo/aba (ex: 'Sub14_2026-03.csv', aba '2026-04').
+    A categoria não é validada aqui ('Sub99' -> 'Sub 99'): `importar_matriz` a confere em CATEGORY_RULES.
+    """
+    achado = {}
+    for texto in textos:
+        texto = os.path.splitext(os.path.basename(texto or ""))[0]
+        m = _RE_CATEGORIA.search(texto)
+        if m:
+            achado["categoria"] = f"Sub {int(m.group(1))}"
+        m = _RE_ANO_MES.search(_RE_CATEGORIA.sub(" ", texto))
+        if m:
+            ano, mes = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+            if 1 <= int(mes) <= 12:
+                achado["ano"], achado["mes"] = int(ano), int(mes)
+    return achado
+
+
+class PlanilhaIlegivel(Exception):
+    """Arquivo que não pôde ser aberto como planilha (xlsx corrompido, formato errado...)"""
+
+
+# Falhas de leitura de um arquivo: entram no relatório de erros e a importação segue para o próximo
+ERROS_LEITURA = (OSError, UnicodeDecodeError, csv.Error, zipfile.BadZipFile, PlanilhaIlegivel)
+
+
+def _codificacao_csv(caminho: str, bloco: int = 1 << 20) -> str:
+    """
+    UTF-8 (com ou sem BOM) se o arquivo inteiro decodifica, senão cp1252 (CSV exportado pelo
+    Excel em Windows pt-BR). Lê em blocos, sem carregar o arquivo na memória.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    with open(caminho, "rb") as f:
+        try:
+            while True:
+                dados = f.read(bloco)
+                decodificador.decode(dados, final=not dados)
+                if not dados:
+                    return "utf-8-sig"
+        except UnicodeDecodeError:
+            return "cp1252"
+
+
+def _ler_planilhas(caminho: str):
+    """Itera (nome_da_aba, linhas) do arquivo; as linhas são lidas sob demanda"""
+    if caminho.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+        try:
+            wb = load_workbook(caminho, read_only=True, data_only=True)
+        except (InvalidFileException, KeyError, ValueError) as e:
+            raise PlanilhaIlegivel(f"{type(e).__name__}: {e}") from e
+        try:
+            for ws in wb.worksheets:
+                yield ws.title, ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        with open(caminho, newline="", encoding=_codificacao_csv(caminho)) as f:
+            amostra = f.read(4096)
+            f.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+            except csv.Error:
+                dialeto = csv.excel
+            yield "", csv.reader(f, dialeto)
+
+
+class _Atletas:
+    """Resolve nome/ID da planilha para Atleta.id (homônimos: prefere os da categoria)"""
+
+    def __init__(self, conn):
+        self.por_nome = defaultdict(list)
+        self.ids = set()
+        self.ativos_por_ano = defaultdict(list)
+        for aid, nome, ano, status in conn.execute(select(Atleta.id, Atleta.nome, Atleta.ano_nascimento, Atleta.status)):
+            self.por_nome[_chave_nome(nome)].append((aid, ano))
+            self.ids.add(aid)
+            if status == "ATIVO":
+                self.ativos_por_ano[ano].append(aid)
+
+    def elenco(self, categoria: str) -> list:
+        """Ids dos atletas ativos da categoria (mesma regra de AtletaService.filtrar_por_categoria)"""
+        return [aid for ano in anos_da_categoria(categoria) for aid in self.ativos_por_ano.get(ano, [])]
+
+    def resolver(self, nome: str, id_planilha: str, categoria: str):
+        """Retorna (atleta_id, None) ou (None, motivo do erro)"""
+        if id_planilha:
+            if id_planilha.isdigit() and int(id_planilha) in self.ids:
+                return int(id_planilha), None
+            return None, f"ID de atleta inexistente: {id_planilha}"
+        candidatos = self.por_nome.get(_chave_nome(nome), [])
+        if len(candidatos) > 1:
+            anos = set(anos_da_categoria(categoria))
+            candidatos = [c for c in candidatos if c[1] in anos]
+        if len(candidatos) == 1:
+            return candidatos[0][0], None
+        return None, ("Atleta não encontrado" if not candidatos else "Nome ambíguo (use a coluna ID)")
+
+
+class _Lote:
+    """
+    Acumula treinos e performances e grava em upserts em lote (uma transação por gravação).
+    Treinos criados pela importação recebem o elenco inteiro como Presente, como os criados na UI
+    (criar_sessao_treino/salvar_matriz_mes); os agregados recebem só os deltas das linhas gravadas.
+    """
+
+    def __init__(self, engine, tamanho: int, atletas: _Atletas):
+        self.engine = engine
+        self.tamanho = tamanho
+        self.atletas = atletas
+        self.treinos = {}      # (categoria, data) -> {"flag": str|None, "mask": int|None}
+        self.performances = {} # (categoria, data, atleta_id) -> flag
+        self.treinos_gravados = set()
+        self.performances_gravadas = 0
+
+    def treino(self, categoria: str, dia: date, flag=None, bit=None):
+        item = self.treinos.setdefault((categoria, dia), {"flag": None, "mask": None})
+        if flag is not None:
+            item["flag"] = flag
+        if bit is not None:
+            item["mask"] = (item["mask"] or 0) | bit
+
+    def performance(self, categoria: str, dia: date, atleta_id: int, flag: str):
+        self.treino(categoria, dia)
+        self.performances[(categoria, dia, atleta_id)] = flag
+        if len(self.performances) >= self.tamanho:
+            self.gravar()
+
+    def _ids_treinos(self, conn) -> dict:
+        """(categoria, data) -> Treino.id dos treinos do lote já existentes (uma consulta por categoria)"""
+        dias_por_cat = defaultdict(set)
+        for cat, d in self.treinos:
+            dias_por_cat[cat].add(d)
+        ids = {}
+        for cat, dias in dias_por_cat.items():
+            ids.update(((cat, d), tid) for d, tid in conn.execute(
+                select(Treino.data, Treino.id).where(Treino.categoria_alvo == cat, Treino.data.in_(dias))
+            ))
+        return ids
+
+    def gravar(self):
+        from modules.services import AgregadoService, TreinoService
+        if not self.treinos:
+            return
+        with self.engine.begin() as conn:
+            # 1. Treinos: cria os que faltam e aplica flag/tipos informados (sem apagar os não informados)
+            existentes = self._ids_treinos(conn)
+            novos = [chave for chave in self.treinos if chave not in existentes]
+            if novos:
+                conn.execute(
+                    sqlite_insert(Treino).on_conflict_do_nothing(index_elements=["data", "categoria_alvo"]),
+                    [{"data": d, "categoria_alvo": cat} for cat, d in novos]
+                )
+            com_valores = [
+                {"b_data": d, "b_cat": cat, "b_flag": v["flag"], "b_mask": v["mask"]}
+                for (cat, d), v in self.treinos.items() if v["flag"] is not None or v["mask"] is not None
+            ]
+            if com_valores:
+                conn.execute(
+                    update(Treino)
+                    .where(Treino.data == bindparam("b_data"), Treino.categoria_alvo == bindparam("b_cat"))
+                    .values(flag_geral=func.coalesce(bindparam("b_flag"), Treino.flag_geral),
+                            tipos_mask=func.coalesce(bindparam("b_mask"), Treino.tipos_mask)),
+                    com_valores,
+                )
+
+            # 2. Ids dos treinos, inclusive os recém-criados
+            ids = self._ids_treinos(conn)
+
+            # 3. Valores atuais das performances tocadas, para o delta dos agregados
+            atuais = {}
+            tocados = sorted({ids[(cat, d)] for cat, d, _ in self.performances if (cat, d) in existentes})
+            for i in range(0, len(tocados), 500):
+                atuais.update(((tid, aid), (presenca, nota)) for tid, aid, presenca, nota in conn.execute(
+                    select(Performance.treino_id, Performance.atleta_id, Performance.presenca, Performance.nota)
+                    .where(Performance.treino_id.in_(tocados[i:i + 500]))
+                ))
+
+            db = Session(bind=conn) # Mesma transação: agregados gravados junto com as performances
+            agregados = AgregadoService(db)
+
+            # 4. Treinos novos: elenco inteiro como Presente, exceto quem tem célula na planilha
+            iniciais = []
+            for cat, d in novos:
+                for aid in self.atletas.elenco(cat):
+                    if (cat, d, aid) not in self.performances:
+                        iniciais.append({"treino_id": ids[(cat, d)], "atleta_id": aid, "presenca": "P"})
+                        agregados.registrar(aid, cat, d, depois=("P", None))
+            if iniciais:
+                conn.execute(
+                    sqlite_insert(Performance).on_conflict_do_nothing(index_elements=["treino_id", "atleta_id"]),
+                    iniciais
+                )
+
+            # 5. Performances: upsert no índice único (treino_id, atleta_id)
+            if self.performances:
+                linhas = []
+                for (cat, d, aid), flag in self.performances.items():
+                    valores = TreinoService._valores_celula(flag)
+                    linhas.append({"treino_id": ids[(cat, d)], "atleta_id": aid, **valores})
+                    agregados.registrar(aid, cat, d, antes=atuais.get((ids[(cat, d)], aid)),
+                                        depois=(valores["presenca"], valores["nota"]))
+                stmt = sqlite_insert(Performance)
+                conn.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["treino_id", "atleta_id"],
+                        set_={c: stmt.excluded[c] for c in ("flag_atleta", "nota", "presenca")},
+                    ),
+                    linhas
+                )
+            agregados.aplicar()
+            db.close()
+        self.treinos_gravados.update(self.treinos)
+        self.performances_gravadas += len(self.performances)
+        self.treinos, self.performances = {}, {}
+
+
+def _importar_planilha(linhas, categoria: str, ano: int, mes: int, atletas: _Atletas, lote: _Lote, erro):
+    """Lê uma aba/arquivo linha a linha, validando e enfileirando as células no lote"""
+    cabecalho = None
+    for n_linha, linha in enumerate(linhas, start=1):
+        valores = [_texto(v) for v in linha]
+        if not any(valores):
+            continue
+        if cabecalho is None:
+            # Cabeçalho: rótulo ("Atleta"), "ID" opcional e colunas de dia válidas para o mês
+            nomes = [v.casefold() for v in valores]
+            if "atleta" not in nomes:
+                erro(n_linha, "", valores[0], "Cabeçalho sem a coluna 'Atleta'")
+                return
+            col_atleta = nomes.index("atleta")
+            col_id = nomes.index("id") if "id" in nomes else None
+            dias = {}
+            for i, v in enumerate(valores):
+                if i in (col_atleta, col_id) or not v:
+                    continue
+                try:
+                    dias[i] = date(ano, mes, int(v))
+                except ValueError:
+                    erro(n_linha, v, v, f"Coluna de dia inválida para {mes:02d}/{ano}")
+            cabecalho = (col_atleta, col_id)
+            continue
+
+        col_atleta, col_id = cabecalho
+        rotulo = valores[col_atleta] if col_atleta < len(valores) else ""
+        celulas = [(i, valores[i]) for i in dias if i < len(valores) and valores[i]]
+
+        # Linha de avaliação geral do treino
+        if rotulo.casefold() == ROTULO_TREINO:
+            for i, v in celulas:
+                if v.upper() in VALID_TRAINING_FLAGS:
+                    lote.treino(categoria, dias[i], flag=v.upper())
+                else:
+                    erro(n_linha, str(dias[i].day), v, "Flag de treino inválida")
+            continue
+
+        # Linha do checklist de tipos
+        bit = _BITS_POR_ROTULO.get(_chave_nome(rotulo))
+        if bit is not None:
+            for i, v in celulas:
+                if v.casefold() in MARCADO:
+                    lote.treino(categoria, dias[i], bit=bit)
+                elif v.casefold() not in DESMARCADO:
+                    erro(n_linha, str(dias[i].day), v, "Marcação de tipo inválida")
+            continue
+
+        # Linha de atleta
+        id_planilha = valores[col_id] if col_id is not None and col_id < len(valores) else ""
+        atleta_id, motivo = atletas.resolver(rotulo, id_planilha, categoria)
+        if atleta_id is None:
+            erro(n_linha, "Atleta", rotulo or id_planilha, motivo)
+            continue
+        for i, v in celulas:
+            if v.upper() in VALID_ATHLETE_FLAGS:
+                lote.performance(categoria, dias[i], atleta_id, v.upper())
+            else:
+                erro(n_linha, str(dias[i].day), v, "Flag de atleta inválida")
+
+
+def importar_matriz(caminhos, categoria: str = None, ano: int = None, mes: int = None,
+                    lote: int = IMPORT_LOTE, engine=None, progresso=None) -> dict:
+    """
+    Importa planilhas no layout da Matriz. Categoria, ano e mês vêm dos parâmetros ou são
+    identificados no nome do arquivo e da aba (ver `identificar`). Células vazias são ignoradas.
+    `progresso(fracao, mensagem)`, se informado, é chamado a cada arquivo.
+    Arquivos ausentes ou ilegíveis, categorias inexistentes e células inválidas entram em "erros"
+    sem interromper a carga; CSVs que não são UTF-8 são lidos como cp1252.
+    Retorna {"arquivos", "planilhas", "treinos", "performances", "erros": [dict]}.
+    Os agregados materializados são atualizados por deltas na transação de cada lote (ver _Lote).
+    """
+    from modules.database import db_engine
+
+    engine = engine or db_engine.engine
+    caminhos = list(caminhos)
+    erros = []
+    with engine.connect() as conn:
+        atletas = _Atletas(conn)
+    buffer = _Lote(engine, lote, atletas)
+
+    planilhas = 0
+    try:
+        for n, caminho in enumerate(caminhos):
+            if progresso:
+                progresso(n / len(caminhos), os.path.basename(caminho))
+            aba = ""
+            try:
+                for aba, linhas in _ler_planilhas(caminho):
+                    alvo = {**identificar(caminho, aba), **{k: v for k, v in
+                            (("categoria", categoria), ("ano", ano), ("mes", mes)) if v is not None}}
+
+                    def erro(linha, coluna, valor, motivo, _aba=aba):
+                        erros.append({"arquivo": caminho, "aba": _aba, "linha": linha, "coluna": coluna,
+                                      "valor": valor, "motivo": motivo})
+
+                    faltando = [k for k in ("categoria", "ano", "mes") if k not in alvo]
+                    if faltando:
+                        erro(0, "", "", f"Não foi possível identificar {', '.join(faltando)} (nome do arquivo/aba ou parâmetros)")
+                        continue
+                    if alvo["categoria"] not in CATEGORY_RULES:
+                        erro(0, "", alvo["categoria"], f"Categoria inexistente (use uma de: {', '.join(CATEGORY_RULES)})")
+                        continue
+                    _importar_planilha(linhas, alvo["categoria"], alvo["ano"], alvo["mes"], atletas, buffer, erro)
+                    planilhas += 1
+            except ERROS_LEITURA as e:
+                # Arquivo ausente/ilegível: o que já foi lido dele segue no lote; os demais arquivos continuam
+                erros.append({"arquivo": caminho, "aba": aba, "linha": 0, "coluna": "", "valor": "",
+                              "motivo": f"Falha ao ler o arquivo: {type(e).__name__}: {e}"})
+        buffer.gravar()
+    finally:
+        # Lotes já gravados (com seus agregados) valem mesmo se a carga falhar no meio
+        df_cache.invalidar()
+    return {"arquivos": len(caminhos), "planilhas": planilhas, "treinos": len(buffer.treinos_gravados),
+            "performances": buffer.performances_gravadas, "erros": erros}
@@ -0,0 +1,361 @@
+"""
+Módulo de Jobs (Segundo Plano)
+------------------------------
+Executa operações pesadas (backup, analytics de todas as categorias, cargas sintéticas)
+fora do script do Streamlit, em pools de threads ou de processos.
+O gerenciador é process-wide (`job_manager`): o job sobrevive a reruns e o resultado
+fica retido até ser coletado por um rerun posterior. A função do job recebe um
+JobContexto como 1º argumento para reportar progresso e checar cancelamento.
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional
+
+from config import CATEGORY_RULES, JOBS_MAX_THREADS, JOBS_MAX_PROCESSOS, JOBS_MAX_RETIDOS, JOBS_DIR
+from modules.cache import df_cache
+
+logger = logging.getLogger("g5.jobs")
+
+# Estados de um job
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO, CANCELADO = "pendente", "executando", "concluido", "erro", "cancelado"
+FINALIZADOS = (CONCLUIDO, ERRO, CANCELADO)
+
+
+class JobCancelado(Exception):
+    """Levantada dentro do job quando o cancelamento é pedido"""
+
+
+class JobContexto:
+    """
+    Passado à função do job. Em jobs de processo, `estado` e `cancelar` são proxies de
+    um multiprocessing.Manager; em jobs de thread, um dict e um threading.Event.
+    """
+
+    def __init__(self, estado, cancelar):
+        self._estado = estado
+        self._cancelar = cancelar
+
+    def progresso(self, fracao: float, mensagem: str = ""):
+        """Atualiza o progresso (0-1) e interrompe o job se o cancelamento foi pedido"""
+        self._estado.update(progresso=max(0.0, min(1.0, float(fracao))), mensagem=mensagem)
+        self.checar()
+
+    def cancelado(self) -> bool:
+        return self._cancelar.is_set()
+
+    def checar(self):
+        if self._cancelar.is_set():
+            raise JobCancelado()
+
+
+class Job:
+    """Um job submetido: estado, progresso e resultado (retido após a conclusão)"""
+
+    def __init__(self, nome: str, tarefa: str, processo: bool, estado, cancelar, invalida_cache: bool):
+        self.id = uuid.uuid4().hex[:8]
+        self.nome = nome
+        self.tarefa = tarefa # Nome da função executada
+        self.processo = processo
+        self.invalida_cache = invalida_cache
+        self.criado = time.time()
+        self.finalizado = None
+        self.resultado = None
+        self.erro = None
+        self.future = None
+        self._estado = estado
+        self._cancelar = cancelar
+
+    @property
+    def status(self) -> str:
+        return self._estado.get("status", PENDENTE)
+
+    @property
+    def progresso(self) -> float:
+        return self._estado.get("progresso", 0.0)
+
+    @property
+    def mensagem(self) -> str:
+        return self._estado.get("mensagem", "")
+
+    @property
+    def duracao(self) -> Optional[float]:
+        inicio = self._estado.get("iniciado")
+        if inicio is None:
+            return None
+        return (self.finalizado or time.time()) - inicio
+
+
+def _remover_arquivo(job: Job):
+    """Apaga o arquivo gerado pelo job (resultado com chave "arquivo") ao descartá-lo"""
+    arquivo = job.resultado.get("arquivo") if isinstance(job.resultado, dict) else None
+    if arquivo and os.path.exists(arquivo):
+        os.remove(arquivo)
+
+
+def _executar(funcao, ctx: JobContexto, args, kwargs):
+    """Roda a função do job (na thread ou no processo worker)"""
+    ctx.checar() # Cancelado enquanto esperava na fila
+    ctx._estado.update(status=EXECUTANDO, iniciado=time.time())
+    return funcao(ctx, *args, **kwargs)
+
+
+# sys.modules é global: quem troca o __main__ (JobManager, relatórios) passa por este lock,
+# senão duas trocas simultâneas podem restaurar o __main__ neutro no lugar do original
+_MAIN_LOCK = threading.RLock()
+
+
+@contextmanager
+def _main_neutro():
+    """
+    O spawn reexecuta o módulo __main__ em cada processo filho; sob o Streamlit o __main__
+    é o script da página (main.py). Enquanto workers/Manager são criados, expõe um __main__
+    vazio para que os filhos importem só os módulos das tarefas. Serializado por _MAIN_LOCK.
+    """
+    with _MAIN_LOCK:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+class JobManager:
+    """Submete, acompanha, cancela e retém jobs. Pools e Manager são criados sob demanda."""
+
+    def __init__(self, max_threads: int = JOBS_MAX_THREADS, max_processos: int = JOBS_MAX_PROCESSOS,
+                 max_retidos: int = JOBS_MAX_RETIDOS):
+        self.max_threads = max_threads
+        self.max_processos = max_processos
+        self.max_retidos = max_retidos
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict() # id -> Job (ordem de submissão)
+        self._threads = None
+        self._processos = None
+        self._manager = None
+
+    def _pool(self, processo: bool):
+        with self._lock:
+            if not processo:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(self.max_threads, thread_name_prefix="g5-job")
+                return self._threads
+            if self._processos is None:
+                # spawn: não herda conexões SQLite nem threads do processo do Streamlit
+                contexto = multiprocessing.get_context("spawn")
+                with _main_neutro():
+                    self._manager = contexto.Manager()
+                self._processos = ProcessPoolExecutor(self.max_processos, mp_context=contexto)
+            return self._processos
+
+    def submeter(self, nome: str, funcao, *args, processo: bool = False, invalida_cache: bool = False,
+                 **kwargs) -> str:
+        """
+        Agenda `funcao(ctx, *args, **kwargs)` e retorna o id do job.
+            processo=True       -> pool de processos (função e argumentos precisam ser picklable)
+            invalida_cache=True -> df_cache.invalidar() ao concluir (o job escreve no banco)
+        """
+        pool = self._pool(processo)
+        if processo:
+            estado, cancelar = self._manager.dict(status=PENDENTE), self._manager.Event()
+        else:
+            estado, cancelar = {"status": PENDENTE}, threading.Event()
+        job = Job(nome, funcao.__name__, processo, estado, cancelar, invalida_cache)
+        with self._lock:
+            self._jobs[job.id] = job
+            # O pool de processos cria workers sob demanda dentro do submit (com o __main__ neutro)
+            with _main_neutro() if processo else nullcontext():
+                job.future = pool.submit(_executar, funcao, JobContexto(estado, cancelar), args, kwargs)
+        job.future.add_done_callback(lambda future: self._concluir(job, future))
+        return job.id
+
+    def _concluir(self, job: Job, future):
+        """Callback de término: fixa status/resultado e libera os proxies do Manager"""
+        try:
+            estado = dict(job._estado)
+        except Exception: # Manager encerrado
+            estado = {}
+        if future.cancelled():
+            estado["status"] = CANCELADO
+        else:
+            exc = future.exception()
+            if exc is None:
+                job.resultado = future.result()
+                estado.update(status=CONCLUIDO, progresso=1.0)
+            elif isinstance(exc, JobCancelado):
+                estado["status"] = CANCELADO
+            else:
+                job.erro = f"{type(exc).__name__}: {exc}"
+                estado["status"] = ERRO
+                logger.error("Job %s (%s) falhou: %s", job.id, job.nome, job.erro)
+        job.finalizado = time.time()
+        job._estado = estado
+        if job.invalida_cache and estado["status"] == CONCLUIDO:
+            df_cache.invalidar()
+        self._reter()
+
+    def _reter(self):
+        """Descarta os jobs finalizados mais antigos além de max_retidos"""
+        with self._lock:
+            finalizados = [j.id for j in self._jobs.values() if j.status in FINALIZADOS]
+            for job_id in finalizados[:max(0, len(finalizados) - self.max_retidos)]:
+                _remover_arquivo(self._jobs.pop(job_id))
+
+    def job(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def listar(self) -> List[Job]:
+        """Jobs retidos, mais recentes primeiro"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancelar(self, job_id: str) -> bool:
+        """Pede o cancelamento: sai da fila se ainda não começou, senão no próximo ctx.progresso()"""
+        job = self.job(job_id)
+        if job is None or job.status in FINALIZADOS:
+            return False
+        job._cancelar.set()
+        job.future.cancel()
+        return True
+
+    def descartar(self, job_id: str):
+        """Remove um job finalizado (após coletar o resultado)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in FINALIZADOS:
+                _remover_arquivo(self._jobs.pop(job_id))
+
+    def encerrar(self, esperar: bool = False):
+        for pool in (self._threads, self._processos):
+            if pool is not None:
+                pool.shutdown(wait=esperar, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+        self._threads = self._processos = self._manager = None
+
+
+# --- TAREFAS ---
+# Cada tarefa abre a própria sessão (sessões não são compartilhadas entre threads/processos).
+
+def _arquivo_job(prefixo: str, sufixo: str) -> str:
+    """Arquivo novo e exclusivo em JOBS_DIR (jobs simultâneos não colidem)"""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    fd, caminho = tempfile.mkstemp(suffix=sufixo, prefix=prefixo, dir=JOBS_DIR)
+    os.close(fd)
+    return caminho
+
+
+def tarefa_export_excel(ctx: JobContexto) -> dict:
+    """Backup .xlsx completo em JOBS_DIR. Retorna {"arquivo": caminho, "linhas": {aba: n}}"""
+    from modules.database import db_engine
+    from modules.export import exportar_excel
+
+    destino = _arquivo_job("g5_backup_", ".xlsx")
+    try:
+        with db_engine.sessao() as db:
+            linhas = exportar_excel(db, destino, progresso=ctx.progresso)
+    except BaseException:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise
+    return {"arquivo": destino, "linhas": linhas}
+
+
+def tarefa_analytics_categorias(ctx: JobContexto, categorias=None) -> dict:
+    """Ranking Score G5 e alertas de todas as categorias. Retorna {categoria: {"ranking", "alertas"}}"""
+    from modules.database import db_engine
+    from modules.services import TreinoService
+    from modules.analytics import AnalyticsEngine
+
+    categorias = list(categorias or CATEGORY_RULES.keys())
+    resultado = {}
+    with db_engine.sessao() as db:
+        treino_service = TreinoService(db)
+        for i, cat in enumerate(categorias):
+            ctx.progresso(i / len(categorias), cat)
+            df = treino_service.get_dataframe_performances(cat)
+            resultado[cat] = {
+                "ranking": AnalyticsEngine.gerar_ranking_evolucao(df),
+                "alertas": AnalyticsEngine.alertas_criticos(df),
+            }
+    return resultado
+
+
+def tarefa_reconstruir_agregados(ctx: JobContexto) -> dict:
+    """Recalcula os agregados materializados a partir de performances. Retorna {"agregados": n}"""
+    from modules.database import db_engine
+    from modules.models import AgregadoAtleta
+    from modules.services import AgregadoService
+
+    ctx.progresso(0.0, "Recalculando agregados")
+    with db_engine.sessao() as db:
+        AgregadoService(db).reconstruir()
+        return {"agregados": db.query(AgregadoAtleta).count()}
+
+
+def tarefa_fechar_temporada(ctx: JobContexto, temporada: int) -> dict:
+    """
+    Arquiva uma temporada encerrada (temporadas.fechar_temporada). Submeter em thread: o pool do
+    engine é recriado para anexar o arquivo, e isso precisa acontecer no processo do app.
+    """
+    from modules.temporadas import fechar_temporada
+
+    ctx.progresso(0.0, f"Arquivando temporada {temporada}")
+    return {"temporada": temporada, **fechar_temporada(temporada)}
+
+
+def tarefa_relatorios(ctx: JobContexto, ano: int, mes: int, categorias=None) -> dict:
+    """
+    PDFs mensais por atleta num .zip em JOBS_DIR (relatorios.gerar_relatorios). Submeter em thread:
+    a renderização já abre o próprio pool de processos. Retorna {"arquivo": caminho, "relatorios": n}.
+    """
+    from modules.database import db_engine
+    from modules.relatorios import gerar_relatorios
+
+    destino = _arquivo_job(f"g5_relatorios_{ano}-{mes:02d}_", ".zip")
+    ctx.progresso(0.0, "Carregando dados")
+    try:
+        with db_engine.sessao() as db:
+            return gerar_relatorios(db, ano, mes, destino, categorias=categorias, progresso=ctx.progresso)
+    except BaseException:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise
+
+
+def tarefa_banco_sintetico(ctx: JobContexto, **parametros) -> dict:
+    """
+    Gera um banco SQLite separado (JOBS_DIR) com gerar_dados_sinteticos, para testes de carga
+    sem tocar no banco em uso. Retorna {"arquivo": caminho, **contagem}.
+    """
+    from sqlalchemy import create_engine
+    from modules.database import Base
+    from modules.utils import gerar_dados_sinteticos
+
+    destino = _arquivo_job("g5_sintetico_", ".db")
+    engine = create_engine(f"sqlite:///{destino}")
+    try:
+        Base.metadata.create_all(engine)
+        contagem = gerar_dados_sinteticos(engine=engine, progresso=ctx.progresso, **parametros)
+    except BaseException:
+        engine.dispose()
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise
+    engine.dispose()
+    return {"arquivo": destino, **contagem}
+
+
+job_manager = JobManager()
@@ -0,0 +1,58 @@
+"""
+Módulo de Leitura Colunar (Analytics)
+-------------------------------------
+Caminho de leitura dos loaders de analytics, sem a camada do ORM nem um Row por linha.
+O statement Core roda pela conexão da sessão, então os eventos (profiling de SQL, funções
+registradas, banco de arquivo anexado) continuam valendo. As linhas vêm direto do cursor
+DBAPI em blocos de `fetchmany` e viram um array NumPy por coluna. Assim, cargas de muitas
+temporadas não acumulam centenas de milhares de tuplas na memória.
+"""
+
+from typing import Dict, Iterator
+
+import numpy as np
+import pandas as pd
+
+from config import LEITURA_BLOCO
+
+
+def iterar_blocos(conn, stmt, tipos: Dict[str, object], bloco: int = LEITURA_BLOCO) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Executa `stmt` e gera blocos de até `bloco` linhas como {coluna: np.ndarray}.
+    `tipos` dá o dtype NumPy de cada coluna do SELECT, na mesma ordem. Inteiros que podem ser
+    NULL usam float64 (None -> NaN; ver `inteiro_anulavel`), textos usam object e datas ISO
+    ("AAAA-MM-DD") podem ir direto para datetime64.
+    """
+    nomes = list(tipos)
+    resultado = conn.execute(stmt)
+    try:
+        cursor = resultado.cursor  # Cursor DBAPI: tuplas cruas, sem processadores de tipo do SQLAlchemy
+        while True:
+            linhas = cursor.fetchmany(bloco)
+            if not linhas:
+                break
+            yield {nome: np.array(valores, dtype=tipos[nome]) for nome, valores in zip(nomes, zip(*linhas))}
+    finally:
+        resultado.close()
+
+
+def ler_colunas(conn, stmt, tipos: Dict[str, object], bloco: int = LEITURA_BLOCO) -> Dict[str, np.ndarray]:
+    """Todas as linhas de `stmt` como {coluna: np.ndarray} (os blocos de `iterar_blocos` concatenados)"""
+    blocos = list(iterar_blocos(conn, stmt, tipos, bloco))
+    if not blocos:
+        return {nome: np.array([], dtype=tipo) for nome, tipo in tipos.items()}
+    if len(blocos) == 1:
+        return blocos[0]
+    return {nome: np.concatenate([b[nome] for b in blocos]) for nome in tipos}
+
+
+def ler_dataframe(conn, stmt, tipos: Dict[str, object], bloco: int = LEITURA_BLOCO) -> pd.DataFrame:
+    """`ler_colunas` como DataFrame, com as colunas na ordem de `tipos`"""
+    return pd.DataFrame(ler_colunas(conn, stmt, tipos, bloco), columns=list(tipos))
+
+
+def inteiro_anulavel(valores: np.ndarray, dtype: str = "Int8") -> pd.api.extensions.ExtensionArray:
+    """Coluna float64 com NaN (inteiro anulável lido por `ler_colunas`) -> inteiro anulável do pandas"""
+    nulos = np.isnan(valores)
+    inteiros = np.where(nulos, 0, valores).astype(pd.api.types.pandas_dtype(dtype).numpy_dtype)
+    return pd.arrays.IntegerArray(inteiros, nulos)
@@ -0,0 +1,130 @@
+"""
+Módulo de Migrações (Schema Migrations)
+---------------------------------------
+Runner versionado e leve para o SQLite. `create_all` só cria tabelas novas e nunca altera
+as existentes, então colunas/índices novos em bancos antigos (ex: g5_system.db) entram aqui.
+A versão aplicada fica em `PRAGMA user_version`; cada migração roda na sua própria transação
+e é idempotente (também roda sem efeito em bancos recém-criados pelo create_all).
+"""
+
+import sqlite3
+
+from sqlalchemy import inspect
+
+from config import TRAINING_TYPES
+
+# (versao, descricao, funcao(conn))
+MIGRACOES = []
+
+
+def migracao(versao: int, descricao: str):
+    """Registra uma função de migração na versão informada"""
+    def registrar(fn):
+        MIGRACOES.append((versao, descricao, fn))
+        return fn
+    return registrar
+
+
+def _colunas(conn, tabela: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(tabela)}
+
+
+@migracao(1, "atletas.ano_nascimento indexado + índice performances.atleta_id")
+def _m001_ano_nascimento(conn):
+    if "ano_nascimento" not in _colunas(conn, "atletas"):
+        conn.exec_driver_sql("ALTER TABLE atletas ADD COLUMN ano_nascimento INTEGER")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_atletas_ano_nascimento ON atletas (ano_nascimento)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_performances_atleta_id ON performances (atleta_id)")
+    conn.exec_driver_sql(
+        "UPDATE atletas SET ano_nascimento = CAST(strftime('%Y', data_nascimento) AS INTEGER) "
+        "WHERE ano_nascimento IS NULL"
+    )
+
+
+@migracao(2, "treinos: (data, categoria_alvo) único, com de-duplicação")
+def _m002_treinos_unicos(conn):
+    # Mantém o treino de menor id de cada (data, categoria) e move as performances dos duplicados para ele
+    conn.exec_driver_sql("""
+        CREATE TEMP TABLE _treinos_dup AS
+        SELECT t.id AS dup_id, k.keep_id
+        FROM treinos t
+        JOIN (SELECT data, categoria_alvo, MIN(id) AS keep_id FROM treinos GROUP BY data, categoria_alvo) k
+          ON k.data = t.data AND k.categoria_alvo = t.categoria_alvo
+        WHERE t.id <> k.keep_id
+    """)
+    conn.exec_driver_sql("""
+        UPDATE performances
+        SET treino_id = (SELECT keep_id FROM _treinos_dup WHERE dup_id = performances.treino_id)
+        WHERE treino_id IN (SELECT dup_id FROM _treinos_dup)
+    """)
+    conn.exec_driver_sql("DELETE FROM treinos WHERE id IN (SELECT dup_id FROM _treinos_dup)")
+    conn.exec_driver_sql("DROP TABLE _treinos_dup")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_treinos_data_categoria ON treinos (data, categoria_alvo)"
+    )
+
+
+@migracao(3, "performances: (treino_id, atleta_id) único, com de-duplicação")
+def _m003_performances_unicas(conn):
+    # Mantém a performance de menor id do par (a que a Matriz exibia e editava)
+    removidas = conn.exec_driver_sql("""
+        DELETE FROM performances
+        WHERE id NOT IN (SELECT MIN(id) FROM performances GROUP BY treino_id, atleta_id)
+    """).rowcount
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_performances_treino_atleta ON performances (treino_id, atleta_id)"
+    )
+    if removidas:
+        # Agregados contaram as duplicatas: esvazia para o rebuild automático do init_tables
+        conn.exec_driver_sql("DELETE FROM agregados_atleta")
+        conn.exec_driver_sql("DELETE FROM agregados_atleta_mes")
+
+
+@migracao(4, "treinos.tipos_mask (bitmask de TRAINING_TYPES) no lugar de tipos_realizados")
+def _m004_tipos_mask(conn):
+    colunas = _colunas(conn, "treinos")
+    if "tipos_mask" not in colunas:
+        conn.exec_driver_sql("ALTER TABLE treinos ADD COLUMN tipos_mask INTEGER NOT NULL DEFAULT 0")
+    if "tipos_realizados" in colunas:
+        # Um UPDATE por tipo: liga o bit quando o nome aparece na lista "A,B,C" (comparação exata)
+        for i, tipo in enumerate(TRAINING_TYPES):
+            conn.exec_driver_sql(
+                "UPDATE treinos SET tipos_mask = tipos_mask | ? "
+                "WHERE instr(',' || tipos_realizados || ',', ?) > 0",
+                (1 << i, f",{tipo},"),
+            )
+        # DROP COLUMN existe a partir do SQLite 3.35; antes disso a coluna antiga só deixa de ser usada
+        if sqlite3.sqlite_version_info >= (3, 35):
+            conn.exec_driver_sql("ALTER TABLE treinos DROP COLUMN tipos_realizados")
+
+
+@migracao(5, "índices por categoria + período para consultas limitadas à temporada")
+def _m005_indices_temporada(conn):
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_treinos_categoria_data ON treinos (categoria_alvo, data)")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_agregados_mes_categoria ON agregados_atleta_mes (categoria, ano, mes)"
+    )
+
+
+@migracao(6, "agregados_atleta.ultimas_notas limitadas à temporada atual")
+def _m006_ultimas_notas_temporada(conn):
+    # ultimas_notas antigas cobriam todo o histórico: esvazia para o rebuild automático do init_tables
+    conn.exec_driver_sql("DELETE FROM agregados_atleta")
+    conn.exec_driver_sql("DELETE FROM agregados_atleta_mes")
+
+
+def versao_atual(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def aplicar_migracoes(engine) -> list:
+    """Aplica, em ordem, as migrações com versão maior que a do banco. Retorna as aplicadas."""
+    aplicadas = []
+    for versao, descricao, fn in sorted(MIGRACOES, key=lambda m: m[0]):
+        with engine.begin() as conn:
+            if versao <= versao_atual(conn):
+                continue
+            fn(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(versao)}")
+        aplicadas.append((versao, descricao))
+    return aplicadas
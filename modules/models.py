@@ -5,8 +5,8 @@ Define a estrutura das tabelas usando SQLAlchemy.
 Entidades: Atleta, Treino, Frequencia (Performance).
 """
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Enum, Float, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Enum, Float, Text, Index
+from sqlalchemy.orm import relationship, validates
 from modules.database import Base
 import datetime
 
@@ -19,6 +19,8 @@ class Atleta(Base):
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, index=True, nullable=False)
     data_nascimento = Column(Date, nullable=False)
+    # Ano de nascimento desnormalizado (indexado) para resolver categorias via SQL
+    ano_nascimento = Column(Integer, index=True, nullable=True)
     posicao = Column(String, nullable=True) # Ex: Goleiro, Atacante
     status = Column(String, default="ATIVO") # ATIVO, INATIVO
     contato_pais = Column(String, nullable=True)
@@ -28,6 +30,12 @@ class Atleta(Base):
     # Relationships
     performances = relationship("Performance", back_populates="atleta", cascade="all, delete-orphan")
     
+    @validates("data_nascimento")
+    def _sincronizar_ano_nascimento(self, key, value):
+        """Mantém ano_nascimento consistente com data_nascimento"""
+        self.ano_nascimento = value.year if value else None
+        return value
+
     @property
     def idade(self):
         """Calcula idade baseado no ano atual"""
@@ -37,12 +45,8 @@ class Atleta(Base):
     @property
     def categoria_calculada(self):
         """Retorna a categoria (ex: Sub 14) baseado na configuração de anos"""
-        from config import CATEGORY_RULES
-        ano_nasc = self.data_nascimento.year
-        for cat, anos in CATEGORY_RULES.items():
-            if ano_nasc in anos:
-                return cat
-        return "Sem Categoria"
+        from config import categoria_do_ano
+        return categoria_do_ano(self.data_nascimento.year)
 
     def __repr__(self):
         return f"<Atleta(nome={self.nome}, cat={self.categoria_calculada})>"
@@ -55,6 +59,12 @@ class Treino(Base):
     uma sessão principal com flags de tipos.
     """
     __tablename__ = "treinos"
+    __table_args__ = (
+        # Treino é sempre buscado por (data, categoria): um treino por dia por categoria
+        Index("ux_treinos_data_categoria", "data", "categoria_alvo", unique=True),
+        # Consultas dos serviços: uma categoria dentro da janela da temporada (range scan em data)
+        Index("ix_treinos_categoria_data", "categoria_alvo", "data"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     data = Column(Date, nullable=False)
@@ -64,13 +74,19 @@ class Treino(Base):
     flag_geral = Column(String, nullable=True) # 1-3, FO, AM, CH (Legenda Treino)
     obs_geral = Column(Text, nullable=True)
     
-    # Checklist de Tipos (Armazenado como string separada por virgula ou JSON simples)
-    # Ex: "Físico,Tático"
-    tipos_realizados = Column(String, default="") 
+    # Checklist de Tipos como bitmask (bit i = config.TRAINING_TYPES[i])
+    # Ex: Físico + Tático = 0b101 = 5
+    tipos_mask = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     performances = relationship("Performance", back_populates="treino", cascade="all, delete-orphan")
 
+    @property
+    def tipos(self) -> list:
+        """Tipos realizados (decodificados de tipos_mask)"""
+        from config import mask_para_tipos
+        return mask_para_tipos(self.tipos_mask or 0)
+
     def __repr__(self):
         return f"<Treino(data={self.data}, cat={self.categoria_alvo})>"
 
@@ -81,10 +97,14 @@ class Performance(Base):
     Tabela de junção entre Atleta e Treino com atributos extras.
     """
     __tablename__ = "performances"
+    __table_args__ = (
+        # Uma performance por atleta por treino (também serve de índice para treino_id)
+        Index("ux_performances_treino_atleta", "treino_id", "atleta_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     treino_id = Column(Integer, ForeignKey("treinos.id"), nullable=False)
-    atleta_id = Column(Integer, ForeignKey("atletas.id"), nullable=False)
+    atleta_id = Column(Integer, ForeignKey("atletas.id"), nullable=False, index=True)
     
     # Dados de Performance
     presenca = Column(String, default="P") # P=Presente, F=Falta, J=Justificada
@@ -98,3 +118,51 @@ class Performance(Base):
     
     def __repr__(self):
         return f"<Perf(atleta={self.atleta_id}, nota={self.nota})>"
+
+
+class AgregadoAtleta(Base):
+    """
+    Agregado materializado de Performance por Atleta/Categoria.
+    Mantido incrementalmente na escrita (AgregadoService) para que Dashboard, Ranking e KPIs
+    não precisem varrer todas as performances.
+    """
+    __tablename__ = "agregados_atleta"
+
+    atleta_id = Column(Integer, ForeignKey("atletas.id"), primary_key=True)
+    categoria = Column(String, primary_key=True)
+
+    total = Column(Integer, nullable=False, default=0) # Nº de performances registradas
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    n_notas = Column(Integer, nullable=False, default=0)
+    soma_notas = Column(Integer, nullable=False, default=0)
+    soma_quadrados = Column(Integer, nullable=False, default=0)
+    # Últimas N notas da temporada atual (mais antiga -> mais recente), vazio = sem nota. Ex: "2,,3,3,1"
+    ultimas_notas = Column(String, nullable=False, default="")
+
+    def __repr__(self):
+        return f"<Agregado(atleta={self.atleta_id}, cat={self.categoria}, total={self.total})>"
+
+
+class AgregadoAtletaMes(Base):
+    """Agregado materializado de Performance por Atleta/Categoria/Mês."""
+    __tablename__ = "agregados_atleta_mes"
+    __table_args__ = (
+        # Estatísticas da categoria somam só os meses da temporada
+        Index("ix_agregados_mes_categoria", "categoria", "ano", "mes"),
+    )
+
+    atleta_id = Column(Integer, ForeignKey("atletas.id"), primary_key=True)
+    categoria = Column(String, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+
+    total = Column(Integer, nullable=False, default=0)
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    n_notas = Column(Integer, nullable=False, default=0)
+    soma_notas = Column(Integer, nullable=False, default=0)
+    soma_quadrados = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AgregadoMes(atleta={self.atleta_id}, cat={self.categoria}, {self.mes}/{self.ano})>"
@@ -0,0 +1,175 @@
+"""
+Módulo de Profiling (SQL Instrumentation)
+-----------------------------------------
+Hooks de evento do SQLAlchemy sobre `db_engine.engine` que medem, por render de página
+(um rerun do Streamlit), o número de queries, o tempo total e as mais lentas.
+Um detector aponta padrões N+1: o mesmo statement executado várias vezes com parâmetros
+diferentes (ex: get_treino_do_dia por dia, lazy load de `performances`).
+Relatórios ficam em memória (painel em Configurações) e, opcionalmente, num log rotativo.
+TemposInicializacao cronometra as etapas do script (imports, init, render): partida a frio x rerun.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from modules.database import db_engine
+from config import PROFILER_MAX_RELATORIOS, PROFILER_TOP_LENTAS, PROFILER_N1_LIMIAR, QUERY_LOG_PATH
+
+
+class QueryProfiler:
+    """Coletor de queries por render, ligado aos eventos de cursor do engine"""
+
+    def __init__(self, max_relatorios: int = PROFILER_MAX_RELATORIOS, top_lentas: int = PROFILER_TOP_LENTAS,
+                 limiar_n1: int = PROFILER_N1_LIMIAR, log_path: str = QUERY_LOG_PATH):
+        self.top_lentas = top_lentas
+        self.limiar_n1 = limiar_n1
+        self._local = threading.local() # Um coletor por thread (cada sessão Streamlit roda na sua)
+        self._lock = threading.Lock()
+        self._relatorios = deque(maxlen=max_relatorios)
+        self._logger = None
+        if log_path:
+            self._logger = logging.getLogger("g5.queries")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(RotatingFileHandler(log_path, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"))
+
+    def instalar(self, engine):
+        """Registra os hooks before/after_cursor_execute no engine"""
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._depois)
+
+    # --- Hooks ---
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, "coletor", None) is not None:
+            conn.info.setdefault("g5_inicio_query", []).append(time.perf_counter())
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany):
+        coletor = getattr(self._local, "coletor", None)
+        if coletor is None or not conn.info.get("g5_inicio_query"):
+            return
+        duracao = (time.perf_counter() - conn.info["g5_inicio_query"].pop()) * 1000
+        coletor["queries"].append((statement, repr(parameters)[:200], duracao, executemany))
+
+    # --- Ciclo de render ---
+    @contextmanager
+    def render(self, pagina: str = "?"):
+        """
+        Escopo de um render. O dict retornado permite ajustar a página depois
+        (ex: render["pagina"] = menu). O relatório é fechado mesmo em st.rerun/st.stop.
+        """
+        coletor = {"pagina": pagina, "inicio": time.perf_counter(), "queries": []}
+        self._local.coletor = coletor
+        try:
+            yield coletor
+        finally:
+            self._local.coletor = None
+            self._finalizar(coletor)
+
+    def _finalizar(self, coletor: dict):
+        queries = coletor["queries"]
+        por_statement = defaultdict(lambda: {"execucoes": 0, "params": set(), "tempo_ms": 0.0})
+        for statement, params, duracao, _ in queries:
+            agg = por_statement[statement]
+            agg["execucoes"] += 1
+            agg["params"].add(params)
+            agg["tempo_ms"] += duracao
+
+        suspeitas_n1 = sorted(
+            (
+                {"sql": sql, "execucoes": agg["execucoes"], "params_distintos": len(agg["params"]),
+                 "tempo_ms": round(agg["tempo_ms"], 2)}
+                for sql, agg in por_statement.items()
+                if agg["execucoes"] >= self.limiar_n1 and len(agg["params"]) > 1
+            ),
+            key=lambda x: x["execucoes"], reverse=True,
+        )
+        lentas = sorted(queries, key=lambda q: q[2], reverse=True)[:self.top_lentas]
+        relatorio = {
+            "pagina": coletor["pagina"],
+            "quando": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "render_ms": round((time.perf_counter() - coletor["inicio"]) * 1000, 2),
+            "queries": len(queries),
+            "sql_ms": round(sum(q[2] for q in queries), 2),
+            "lentas": [{"sql": q[0], "params": q[1], "ms": round(q[2], 2)} for q in lentas],
+            "suspeitas_n1": suspeitas_n1,
+        }
+        with self._lock:
+            self._relatorios.append(relatorio)
+        if self._logger:
+            self._logger.info(json.dumps(relatorio, ensure_ascii=False))
+        return relatorio
+
+    def relatorios(self) -> list:
+        """Relatórios mais recentes primeiro"""
+        with self._lock:
+            return list(reversed(self._relatorios))
+
+
+class TemposInicializacao:
+    """
+    Tempo das etapas de um run do script (imports, init do banco, dados de demonstração, render).
+    Guarda o primeiro run do processo (partida a frio) e o rerun mais recente; etapas feitas uma
+    vez por processo só aparecem no frio. Um run por thread (cada sessão Streamlit roda na sua).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.frio = None
+        self.ultimo = None
+        self._logger = logging.getLogger("g5.startup")
+
+    def iniciar(self, inicio: float = None):
+        """Abre o run desta thread; `inicio` (perf_counter) conta o que rodou antes (ex: imports do script)"""
+        self._local.run = {"inicio": inicio or time.perf_counter(), "etapas": {}}
+
+    def registrar(self, etapa: str, inicio: float):
+        """Registra a etapa com a duração desde `inicio` (perf_counter)"""
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["etapas"][etapa] = round((time.perf_counter() - inicio) * 1000, 2)
+
+    @contextmanager
+    def etapa(self, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, inicio)
+
+    def concluir(self):
+        """Fecha o run desta thread; o primeiro do processo fica como partida a frio (e vai para o log)"""
+        run = getattr(self._local, "run", None)
+        if run is None:
+            return
+        self._local.run = None
+        resultado = {"etapas": run["etapas"], "total_ms": round((time.perf_counter() - run["inicio"]) * 1000, 2)}
+        with self._lock:
+            if self.frio is None:
+                self.frio = resultado
+                self._logger.info("Partida a frio: %s", json.dumps(resultado, ensure_ascii=False))
+            self.ultimo = resultado
+
+    def relatorio(self) -> list:
+        """[{"etapa", "frio_ms", "rerun_ms"}] na ordem das etapas, com o total ao final"""
+        with self._lock:
+            frio, ultimo = self.frio, self.ultimo
+        if frio is None:
+            return []
+        etapas = list(dict.fromkeys([*frio["etapas"], *ultimo["etapas"]]))
+        linhas = [{"etapa": e, "frio_ms": frio["etapas"].get(e), "rerun_ms": ultimo["etapas"].get(e)} for e in etapas]
+        linhas.append({"etapa": "total", "frio_ms": frio["total_ms"], "rerun_ms": ultimo["total_ms"]})
+        return linhas
+
+
+# Instâncias Globais (profiler instalado no engine do app)
+query_profiler = QueryProfiler()
+query_profiler.instalar(db_engine.engine)
+tempos_inicializacao = TemposInicializacao()
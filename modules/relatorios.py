@@ -0,0 +1,334 @@
+"""
+Módulo de Relatórios (PDF Mensal por Atleta)
+--------------------------------------------
+Relatório do mês em PDF para cada atleta de uma ou mais categorias (ou do clube inteiro):
+KPIs do mês, presença dia a dia e o histórico mensal do Score G5 na temporada.
+Os dados de todos os atletas vêm de uma única consulta (leitura colunar) e viram um dicionário
+simples por atleta. A renderização (fpdf) é dividida em lotes entre processos e os PDFs são
+gravados num .zip. Também é exposto via linha de comando: `python manage.py relatorios`.
+"""
+
+import calendar
+import multiprocessing
+import re
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import List, Optional
+
+from fpdf import FPDF
+
+from config import (Colors, RANKING_MIN_NOTAS, RELATORIOS_LOTE, RELATORIOS_PROCESSOS,
+                    janela_temporada, meses_da_temporada, temporada_da_data)
+
+MARGEM = 12                 # mm
+LARGURA_UTIL = 210 - 2 * MARGEM
+CORES_PRESENCA = {"P": Colors.SUCCESS, "F": Colors.DANGER, "J": Colors.WARNING}
+
+
+# --- DADOS (UMA CONSULTA) ---
+
+def carregar_dados(db, ano: int, mes: int, categorias: Optional[List[str]] = None) -> List[dict]:
+    """
+    Lê de uma vez as performances de todos os atletas do início da temporada até o fim do mês
+    (temporadas arquivadas incluídas) e monta um dicionário picklable por atleta/categoria com
+    atividade no mês: atleta_id, atleta, categoria, ano, mes,
+        kpis      -> treinos, presencas, faltas, justificadas, frequencia, media, desvio, score,
+                     media_categoria, posicao, ranqueados
+        presenca  -> [(dia, presença, nota), ...] dos treinos do mês
+        historico -> [("MM/AA", média, score), ...] dos meses da temporada até o mês
+    """
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import String, select, type_coerce, union_all
+    from modules.leitura import ler_colunas
+    from modules.models import Atleta
+    from modules.temporadas import tabelas_leitura
+
+    inicio_mes = date(ano, mes, 1)
+    fim_mes = date(ano, mes, calendar.monthrange(ano, mes)[1])
+    temporada = temporada_da_data(inicio_mes)
+    inicio = janela_temporada(temporada)[0]
+
+    conn = db.connection()
+    partes = []
+    for treinos, performances in tabelas_leitura(conn, inicio < janela_temporada()[0]):
+        parte = (
+            select(performances.c.atleta_id, Atleta.nome, treinos.c.categoria_alvo,
+                   type_coerce(treinos.c.data, String), performances.c.nota, performances.c.presenca)
+            .select_from(performances)
+            .join(treinos, performances.c.treino_id == treinos.c.id)
+            .join(Atleta, Atleta.id == performances.c.atleta_id)
+            .where(treinos.c.data.between(inicio, fim_mes))
+        )
+        if categorias:
+            parte = parte.where(treinos.c.categoria_alvo.in_(list(categorias)))
+        partes.append(parte)
+    stmt = partes[0] if len(partes) == 1 else union_all(*partes)
+    df = pd.DataFrame(ler_colunas(conn, stmt, {
+        "atleta_id": np.int64, "atleta": object, "categoria": object,
+        "data": "datetime64[D]", "nota": np.float64, "presenca": object,
+    }))
+    df["periodo"] = df["data"].dt.year * 12 + df["data"].dt.month - 1
+    periodo_ref = ano * 12 + mes - 1
+    chaves = ["categoria", "atleta_id"]
+
+    # Média / desvio / Score G5 por atleta e mês da temporada (inclui o mês do relatório)
+    hist = df.groupby([*chaves, "periodo"])["nota"].agg(["mean", "std", "count"])
+    hist["score"] = hist["mean"] * (1 - hist["std"].fillna(0) / 10)
+
+    no_mes = df[df["periodo"] == periodo_ref].sort_values([*chaves, "data"])
+    if no_mes.empty:
+        return []
+    kpis = no_mes.assign(
+        P=no_mes["presenca"].eq("P"), F=no_mes["presenca"].eq("F"), J=no_mes["presenca"].eq("J")
+    ).groupby(chaves).agg(
+        atleta=("atleta", "first"), treinos=("presenca", "size"),
+        presencas=("P", "sum"), faltas=("F", "sum"), justificadas=("J", "sum"),
+    )
+    mes_stats = hist.xs(periodo_ref, level="periodo")
+    kpis = kpis.join(mes_stats)
+    # Posição na categoria pelo Score G5 do mês (mesmo mínimo de notas do ranking)
+    elegivel = kpis["count"] >= RANKING_MIN_NOTAS
+    kpis["posicao"] = kpis["score"].where(elegivel).groupby(level="categoria").rank(ascending=False, method="min")
+    kpis["ranqueados"] = elegivel.groupby(level="categoria").transform("sum")
+    media_categoria = no_mes.groupby("categoria")["nota"].mean()
+
+    meses = [(a, m) for a, m in meses_da_temporada(temporada) if a * 12 + m - 1 <= periodo_ref]
+    historicos = {chave: g.droplevel(chaves) for chave, g in hist.groupby(level=chaves)}
+    dias = {chave: g for chave, g in no_mes.groupby(chaves)}
+
+    def numero(valor):
+        return None if pd.isna(valor) else float(valor)
+
+    dados = []
+    for (categoria, atleta_id), k in kpis.iterrows():
+        h = historicos[(categoria, atleta_id)]
+        d = dias[(categoria, atleta_id)]
+        dados.append({
+            "atleta_id": int(atleta_id), "atleta": k["atleta"], "categoria": categoria, "ano": ano, "mes": mes,
+            "kpis": {
+                "treinos": int(k["treinos"]), "presencas": int(k["presencas"]),
+                "faltas": int(k["faltas"]), "justificadas": int(k["justificadas"]),
+                "frequencia": k["presencas"] / k["treinos"] * 100,
+                "media": numero(k["mean"]), "desvio": numero(k["std"]), "score": numero(k["score"]),
+                "media_categoria": numero(media_categoria.get(categoria)),
+                "posicao": None if pd.isna(k["posicao"]) else int(k["posicao"]), "ranqueados": int(k["ranqueados"]),
+            },
+            "presenca": [(int(dia.day), p or "", None if np.isnan(n) else int(n))
+                         for dia, p, n in zip(d["data"], d["presenca"], d["nota"])],
+            "historico": [
+                (f"{m:02d}/{a % 100:02d}",
+                 numero(h.at[a * 12 + m - 1, "mean"]) if a * 12 + m - 1 in h.index else None,
+                 numero(h.at[a * 12 + m - 1, "score"]) if a * 12 + m - 1 in h.index else None)
+                for a, m in meses
+            ],
+        })
+    return dados
+
+
+# --- RENDERIZAÇÃO (FPDF) ---
+
+def _texto(valor) -> str:
+    """As fontes padrão do PDF são latin-1: caracteres fora dela viram '?'"""
+    return str(valor).encode("latin-1", "replace").decode("latin-1")
+
+
+def _rgb(cor: str) -> tuple:
+    return tuple(int(cor[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def _fmt(valor, formato: str = "{:.2f}") -> str:
+    return "-" if valor is None else formato.format(valor)
+
+
+def _secao(pdf: FPDF, titulo: str):
+    pdf.ln(4)
+    pdf.set_x(MARGEM)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.set_text_color(30, 30, 30)
+    pdf.cell(0, 8, _texto(titulo), ln=1)
+
+
+def _cabecalho(pdf: FPDF, dados: dict):
+    pdf.set_fill_color(*_rgb(Colors.BG_CARD))
+    pdf.rect(0, 0, 210, 28, "F")
+    pdf.set_xy(MARGEM, 6)
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.set_text_color(*_rgb(Colors.PRIMARY))
+    pdf.cell(0, 8, _texto("G5 Futebol - Relatório Mensal"), ln=1)
+    pdf.set_x(MARGEM)
+    pdf.set_font("Helvetica", "", 11)
+    pdf.set_text_color(255, 255, 255)
+    pdf.cell(0, 7, _texto(f"{dados['atleta']}  |  {dados['categoria']}  |  {dados['mes']:02d}/{dados['ano']}"), ln=1)
+    pdf.set_y(32)
+
+
+def _kpis(pdf: FPDF, kpis: dict):
+    _secao(pdf, "Indicadores do mês")
+    posicao = f"{kpis['posicao']}º de {kpis['ranqueados']}" if kpis["posicao"] else "-"
+    caixas = [
+        ("Treinos", str(kpis["treinos"])),
+        ("Frequência", f"{kpis['frequencia']:.0f}%"),
+        ("Média", _fmt(kpis["media"])),
+        ("Score G5", _fmt(kpis["score"], "{:.3f}")),
+        ("Posição na categoria", posicao),
+    ]
+    largura, y = (LARGURA_UTIL - 3 * (len(caixas) - 1)) / len(caixas), pdf.get_y()
+    for i, (rotulo, valor) in enumerate(caixas):
+        x = MARGEM + i * (largura + 3)
+        pdf.set_fill_color(240, 240, 240)
+        pdf.rect(x, y, largura, 20, "F")
+        pdf.set_xy(x, y + 2)
+        pdf.set_font("Helvetica", "", 8)
+        pdf.set_text_color(100, 100, 100)
+        pdf.cell(largura, 5, _texto(rotulo), align="C")
+        pdf.set_xy(x, y + 8)
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.set_text_color(20, 20, 20)
+        pdf.cell(largura, 9, _texto(valor), align="C")
+    pdf.set_xy(MARGEM, y + 23)
+    pdf.set_font("Helvetica", "", 9)
+    pdf.set_text_color(60, 60, 60)
+    pdf.cell(0, 5, _texto(
+        f"Presenças: {kpis['presencas']}  |  Faltas: {kpis['faltas']}  |  Justificadas: {kpis['justificadas']}  |  "
+        f"Desvio: {_fmt(kpis['desvio'])}  |  Média da categoria no mês: {_fmt(kpis['media_categoria'])}"
+    ), ln=1)
+
+
+def _presenca(pdf: FPDF, presenca: list):
+    _secao(pdf, "Presença e nota por treino")
+    por_linha, largura, altura = 16, LARGURA_UTIL / 16, 12
+    y = pdf.get_y()
+    for i, (dia, status, nota) in enumerate(presenca):
+        x = MARGEM + (i % por_linha) * largura
+        topo = y + (i // por_linha) * (altura + 2)
+        pdf.set_fill_color(*_rgb(CORES_PRESENCA.get(status, Colors.TEXT_LIGHT)))
+        pdf.rect(x + 0.5, topo, largura - 1, altura, "F")
+        pdf.set_text_color(20, 20, 20)
+        pdf.set_xy(x, topo + 1)
+        pdf.set_font("Helvetica", "B", 9)
+        pdf.cell(largura, 5, f"{dia:02d}", align="C")
+        pdf.set_xy(x, topo + 6)
+        pdf.set_font("Helvetica", "", 8)
+        pdf.cell(largura, 5, _texto(f"{status} {nota}" if nota is not None else status or "-"), align="C")
+    linhas = (len(presenca) + por_linha - 1) // por_linha
+    pdf.set_xy(MARGEM, y + linhas * (altura + 2) + 1)
+    pdf.set_font("Helvetica", "", 8)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(0, 5, _texto("P = Presente, F = Falta, J = Justificada; número = nota do treino (1 a 3)"), ln=1)
+
+
+def _grafico_score(pdf: FPDF, historico: list):
+    """Linhas do Score G5 e da média por mês da temporada (eixo 0-3), desenhadas com primitivas do fpdf"""
+    _secao(pdf, "Histórico do Score G5 na temporada")
+    x0, y0, largura, altura = MARGEM + 8, pdf.get_y() + 2, LARGURA_UTIL - 8, 60
+    pdf.set_font("Helvetica", "", 7)
+    pdf.set_text_color(100, 100, 100)
+    pdf.set_line_width(0.1)
+    pdf.set_draw_color(210, 210, 210)
+    for v in range(4):
+        y = y0 + altura - v / 3 * altura
+        pdf.line(x0, y, x0 + largura, y)
+        pdf.set_xy(x0 - 7, y - 2)
+        pdf.cell(6, 4, str(v), align="R")
+
+    passo = largura / max(len(historico), 1)
+    pontos_x = [x0 + passo * (i + 0.5) for i in range(len(historico))]
+    for x, (rotulo, _, _) in zip(pontos_x, historico):
+        pdf.set_xy(x - passo / 2, y0 + altura + 1)
+        pdf.cell(passo, 4, rotulo, align="C")
+
+    for indice, cor, espessura in ((1, Colors.TEXT_LIGHT, 0.4), (2, Colors.INFO, 0.8)):
+        pdf.set_draw_color(*_rgb(cor))
+        pdf.set_fill_color(*_rgb(cor))
+        pdf.set_line_width(espessura)
+        anterior = None
+        for x, ponto in zip(pontos_x, historico):
+            valor = ponto[indice]
+            if valor is None:
+                anterior = None
+                continue
+            y = y0 + altura - max(0.0, min(valor, 3.0)) / 3 * altura
+            if anterior is not None:
+                pdf.line(anterior[0], anterior[1], x, y)
+            pdf.rect(x - 0.9, y - 0.9, 1.8, 1.8, "F")
+            anterior = (x, y)
+
+    pdf.set_line_width(0.2)
+    pdf.set_xy(x0, y0 + altura + 6)
+    for rotulo, cor in (("Score G5", Colors.INFO), ("Média", Colors.TEXT_LIGHT)):
+        pdf.set_fill_color(*_rgb(cor))
+        pdf.rect(pdf.get_x(), pdf.get_y() + 1.5, 4, 2, "F")
+        pdf.set_x(pdf.get_x() + 5)
+        pdf.cell(20, 5, _texto(rotulo))
+
+
+def renderizar_pdf(dados: dict) -> bytes:
+    """PDF (uma página A4) de um atleta a partir do dicionário de `carregar_dados`"""
+    pdf = FPDF("P", "mm", "A4")
+    pdf.set_auto_page_break(False)
+    pdf.set_title(_texto(f"G5 - {dados['atleta']} - {dados['mes']:02d}/{dados['ano']}"))
+    pdf.add_page()
+    _cabecalho(pdf, dados)
+    _kpis(pdf, dados["kpis"])
+    _presenca(pdf, dados["presenca"])
+    _grafico_score(pdf, dados["historico"])
+    saida = pdf.output(dest="S")
+    # PyFPDF devolve str latin-1; fpdf2 devolve bytearray
+    return saida.encode("latin-1") if isinstance(saida, str) else bytes(saida)
+
+
+def _slug(texto: str) -> str:
+    ascii_ = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z0-9]+", "_", ascii_).strip("_") or "sem_nome"
+
+
+def nome_arquivo(dados: dict) -> str:
+    """Caminho do PDF dentro do zip: <categoria>/<atleta>_<id>_<AAAA-MM>.pdf"""
+    return f"{_slug(dados['categoria'])}/{_slug(dados['atleta'])}_{dados['atleta_id']}_{dados['ano']}-{dados['mes']:02d}.pdf"
+
+
+def _renderizar_lote(lote: List[dict]) -> List[tuple]:
+    """Roda no processo worker: [(nome no zip, bytes do PDF), ...]"""
+    return [(nome_arquivo(dados), renderizar_pdf(dados)) for dados in lote]
+
+
+# --- LOTE (PROCESSOS + ZIP) ---
+
+def gerar_relatorios(db, ano: int, mes: int, destino, categorias: Optional[List[str]] = None,
+                     processos: int = RELATORIOS_PROCESSOS, lote: int = RELATORIOS_LOTE, progresso=None) -> dict:
+    """
+    Gera o PDF do mês de cada atleta (das `categorias` ou do clube todo) e grava em `destino` (.zip
+    ou arquivo aberto). Com mais de um lote e processos > 1, os lotes são renderizados num pool de
+    processos (spawn); senão, no próprio processo. `progresso(fracao, mensagem)` é chamado a cada lote.
+    Retorna {"arquivo": destino, "relatorios": n}.
+    """
+    dados = carregar_dados(db, ano, mes, categorias)
+    lotes = [dados[i:i + lote] for i in range(0, len(dados), lote)]
+
+    pool = None
+    if processos > 1 and len(lotes) > 1:
+        from modules.jobs import _main_neutro
+        # Workers (spawn) nascem no submit: o map inteiro roda sob o __main__ neutro
+        with _main_neutro():
+            pool = ProcessPoolExecutor(min(processos, len(lotes)), mp_context=multiprocessing.get_context("spawn"))
+            resultados = pool.map(_renderizar_lote, lotes)
+    else:
+        resultados = map(_renderizar_lote, lotes)
+
+    feitos = 0
+    try:
+        # PDFs já vêm comprimidos (streams com zlib): o zip só armazena
+        with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as zf:
+            for pdfs in resultados:
+                for nome, conteudo in pdfs:
+                    zf.writestr(nome, conteudo)
+                feitos += len(pdfs)
+                if progresso:
+                    progresso(feitos / len(dados), f"{feitos}/{len(dados)} relatórios")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return {"arquivo": destino, "relatorios": len(dados)}
@@ -4,12 +4,51 @@ Módulo de Serviços (Business Logic)
 Contém a lógica de negócio, interações com o banco de dados (CRUD) e algoritmos de controle.
 """
 
+from sqlalchemy import func, select, insert, delete, update, case, bindparam, type_coerce, union_all, Integer, Float, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from modules.models import Atleta, Treino, Performance
+from modules.models import Atleta, Treino, Performance, AgregadoAtleta, AgregadoAtletaMes
+from modules.cache import df_cache
+from modules.leitura import inteiro_anulavel, ler_colunas, ler_dataframe
+from modules.temporadas import filtro_janela, listar_temporadas, normalizar, tabelas_leitura
+from config import CATEGORY_RULES, SEM_CATEGORIA, TRAINING_TYPES, TRAINING_TYPE_BITS, VALID_ATHLETE_FLAGS, tipos_para_mask, AGG_ULTIMAS_N, BASELINE_JANELA_RECENTE, anos_da_categoria, TEMPORADA_ATUAL, janela_temporada, SERIE_MAX_PONTOS, RANKING_MIN_NOTAS, RANKING_TOP_K
 from datetime import date
+import calendar
 import pandas as pd
+import numpy as np
 from typing import List, Optional
 
+# Bit de cada linha do checklist (mesma ordem de TRAINING_TYPES)
+BITS_TIPOS = np.array(list(TRAINING_TYPE_BITS.values()), dtype=np.int64)
+
+# Valores de Performance.presenca (P=Presente, F=Falta, J=Justificada)
+PRESENCAS = ["P", "F", "J"]
+
+
+# Granularidades das séries temporais: nome -> (dias por ponto, início do período em SQL a partir da data)
+PERIODOS_SERIE = {
+    "dia": (1, lambda data: data),
+    "semana": (7, lambda data: func.date(data, "weekday 0", "-6 days")), # Segunda-feira da semana
+    "mes": (30.44, lambda data: func.strftime("%Y-%m-01", data)),
+    "ano": (365.25, lambda data: func.strftime("%Y-01-01", data)),
+}
+
+
+def escolher_granularidade(inicio: date, fim: date, max_pontos: int = SERIE_MAX_PONTOS) -> str:
+    """Granularidade mais fina de PERIODOS_SERIE cujo nº de pontos no intervalo cabe em max_pontos"""
+    dias = (fim - inicio).days + 1
+    for nome, (dias_por_ponto, _) in PERIODOS_SERIE.items():
+        if dias / dias_por_ponto <= max_pontos:
+            return nome
+    return nome
+
+
+def _categorico(valores, base: list) -> pd.Categorical:
+    """Categorical com as categorias fixas `base` (dtype estável entre cargas) + valores fora do padrão"""
+    extras = sorted(set(valores) - set(base) - {None})
+    return pd.Categorical(valores, categories=[*base, *extras])
+
+
 class AtletaService:
     """Serviços relacionados a gestão de Atletas"""
     
@@ -20,6 +59,7 @@ class AtletaService:
         atleta = Atleta(nome=nome, data_nascimento=data_nasc, posicao=posicao, contato_pais=contato)
         self.db.add(atleta)
         self.db.commit()
+        df_cache.invalidar()
         self.db.refresh(atleta)
         return atleta
 
@@ -31,16 +71,260 @@ class AtletaService:
 
     def filtrar_por_categoria(self, categoria: str) -> List[Atleta]:
         """
-        Filtra atletas dinamicamente baseado em sua Data de Nascimento e na Categoria Alvo.
-        Lógica Python side (devido ao cálculo dinâmico de categoria).
+        Filtra atletas ativos da Categoria Alvo via SQL.
+        A categoria é resolvida em tempo de consulta a partir de CATEGORY_RULES sobre a coluna
+        indexada ano_nascimento, então mudanças de regra na virada de temporada valem na hora.
         """
-        todos = self.listar_atletas(ativo_only=True)
-        # Filtra na memória (poderia ser query se categoria fosse campo persistido)
-        return [a for a in todos if a.categoria_calculada == categoria]
+        query = self.db.query(Atleta).filter(Atleta.status == "ATIVO")
+        if categoria == SEM_CATEGORIA:
+            # Anos fora de todas as regras
+            todos_anos = [ano for anos_cat in CATEGORY_RULES.values() for ano in anos_cat]
+            return query.filter(Atleta.ano_nascimento.notin_(todos_anos)).all()
+        anos = anos_da_categoria(categoria)
+        if not anos:
+            return []
+        return query.filter(Atleta.ano_nascimento.in_(anos)).all()
 
     def get_atleta(self, atleta_id: int) -> Optional[Atleta]:
         return self.db.query(Atleta).filter(Atleta.id == atleta_id).first()
 
+    def definir_foto(self, atleta_id: int, conteudo: bytes) -> str:
+        """Grava a foto no armazém por conteúdo (modules.fotos) e aponta Atleta.foto_path para a chave"""
+        from modules.fotos import foto_store
+
+        chave = foto_store.salvar(conteudo)
+        self.db.execute(update(Atleta).where(Atleta.id == atleta_id).values(foto_path=chave))
+        self.db.commit()
+        return chave
+
+    def fotos(self, atleta_ids: List[int]) -> dict:
+        """{atleta_id: chave da foto} dos atletas informados que têm foto (uma consulta)"""
+        return dict(self.db.execute(
+            select(Atleta.id, Atleta.foto_path).where(Atleta.id.in_([int(i) for i in atleta_ids]), Atleta.foto_path.isnot(None))
+        ).all())
+
+
+class AgregadoService:
+    """
+    Serviços dos agregados materializados por atleta (AgregadoAtleta / AgregadoAtletaMes).
+    As escritas de Performance registram deltas com `registrar` e gravam com `aplicar`
+    dentro da mesma transação; `reconstruir` refaz tudo a partir das performances.
+    """
+
+    CAMPOS = ("total", "presencas", "faltas", "n_notas", "soma_notas", "soma_quadrados")
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._pendentes = {}
+        self._pendentes_mes = {}
+
+    @classmethod
+    def _contribuicao(cls, presenca: Optional[str], nota: Optional[int]) -> tuple:
+        """Contribuição de uma performance para cada campo de CAMPOS"""
+        n = nota or 0
+        return (1, int(presenca == "P"), int(presenca == "F"), int(nota is not None), n, n * n)
+
+    def registrar(self, atleta_id: int, categoria: str, data_treino: date,
+                  antes: Optional[tuple] = None, depois: Optional[tuple] = None):
+        """
+        Acumula o delta de uma performance. `antes`/`depois` são (presenca, nota);
+        None em `antes` significa inserção e None em `depois` significa remoção.
+        """
+        zero = (0,) * len(self.CAMPOS)
+        old = self._contribuicao(*antes) if antes is not None else zero
+        new = self._contribuicao(*depois) if depois is not None else zero
+        delta = [b - a for a, b in zip(old, new)]
+
+        for pendentes, chave in (
+            (self._pendentes, (atleta_id, categoria)),
+            (self._pendentes_mes, (atleta_id, categoria, data_treino.year, data_treino.month)),
+        ):
+            acumulado = pendentes.setdefault(chave, [0] * len(self.CAMPOS))
+            for i, v in enumerate(delta):
+                acumulado[i] += v
+
+    def aplicar(self):
+        """Grava os deltas pendentes (upsert incremental) e atualiza as últimas notas. Não faz commit."""
+        if not self._pendentes:
+            return
+        for model, pendentes, chaves in (
+            (AgregadoAtleta, self._pendentes, ("atleta_id", "categoria")),
+            (AgregadoAtletaMes, self._pendentes_mes, ("atleta_id", "categoria", "ano", "mes")),
+        ):
+            tabela = model.__table__
+            stmt = sqlite_insert(tabela)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(chaves),
+                set_={c: tabela.c[c] + stmt.excluded[c] for c in self.CAMPOS},
+            )
+            self.db.execute(stmt, [
+                {**dict(zip(chaves, chave)), **dict(zip(self.CAMPOS, delta))}
+                for chave, delta in pendentes.items()
+            ])
+
+        por_categoria = {}
+        for atleta_id, categoria in self._pendentes:
+            por_categoria.setdefault(categoria, []).append(atleta_id)
+        for categoria, atleta_ids in por_categoria.items():
+            self._atualizar_ultimas_notas(categoria, atleta_ids)
+
+        self._pendentes, self._pendentes_mes = {}, {}
+
+    def _ultimas_notas(self, categoria: Optional[str] = None, atleta_ids: Optional[List[int]] = None,
+                       temporada: Optional[int] = None) -> dict:
+        """
+        {(atleta_id, categoria): [nota, ...]} com as últimas AGG_ULTIMAS_N notas (mais antiga -> mais
+        recente, "" = sem nota) dentro da temporada (padrão: a atual), por uma consulta de janela
+        (ROW_NUMBER por atleta/categoria).
+        """
+        rn = func.row_number().over(
+            partition_by=(Performance.atleta_id, Treino.categoria_alvo),
+            order_by=(Treino.data.desc(), Performance.id.desc()),
+        ).label("rn")
+        sub = (
+            select(Performance.atleta_id, Treino.categoria_alvo, Performance.nota, rn)
+            .join(Treino)
+            .where(filtro_janela(Treino.data, temporada))
+        )
+        if categoria is not None:
+            sub = sub.where(Treino.categoria_alvo == categoria)
+        if atleta_ids is not None:
+            sub = sub.where(Performance.atleta_id.in_(atleta_ids))
+        sub = sub.subquery()
+        rows = self.db.execute(
+            select(sub.c.atleta_id, sub.c.categoria_alvo, sub.c.nota)
+            .where(sub.c.rn <= AGG_ULTIMAS_N)
+            .order_by(sub.c.atleta_id, sub.c.categoria_alvo, sub.c.rn.desc())
+        ).all()
+
+        ultimas = {}
+        for atleta_id, cat, nota in rows:
+            ultimas.setdefault((atleta_id, cat), []).append("" if nota is None else str(nota))
+        return ultimas
+
+    def _atualizar_ultimas_notas(self, categoria: Optional[str] = None, atleta_ids: Optional[List[int]] = None):
+        """
+        Recalcula ultimas_notas na temporada atual, a mesma janela das médias de estatisticas_categoria
+        (sem notas na temporada -> vazio, nunca notas de uma temporada anterior).
+        """
+        ultimas = self._ultimas_notas(categoria, atleta_ids)
+        tabela = AgregadoAtleta.__table__
+        filtro = [tabela.c.categoria == categoria] if categoria is not None else []
+        if atleta_ids is not None:
+            filtro.append(tabela.c.atleta_id.in_(atleta_ids))
+        self.db.execute(update(tabela).where(*filtro).values(ultimas_notas="")) # Quem não tem nota na temporada
+        if not ultimas:
+            return
+        self.db.execute(
+            update(tabela)
+            .where(tabela.c.atleta_id == bindparam("b_atleta_id"), tabela.c.categoria == bindparam("b_categoria"))
+            .values(ultimas_notas=bindparam("b_ultimas")),
+            [{"b_atleta_id": a, "b_categoria": c, "b_ultimas": ",".join(v)} for (a, c), v in ultimas.items()],
+        )
+
+    def reconstruir(self):
+        """
+        Reconstrói todos os agregados a partir da tabela de performances (rebuild completo).
+        Uma passada sobre performances gera o agregado mensal; o agregado por atleta sai da soma dos meses.
+        """
+        mes_ref = func.substr(Treino.data, 1, 7) # "AAAA-MM"
+        mensal = (
+            select(
+                Performance.atleta_id,
+                Treino.categoria_alvo,
+                func.cast(func.substr(mes_ref, 1, 4), Integer),
+                func.cast(func.substr(mes_ref, 6, 2), Integer),
+                func.count(),
+                func.sum(case((Performance.presenca == "P", 1), else_=0)),
+                func.sum(case((Performance.presenca == "F", 1), else_=0)),
+                func.count(Performance.nota),
+                func.coalesce(func.sum(Performance.nota), 0),
+                func.coalesce(func.sum(Performance.nota * Performance.nota), 0),
+            )
+            .join(Treino)
+            .group_by(Performance.atleta_id, Treino.categoria_alvo, mes_ref)
+        )
+        mes = AgregadoAtletaMes.__table__.c
+        por_atleta = select(
+            mes.atleta_id, mes.categoria, *(func.sum(mes[c]) for c in self.CAMPOS)
+        ).group_by(mes.atleta_id, mes.categoria)
+        try:
+            self.db.execute(delete(AgregadoAtleta))
+            self.db.execute(delete(AgregadoAtletaMes))
+            self.db.execute(insert(AgregadoAtletaMes).from_select(["atleta_id", "categoria", "ano", "mes", *self.CAMPOS], mensal))
+            self.db.execute(insert(AgregadoAtleta).from_select(["atleta_id", "categoria", *self.CAMPOS], por_atleta))
+            self._atualizar_ultimas_notas()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self._pendentes, self._pendentes_mes = {}, {}
+
+    @staticmethod
+    def _meses_da_temporada(temporada: Optional[int]):
+        """Condição sobre AgregadoAtletaMes: (ano, mês) dentro da janela da temporada"""
+        inicio, fim = janela_temporada(temporada)
+        indice = AgregadoAtletaMes.ano * 12 + AgregadoAtletaMes.mes
+        return indice.between(inicio.year * 12 + inicio.month, fim.year * 12 + fim.month)
+
+    def estatisticas_categoria(self, categoria: str, temporada: Optional[int] = None) -> pd.DataFrame:
+        """
+        Estatísticas por atleta da categoria na temporada (padrão: a atual), somando os agregados
+        mensais da janela (uma linha por atleta):
+        atleta_id, atleta, total, presencas, faltas, count (notas), mean, std, ultimas.
+        `ultimas` são as últimas notas do atleta na categoria dentro da mesma temporada: lidas de
+        AgregadoAtleta para a temporada atual e calculadas na hora para as demais.
+        """
+        mes = AgregadoAtletaMes
+        stmt = select(
+            mes.atleta_id,
+            Atleta.nome,
+            func.sum(mes.total),
+            func.sum(mes.presencas),
+            func.sum(mes.faltas),
+            func.sum(mes.n_notas),
+            func.sum(mes.soma_notas),
+            func.sum(mes.soma_quadrados),
+            AgregadoAtleta.ultimas_notas
+        ).join(Atleta, Atleta.id == mes.atleta_id).outerjoin(
+            AgregadoAtleta, (AgregadoAtleta.atleta_id == mes.atleta_id) & (AgregadoAtleta.categoria == mes.categoria)
+        ).where(
+            mes.categoria == categoria, self._meses_da_temporada(temporada)
+        ).group_by(mes.atleta_id, Atleta.nome, AgregadoAtleta.ultimas_notas).having(func.sum(mes.total) > 0)
+
+        inteiros = dict.fromkeys(['total', 'presencas', 'faltas', 'count', 'soma', 'soma_quadrados'], np.int64)
+        df = ler_dataframe(self.db.connection(), stmt, {'atleta_id': np.int64, 'atleta': object, **inteiros, 'ultimas': object})
+        if df.empty:
+            return pd.DataFrame()
+
+        n = df['count'].where(df['count'] > 0)
+        df['mean'] = df['soma'] / n
+        # Desvio padrão amostral (ddof=1) a partir das somas, como o pandas faz
+        var = (df['soma_quadrados'] - n * df['mean'] ** 2) / (n - 1).where(n > 1)
+        df['std'] = np.sqrt(var.clip(lower=0))
+        if temporada is not None and temporada != TEMPORADA_ATUAL:
+            outras = self._ultimas_notas(categoria, temporada=temporada)
+            df['ultimas'] = [",".join(outras.get((int(a), categoria), [])) for a in df['atleta_id']]
+        df['ultimas'] = [[int(x) if x else None for x in u.split(',')] if u else [] for u in df['ultimas']]
+        return df.drop(columns=['soma', 'soma_quadrados'])
+
+    def resumo_categoria(self, categoria: str, temporada: Optional[int] = None) -> dict:
+        """KPIs da categoria na temporada (treinos, média de nota, frequência) a partir dos agregados mensais"""
+        total, presencas, n_notas, soma = self.db.query(
+            func.sum(AgregadoAtletaMes.total),
+            func.sum(AgregadoAtletaMes.presencas),
+            func.sum(AgregadoAtletaMes.n_notas),
+            func.sum(AgregadoAtletaMes.soma_notas)
+        ).filter(AgregadoAtletaMes.categoria == categoria, self._meses_da_temporada(temporada)).one()
+        treinos = self.db.query(func.count(func.distinct(Treino.data))).filter(
+            Treino.categoria_alvo == categoria, filtro_janela(Treino.data, temporada), Treino.performances.any()
+        ).scalar()
+        return {
+            "treinos": treinos or 0,
+            "media": (soma / n_notas) if n_notas else float("nan"),
+            "frequencia": (presencas / total) * 100 if total else 0.0,
+        }
+
 
 class TreinoService:
     """Serviços relacionados a Treinos e Performance"""
@@ -48,39 +332,247 @@ class TreinoService:
     def __init__(self, db: Session):
         self.db = db
         self.atleta_service = AtletaService(db)
+        self.agregado_service = AgregadoService(db)
 
     def criar_sessao_treino(self, data_treino: date, categoria: str, tipos: List[str]) -> Treino:
-        """Cria e inicializa um treino novo"""
-        # Verifica duplicidade
-        existente = self.db.query(Treino).filter(Treino.data == data_treino, Treino.categoria_alvo == categoria).first()
-        if existente:
-            return existente # Retorna o já existente para edição
-            
-        tipos_str = ",".join(tipos)
-        novo_treino = Treino(data=data_treino, categoria_alvo=categoria, tipos_realizados=tipos_str)
-        self.db.add(novo_treino)
-        self.db.commit()
-        self.db.refresh(novo_treino)
+        """Cria e inicializa um treino novo (ou retorna o já existente do dia para edição)"""
+        # Upsert no índice único (data, categoria_alvo): sem consulta prévia de duplicidade
+        criado = self.db.execute(
+            sqlite_insert(Treino)
+            .values(data=data_treino, categoria_alvo=categoria, tipos_mask=tipos_para_mask(tipos))
+            .on_conflict_do_nothing(index_elements=["data", "categoria_alvo"])
+        ).rowcount
+        treino = self.get_treino_do_dia(data_treino, categoria)
+        if not criado:
+            self.db.commit()
+            return treino # Retorna o já existente para edição
         
-        # Inicializa performances vazias para todos os atletas da categoria
+        # Inicializa performances vazias para todos os atletas da categoria (mesma transação)
         atletas = self.atleta_service.filtrar_por_categoria(categoria)
+        if atletas:
+            self.db.execute(
+                sqlite_insert(Performance).on_conflict_do_nothing(index_elements=["treino_id", "atleta_id"]),
+                [{"treino_id": treino.id, "atleta_id": atl.id, "presenca": "P"} for atl in atletas] # Default Presente
+            )
         for atl in atletas:
-            perf = Performance(treino_id=novo_treino.id, atleta_id=atl.id, presenca="P") # Default Presente
-            self.db.add(perf)
+            self.agregado_service.registrar(atl.id, categoria, data_treino, depois=("P", None))
+        self.agregado_service.aplicar()
         self.db.commit()
+        df_cache.invalidar()
+        self.db.refresh(treino)
         
-        return novo_treino
+        return treino
 
     def get_treino_do_dia(self, data_ref: date, categoria: str) -> Optional[Treino]:
         return self.db.query(Treino).filter(Treino.data == data_ref, Treino.categoria_alvo == categoria).first()
 
+    def sessoes_por_tipo(self, tipo: str, temporada: Optional[int] = None, categoria: Optional[str] = None) -> pd.DataFrame:
+        """
+        Treinos de um tipo na temporada (padrão: a atual; ex: todos os "Tático"), por categoria.
+        Filtra no SQL pelo bit de tipos_mask. Retorna DataFrame (id, data, categoria, flag_geral).
+        """
+        if tipo not in TRAINING_TYPE_BITS:
+            raise ValueError(f"Tipo de treino desconhecido: {tipo}")
+        stmt = select(Treino.id, Treino.data, Treino.categoria_alvo, Treino.flag_geral).where(
+            Treino.tipos_mask.op("&")(TRAINING_TYPE_BITS[tipo]) != 0,
+            filtro_janela(Treino.data, temporada),
+        )
+        if categoria is not None:
+            stmt = stmt.where(Treino.categoria_alvo == categoria)
+        linhas = self.db.execute(stmt.order_by(Treino.categoria_alvo, Treino.data)).all()
+        return pd.DataFrame(linhas, columns=["id", "data", "categoria", "flag_geral"])
+
+    def contagem_por_tipo(self, temporada: Optional[int] = None, categoria: Optional[str] = None) -> pd.DataFrame:
+        """Nº de sessões de cada tipo por categoria na temporada (padrão: a atual), em uma consulta (uma soma por bit)"""
+        stmt = select(
+            Treino.categoria_alvo,
+            *(func.sum(case((Treino.tipos_mask.op("&")(bit) != 0, 1), else_=0)).label(tipo)
+              for tipo, bit in TRAINING_TYPE_BITS.items()),
+        ).where(filtro_janela(Treino.data, temporada)).group_by(Treino.categoria_alvo)
+        if categoria is not None:
+            stmt = stmt.where(Treino.categoria_alvo == categoria)
+        linhas = self.db.execute(stmt).all()
+        return pd.DataFrame(linhas, columns=["categoria", *TRAINING_TYPES]).set_index("categoria")
+
+    def carregar_matriz_mes(self, categoria: str, ano: int, mes: int) -> dict:
+        """
+        Carrega o mês inteiro da Matriz de Treinos em duas consultas (treinos + performances).
+        Retorna estruturas indexadas prontas para renderizar, sem lookups por célula:
+            dias      -> lista de datas do mês
+            colunas   -> rótulos das colunas de dia ("1".."31")
+            atletas   -> atletas da categoria ordenados por nome
+            treinos   -> {data: treino_id}
+            tipos     -> DataFrame checklist (Tipo x dia, bool)
+            perf      -> DataFrame grade (ID, Atleta x dia, flag ou presença)
+            perf_ids  -> {(atleta_id, data): performance_id}
+        """
+        _, num_dias = calendar.monthrange(ano, mes)
+        dias = [date(ano, mes, d) for d in range(1, num_dias + 1)]
+        colunas = [f"{d.day}" for d in dias]
+        atletas = sorted(self.atleta_service.filtrar_por_categoria(categoria), key=lambda a: a.nome)
+
+        filtro = (Treino.categoria_alvo == categoria, Treino.data.between(dias[0], dias[-1]))
+        treinos = self.db.query(Treino.id, Treino.data, Treino.tipos_mask).filter(*filtro).all()
+        perfs = self.db.query(
+            Performance.id,
+            Performance.atleta_id,
+            Treino.data,
+            Performance.flag_atleta,
+            Performance.presenca
+        ).join(Treino).filter(*filtro).order_by(Performance.id).all()
+
+        # Checklist de tipos (Tipo x dia): máscara por dia & bit por tipo, em uma operação
+        mask_dia = np.zeros(num_dias, dtype=np.int64)
+        if treinos:
+            mask_dia[[t.data.day - 1 for t in treinos]] = [t.tipos_mask or 0 for t in treinos]
+        df_tipos = pd.DataFrame((mask_dia[None, :] & BITS_TIPOS[:, None]) != 0, columns=colunas)
+        df_tipos.insert(0, "Tipo", TRAINING_TYPES)
+
+        # Grade de performance (Atleta x dia) pivotada de uma vez
+        df_perf = pd.DataFrame({"ID": [a.id for a in atletas], "Atleta": [a.nome for a in atletas]})
+        perf_ids = {}
+        if perfs:
+            df_raw = pd.DataFrame(perfs, columns=["id", "atleta_id", "data", "flag", "presenca"])
+            df_raw = df_raw.drop_duplicates(subset=["atleta_id", "data"], keep="first")
+            df_raw["valor"] = df_raw["flag"].where(df_raw["flag"].notna() & (df_raw["flag"] != ""), df_raw["presenca"])
+            df_raw["dia"] = [f"{d.day}" for d in df_raw["data"]]
+            perf_ids = dict(zip(zip(df_raw["atleta_id"], df_raw["data"]), df_raw["id"]))
+            grade = df_raw.pivot(index="atleta_id", columns="dia", values="valor")
+            grade = grade.reindex(index=df_perf["ID"], columns=colunas)
+            grade = grade.astype(object).where(grade.notna(), None)
+            df_perf = pd.concat([df_perf, grade.reset_index(drop=True)], axis=1)
+        else:
+            for col in colunas:
+                df_perf[col] = None
+
+        return {
+            "dias": dias,
+            "colunas": colunas,
+            "atletas": atletas,
+            "treinos": {t.data: t.id for t in treinos},
+            "tipos": df_tipos,
+            "perf": df_perf,
+            "perf_ids": perf_ids,
+        }
+
+    @staticmethod
+    def _valores_celula(valor: str) -> dict:
+        """Converte a flag digitada na matriz nos campos de Performance"""
+        is_n = valor in ["1", "2", "3"]
+        return {
+            "flag_atleta": valor,
+            "nota": int(valor) if is_n else None,
+            "presenca": "P" if is_n else ("F" if valor == "F" else "J"),
+        }
+
+    def salvar_matriz_mes(self, categoria: str, matriz: dict, edited_types: pd.DataFrame, edited_perf: pd.DataFrame) -> int:
+        """
+        Salva a Matriz de Treinos gravando apenas as células alteradas em relação a `matriz`
+        (resultado de carregar_matriz_mes). Tudo é aplicado com upserts em lote nos índices
+        únicos, em uma única transação. Retorna o número de células alteradas.
+        """
+        dias, colunas = matriz["dias"], matriz["colunas"]
+        treinos = dict(matriz["treinos"])
+
+        # 1. Diff do checklist de tipos (Tipo x dia), comparando as máscaras de cada dia
+        tipos_old = matriz["tipos"][colunas].to_numpy(dtype=bool)
+        tipos_new = edited_types[colunas].fillna(False).to_numpy(dtype=bool)
+        mask_new = BITS_TIPOS @ tipos_new
+        dias_tipos = np.flatnonzero(BITS_TIPOS @ tipos_old != mask_new).tolist()
+
+        # 2. Diff da grade de performance (Atleta x dia); células limpas são ignoradas
+        perf_old = matriz["perf"].set_index("ID")[colunas]
+        perf_new = edited_perf.assign(ID=edited_perf["ID"].astype(int)).set_index("ID")[colunas].reindex(perf_old.index)
+        vazio_new = perf_new.isna() | (perf_new == "")
+        diff_perf = (perf_new.fillna("") != perf_old.fillna("")) & ~vazio_new
+        celulas = [
+            (int(aid), dias[colunas.index(col)], perf_new.at[aid, col])
+            for aid, col in diff_perf.stack().loc[lambda x: x].index
+        ]
+
+        if not dias_tipos and not celulas:
+            return 0
+
+        try:
+            # 3. Treinos que precisam existir: tipos marcados ou notas em dia sem treino.
+            #    Upsert no índice único (data, categoria_alvo); ids recuperados em uma consulta.
+            dias_novos = {dias[i] for i in dias_tipos if mask_new[i]} | {d for _, d, _ in celulas}
+            dias_novos = sorted(d for d in dias_novos if d not in treinos)
+            if dias_novos:
+                stmt = sqlite_insert(Treino)
+                self.db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["data", "categoria_alvo"],
+                        set_={"tipos_mask": stmt.excluded.tipos_mask},
+                    ),
+                    [{"data": d, "categoria_alvo": categoria, "tipos_mask": int(mask_new[d.day - 1])}
+                     for d in dias_novos]
+                )
+                treinos.update(self.db.query(Treino.data, Treino.id).filter(
+                    Treino.categoria_alvo == categoria, Treino.data.in_(dias_novos)
+                ).all())
+
+            self.db.bulk_update_mappings(Treino, [
+                {"id": treinos[dias[i]], "tipos_mask": int(mask_new[i])}
+                for i in dias_tipos if dias[i] not in dias_novos
+            ])
+
+            # 4. Performances: upsert no índice único (treino_id, atleta_id).
+            #    Valores atuais lidos na mesma transação para o delta dos agregados.
+            ids_treino = {treinos[d] for d in dias_novos} | {treinos[d] for _, d, _ in celulas}
+            atuais = {
+                (r.treino_id, r.atleta_id): (r.presenca, r.nota) for r in
+                self.db.query(Performance.treino_id, Performance.atleta_id, Performance.presenca, Performance.nota)
+                .filter(Performance.treino_id.in_(ids_treino))
+            }
+            alteradas = {(aid, d): self._valores_celula(v) for aid, d, v in celulas}
+            iniciais, upserts = [], []
+            for d in dias_novos:
+                # Treino novo: inicializa o elenco inteiro como Presente (mesma regra de criar_sessao_treino)
+                for aid in map(int, perf_old.index):
+                    if (aid, d) not in alteradas and (treinos[d], aid) not in atuais:
+                        iniciais.append({"treino_id": treinos[d], "atleta_id": aid, "presenca": "P"})
+                        self.agregado_service.registrar(aid, categoria, d, depois=("P", None))
+            for (aid, d), valores in alteradas.items():
+                upserts.append({"treino_id": treinos[d], "atleta_id": aid, **valores})
+                self.agregado_service.registrar(aid, categoria, d, antes=atuais.get((treinos[d], aid)),
+                                                depois=(valores["presenca"], valores["nota"]))
+            if iniciais:
+                self.db.execute(
+                    sqlite_insert(Performance).on_conflict_do_nothing(index_elements=["treino_id", "atleta_id"]),
+                    iniciais
+                )
+            if upserts:
+                stmt = sqlite_insert(Performance)
+                self.db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["treino_id", "atleta_id"],
+                        set_={c: stmt.excluded[c] for c in ("flag_atleta", "nota", "presenca")},
+                    ),
+                    upserts
+                )
+            self.agregado_service.aplicar()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        df_cache.invalidar()
+
+        return int((tipos_old != tipos_new).sum()) + len(celulas)
+
     def atualizar_performance(self, perf_id: int, nota: int, flag: str, presenca: str):
         perf = self.db.query(Performance).filter(Performance.id == perf_id).first()
         if perf:
+            antes = (perf.presenca, perf.nota)
             perf.nota = nota
             perf.flag_atleta = flag
             perf.presenca = presenca
+            self.agregado_service.registrar(perf.atleta_id, perf.treino.categoria_alvo, perf.treino.data,
+                                            antes=antes, depois=(presenca, nota))
+            self.db.flush()
+            self.agregado_service.aplicar()
             self.db.commit()
+            df_cache.invalidar()
             
     def salvar_avaliacao_geral(self, treino_id: int, flag: str, obs: str):
         treino = self.db.query(Treino).filter(Treino.id == treino_id).first()
@@ -88,22 +580,259 @@ class TreinoService:
             treino.flag_geral = flag
             treino.obs_geral = obs
             self.db.commit()
+            df_cache.invalidar()
+
+    def get_dataframe_performances(self, categoria: str, temporadas=None) -> pd.DataFrame:
+        """
+        Retorna DataFrame pandas para Analytics (colunas tipadas, ver _frame_performances).
+        `temporadas`: None (a atual), um ano ou vários; temporadas arquivadas vêm do banco de arquivo.
+        Servido do cache process-wide (df_cache) enquanto não houver escrita; trate como somente leitura.
+        """
+        temporadas = tuple(normalizar(temporadas))
+        chave = (str(self.db.get_bind().url), "performances", categoria, temporadas)
+        return df_cache.get_or_load(chave, lambda: self._carregar_dataframe_performances(categoria, temporadas))
+
+    def get_historico_atleta(self, atleta_id: int, categoria: Optional[str] = None, temporadas=None) -> pd.DataFrame:
+        """
+        Histórico de um único atleta (mesmas colunas de get_dataframe_performances), ordenado por data.
+        Usa o índice de performances.atleta_id em vez de carregar a categoria inteira.
+        """
+        def filtro(treinos, performances):
+            cond = performances.c.atleta_id == atleta_id
+            return cond if categoria is None else cond & (treinos.c.categoria_alvo == categoria)
+        return self._frame_performances(filtro, ordenar=True, temporadas=temporadas)
+
+    def temporadas_disponiveis(self, incluir_arquivo: bool = False) -> List[int]:
+        """Temporadas com treinos no banco quente (+ as do arquivo, se pedido), em ordem"""
+        conn = self.db.connection()
+        temporadas = set(listar_temporadas(conn))
+        if incluir_arquivo:
+            temporadas.update(listar_temporadas(conn, arquivo=True))
+        return sorted(temporadas | {TEMPORADA_ATUAL})
+
+    def intervalo_datas(self) -> tuple:
+        """(primeira, última) data de treino no banco quente e no arquivo; None se não houver treinos"""
+        conn = self.db.connection()
+        limites = [conn.execute(select(func.min(t.c.data), func.max(t.c.data))).one() for t, _ in tabelas_leitura(conn, True)]
+        inicios = [i for i, _ in limites if i is not None]
+        fins = [f for _, f in limites if f is not None]
+        return (min(inicios), max(fins)) if inicios else (None, None)
+
+    def serie_media_categoria(self, categoria: str, inicio: Optional[date] = None, fim: Optional[date] = None,
+                              granularidade: Optional[str] = None) -> dict:
+        """
+        Média de nota da categoria por período (dia, semana, mês ou ano), agregada no SQL (GROUP BY).
+        Padrão: janela da temporada atual. Sem `granularidade`, ela sai do tamanho do intervalo
+        (escolher_granularidade), então o nº de pontos fica limitado qualquer que seja o histórico.
+        Períodos anteriores à temporada atual também somam o banco de arquivo.
+        Retorna {"granularidade": nome, "serie": DataFrame(periodo, media, notas)}.
+        """
+        janela_atual = janela_temporada()
+        inicio, fim = inicio or janela_atual[0], fim or janela_atual[1]
+        granularidade = granularidade or escolher_granularidade(inicio, fim)
+        if granularidade not in PERIODOS_SERIE:
+            raise ValueError(f"Granularidade desconhecida: {granularidade}")
+        inicio_periodo = PERIODOS_SERIE[granularidade][1]
+
+        conn = self.db.connection()
+        partes = [
+            select(type_coerce(inicio_periodo(treinos.c.data), String).label("periodo"), performances.c.nota)
+            .select_from(performances)
+            .join(treinos, performances.c.treino_id == treinos.c.id)
+            .where(treinos.c.categoria_alvo == categoria, treinos.c.data.between(inicio, fim),
+                   performances.c.nota.isnot(None))
+            for treinos, performances in tabelas_leitura(conn, inicio < janela_atual[0])
+        ]
+        sub = (partes[0] if len(partes) == 1 else union_all(*partes)).subquery()
+        serie = ler_dataframe(
+            conn,
+            select(sub.c.periodo, func.avg(sub.c.nota), func.count()).group_by(sub.c.periodo).order_by(sub.c.periodo),
+            {"periodo": "datetime64[us]", "media": np.float64, "notas": np.int64},
+        )
+        return {"granularidade": granularidade, "serie": serie}
+
+    def get_baseline_categoria(self, categoria: str, janela_recente: int = BASELINE_JANELA_RECENTE,
+                               temporada: Optional[int] = None) -> dict:
+        """
+        Baseline da categoria na temporada (padrão: a atual) para comparação no Perfil,
+        em uma consulta agregada (GROUP BY atleta):
+            media          -> média de nota da categoria
+            frequencia     -> % de presença
+            desvio         -> desvio padrão médio das notas por atleta (base da consistência)
+            media_recente  -> média de nota nas últimas `janela_recente` datas de treino
+        """
+        na_temporada = filtro_janela(Treino.data, temporada)
+        corte = (
+            select(Treino.data)
+            .where(Treino.categoria_alvo == categoria, na_temporada, Treino.performances.any())
+            .distinct()
+            .order_by(Treino.data.desc())
+            .offset(max(janela_recente - 1, 0))
+            .limit(1)
+            .scalar_subquery()
+        )
+        recente = Treino.data >= func.coalesce(corte, date.min)
+        rows = self.db.execute(
+            select(
+                func.count(),
+                func.sum(case((Performance.presenca == "P", 1), else_=0)),
+                func.count(Performance.nota),
+                func.sum(Performance.nota),
+                func.sum(Performance.nota * Performance.nota),
+                func.count(case((recente, Performance.nota))),
+                func.sum(case((recente, Performance.nota))),
+            )
+            .join(Treino)
+            .where(Treino.categoria_alvo == categoria, na_temporada)
+            .group_by(Performance.atleta_id)
+        ).all()
+
+        if not rows:
+            return {"media": np.nan, "frequencia": 0.0, "desvio": np.nan, "media_recente": np.nan}
+
+        df = pd.DataFrame(rows, columns=['total', 'presencas', 'n', 'soma', 'soma_q', 'n_rec', 'soma_rec']).fillna(0)
+        n = df['n'].where(df['n'] > 1)
+        var = (df['soma_q'] - df['soma'] ** 2 / n) / (n - 1)
+        n_notas, n_rec = df['n'].sum(), df['n_rec'].sum()
+        return {
+            "media": float(df['soma'].sum() / n_notas) if n_notas else np.nan,
+            "frequencia": float(df['presencas'].sum() / df['total'].sum() * 100),
+            "desvio": float(np.sqrt(var.clip(lower=0)).mean()),
+            "media_recente": float(df['soma_rec'].sum() / n_rec) if n_rec else np.nan,
+        }
+
+    def _carregar_dataframe_performances(self, categoria: str, temporadas=None) -> pd.DataFrame:
+        return self._frame_performances(lambda treinos, _: treinos.c.categoria_alvo == categoria, temporadas=temporadas)
+
+    def _frame_performances(self, filtro, ordenar: bool = False, temporadas=None) -> pd.DataFrame:
+        """
+        Carrega performances (join só com treinos) como colunas cruas e monta o DataFrame tipado:
+            id, atleta_id -> int32 | atleta, presenca, flag -> category | data -> datetime64 | nota -> Int8
+        `filtro(treinos, performances)` monta a condição sobre as tabelas; só entram as datas das
+        `temporadas` (padrão: a atual). Temporadas anteriores também leem o banco de arquivo (UNION ALL),
+        cujos ids são próprios: `id` só desempata a ordem.
+        Os nomes vêm de uma consulta à parte por atleta_id (um por atleta, não um por linha).
+        """
+        temporadas = normalizar(temporadas)
+        conn = self.db.connection()
+        partes = [
+            select(
+                performances.c.id.label("id"),
+                performances.c.atleta_id,
+                type_coerce(treinos.c.data, String).label("data"),
+                performances.c.nota,
+                performances.c.presenca,
+                performances.c.flag_atleta,
+            ).join(treinos, performances.c.treino_id == treinos.c.id)
+            .where(filtro(treinos, performances), filtro_janela(treinos.c.data, temporadas))
+            for treinos, performances in tabelas_leitura(conn, temporadas[0] < TEMPORADA_ATUAL)
+        ]
+        stmt = partes[0] if len(partes) == 1 else union_all(*partes)
+        if ordenar:
+            stmt = stmt.order_by(stmt.selected_columns.data, stmt.selected_columns.id)
+        # Leitura colunar direto do cursor (ver modules.leitura): datas ISO viram datetime64 no NumPy
+        col = ler_colunas(conn, stmt, {
+            "id": np.int32, "atleta_id": np.int32, "data": "datetime64[us]",
+            "nota": np.float64, "presenca": object, "flag": object,
+        })
+
+        unicos, codigos = np.unique(col["atleta_id"], return_inverse=True)
+        nomes = dict(conn.execute(
+            select(Atleta.id, Atleta.nome).where(Atleta.id.in_(unicos.tolist()))
+        ).all())
+        # Nomes repetidos (homônimos) compartilham a mesma categoria; a chave continua sendo atleta_id
+        cod_nome, cat_nome = pd.factorize(pd.Index([nomes.get(int(i)) for i in unicos], dtype=object))
+
+        return pd.DataFrame({
+            'id': col["id"],
+            'atleta_id': col["atleta_id"],
+            'atleta': pd.Categorical.from_codes(cod_nome[codigos], categories=cat_nome),
+            'data': col["data"],
+            'nota': inteiro_anulavel(col["nota"], "Int8"),
+            'presenca': _categorico(col["presenca"], PRESENCAS),
+            'flag': _categorico(col["flag"], VALID_ATHLETE_FLAGS),
+        })
+
+
+class RankingService:
+    """Leaderboard do Score G5 dentro de cada categoria e entre todas, em uma única consulta SQL"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def leaderboard(self, inicio: Optional[date] = None, fim: Optional[date] = None,
+                    categorias: Optional[List[str]] = None, min_notas: int = RANKING_MIN_NOTAS,
+                    top_k: int = RANKING_TOP_K, por_categoria: bool = False) -> pd.DataFrame:
+        """
+        Score G5 (média * (1 - desvio/10), como AnalyticsEngine._score_g5) por atleta/categoria no período
+        (padrão: temporada atual). GROUP BY gera média, desvio e contagens; funções de janela dão a
+        posição (RANK) e o percentil (CUME_DIST: % de atletas com score <= o seu, 100 = melhor, inclusive
+        sozinho na categoria) na categoria e no geral.
+        Retorna só o top_k: do clube ou, com por_categoria=True, de cada categoria (empates entram).
+        Colunas: atleta_id, atleta, categoria, treinos, notas, frequencia, media, desvio, score,
+        pos_categoria, pos_geral, percentil_categoria, percentil_geral.
+        """
+        janela_atual = janela_temporada()
+        inicio, fim = inicio or janela_atual[0], fim or janela_atual[1]
+        conn = self.db.connection()
+
+        partes = []
+        for treinos, performances in tabelas_leitura(conn, inicio < janela_atual[0]):
+            parte = (
+                select(performances.c.atleta_id, treinos.c.categoria_alvo.label("categoria"),
+                       performances.c.nota, performances.c.presenca)
+                .select_from(performances)
+                .join(treinos, performances.c.treino_id == treinos.c.id)
+                .where(treinos.c.data.between(inicio, fim))
+            )
+            if categorias:
+                parte = parte.where(treinos.c.categoria_alvo.in_(list(categorias)))
+            partes.append(parte)
+        base = (partes[0] if len(partes) == 1 else union_all(*partes)).subquery("base")
+
+        n = func.count(base.c.nota)
+        media = func.avg(base.c.nota)
+        stats = (
+            select(
+                base.c.atleta_id,
+                base.c.categoria,
+                func.count().label("treinos"),
+                n.label("notas"),
+                (func.sum(case((base.c.presenca == "P", 1), else_=0)) * 100.0 / func.count()).label("frequencia"),
+                media.label("media"),
+                # Variância amostral (ddof=1) a partir de avg(nota²): n/(n-1) * (E[x²] - E[x]²)
+                ((func.avg(base.c.nota * base.c.nota) - media * media) * n / func.nullif(n - 1, 0)).label("var"),
+            )
+            .group_by(base.c.atleta_id, base.c.categoria)
+            .having(n >= min_notas)
+            .subquery("stats")
+        )
+
+        desvio = func.coalesce(func.sqrt(func.max(stats.c["var"], 0.0)), 0.0)
+        score = stats.c.media * (1 - desvio / 10)
+        ranking = select(
+            stats.c.atleta_id, stats.c.categoria, stats.c.treinos, stats.c.notas, stats.c.frequencia, stats.c.media,
+            desvio.label("desvio"),
+            score.label("score"),
+            func.rank().over(partition_by=stats.c.categoria, order_by=score.desc()).label("pos_categoria"),
+            func.rank().over(order_by=score.desc()).label("pos_geral"),
+            (func.cume_dist(type_=Float).over(partition_by=stats.c.categoria, order_by=score) * 100).label("percentil_categoria"),
+            (func.cume_dist(type_=Float).over(order_by=score) * 100).label("percentil_geral"),
+        ).subquery("ranking")
+
+        colunas = {
+            "atleta_id": np.int64, "atleta": object, "categoria": object, "treinos": np.int64, "notas": np.int64,
+            "frequencia": np.float64, "media": np.float64, "desvio": np.float64, "score": np.float64,
+            "pos_categoria": np.int64, "pos_geral": np.int64, "percentil_categoria": np.float64, "percentil_geral": np.float64,
+        }
+        posicao = ranking.c.pos_categoria if por_categoria else ranking.c.pos_geral
+        ordem = (ranking.c.categoria, ranking.c.pos_categoria) if por_categoria else (ranking.c.pos_geral,)
+        return ler_dataframe(
+            conn,
+            select(*(Atleta.nome if c == "atleta" else ranking.c[c] for c in colunas))
+            .join(Atleta, Atleta.id == ranking.c.atleta_id)
+            .where(posicao <= top_k)
+            .order_by(*ordem, ranking.c.atleta_id),
+            colunas,
+        )
 
-    def get_dataframe_performances(self, categoria: str) -> pd.DataFrame:
-        """Retorna DataFrame pandas para Analytics"""
-        # Join complexo
-        results = self.db.query(
-            Performance.id,
-            Atleta.nome,
-            Treino.data,
-            Performance.nota,
-            Performance.presenca,
-            Performance.flag_atleta
-        ).join(Treino).join(Atleta).filter(Treino.categoria_alvo == categoria).all()
-        
-        if not results:
-            return pd.DataFrame()
-            
-        df = pd.DataFrame(results, columns=['id', 'atleta', 'data', 'nota', 'presenca', 'flag'])
-        df['data'] = pd.to_datetime(df['data'])
-        return df
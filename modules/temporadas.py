@@ -0,0 +1,146 @@
+"""
+Módulo de Temporadas (Arquivo)
+------------------------------
+Particiona treinos e performances por temporada. As consultas dos serviços leem só a janela
+de config.TEMPORADA_ATUAL por padrão (range scan em treinos(categoria_alvo, data)), então o
+custo do caminho quente não cresce com os anos de histórico.
+`fechar_temporada` move temporadas encerradas para um banco de arquivo (ARQUIVO_DB_PATH),
+anexado às conexões como o schema `arquivo`; consultas multi-temporada explícitas leem dele.
+Também é exposto via linha de comando: `python manage.py temporada`.
+"""
+
+from typing import Iterable, List, Union
+
+from sqlalchemy import MetaData, create_engine, delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import ARQUIVO_DB_PATH, TEMPORADA_ATUAL, TEMPORADA_MES_INICIO, janela_temporada
+from modules.database import Base, ARQUIVO_SCHEMA
+from modules.models import Treino, Performance
+
+# Mesmas tabelas no schema anexado. O arquivo tem ids próprios: a cópia usa as chaves
+# naturais (data, categoria) e (treino, atleta), nunca os ids do banco quente.
+_meta_arquivo = MetaData()
+TREINOS_ARQUIVO = Treino.__table__.to_metadata(_meta_arquivo, schema=ARQUIVO_SCHEMA)
+PERFORMANCES_ARQUIVO = Performance.__table__.to_metadata(_meta_arquivo, schema=ARQUIVO_SCHEMA)
+
+
+def normalizar(temporadas: Union[None, int, Iterable[int]]) -> List[int]:
+    """None -> [TEMPORADA_ATUAL]; um ano -> [ano]; vários -> lista ordenada sem repetição"""
+    if temporadas is None:
+        return [TEMPORADA_ATUAL]
+    if isinstance(temporadas, int):
+        return [temporadas]
+    return sorted({int(t) for t in temporadas})
+
+
+def filtro_janela(coluna_data, temporadas: Union[None, int, Iterable[int]] = None):
+    """Condição SQL: data dentro de alguma das temporadas (padrão: a atual)"""
+    return or_(*(coluna_data.between(*janela_temporada(t)) for t in normalizar(temporadas)))
+
+
+def arquivo_anexado(conn) -> bool:
+    """True se o banco de arquivo está anexado nesta conexão"""
+    return any(linha[1] == ARQUIVO_SCHEMA for linha in conn.exec_driver_sql("PRAGMA database_list"))
+
+
+def tabelas_leitura(conn, anteriores: bool) -> list:
+    """
+    Pares (treinos, performances) a consultar: as tabelas quentes e, quando o pedido alcança
+    temporadas anteriores à atual e o arquivo está anexado, as do banco de arquivo.
+    """
+    tabelas = [(Treino.__table__, Performance.__table__)]
+    if anteriores and arquivo_anexado(conn):
+        tabelas.append((TREINOS_ARQUIVO, PERFORMANCES_ARQUIVO))
+    return tabelas
+
+
+def _temporadas_da_tabela(conn, treinos) -> List[int]:
+    """Temporadas com treinos numa tabela, a partir dos meses distintos ("AAAA-MM")"""
+    meses = conn.execute(select(func.substr(treinos.c.data, 1, 7)).distinct()).scalars()
+    temporadas = set()
+    for mes_ref in meses:
+        ano, mes = int(mes_ref[:4]), int(mes_ref[5:7])
+        temporadas.add(ano if mes >= TEMPORADA_MES_INICIO else ano - 1)
+    return sorted(temporadas)
+
+
+def listar_temporadas(conn, arquivo: bool = False) -> List[int]:
+    """Temporadas no banco quente, ou no arquivo com arquivo=True (vazio se não houver arquivo)"""
+    if not arquivo:
+        return _temporadas_da_tabela(conn, Treino.__table__)
+    return _temporadas_da_tabela(conn, TREINOS_ARQUIVO) if arquivo_anexado(conn) else []
+
+
+def preparar_arquivo(caminho: str = ARQUIVO_DB_PATH):
+    """Cria o banco de arquivo com as tabelas treinos/performances (idempotente)"""
+    engine = create_engine(f"sqlite:///{caminho}")
+    try:
+        Base.metadata.create_all(engine, tables=[Treino.__table__, Performance.__table__])
+    finally:
+        engine.dispose()
+
+
+def fechar_temporada(temporada: int, engine=None, caminho: str = ARQUIVO_DB_PATH) -> dict:
+    """
+    Move os treinos e performances de uma temporada encerrada para o banco de arquivo, numa transação:
+    copia com INSERT ... SELECT (upsert pelas chaves naturais, então repetir após uma falha é seguro),
+    apaga do banco quente e reconstrói os agregados. Retorna {"treinos": n, "performances": n}.
+    """
+    from modules.cache import df_cache
+    from modules.database import db_engine
+    from modules.services import AgregadoService
+
+    if temporada >= TEMPORADA_ATUAL:
+        raise ValueError(f"Só temporadas encerradas podem ser arquivadas (atual: {TEMPORADA_ATUAL})")
+    engine = engine or db_engine.engine
+    preparar_arquivo(caminho)
+
+    treinos, performances = Treino.__table__, Performance.__table__
+    na_janela = filtro_janela(treinos.c.data, temporada)
+    colunas_treino = [c.name for c in treinos.c if c.name != "id"]
+    colunas_perf = [c.name for c in performances.c if c.name not in ("id", "treino_id")]
+
+    copia_treinos = sqlite_insert(TREINOS_ARQUIVO).from_select(
+        colunas_treino, select(*(treinos.c[c] for c in colunas_treino)).where(na_janela)
+    )
+    copia_treinos = copia_treinos.on_conflict_do_update(
+        index_elements=["data", "categoria_alvo"],
+        set_={c: copia_treinos.excluded[c] for c in colunas_treino if c not in ("data", "categoria_alvo")},
+    )
+    # treino_id do arquivo: localizado pela chave natural do treino
+    copia_perf = sqlite_insert(PERFORMANCES_ARQUIVO).from_select(
+        ["treino_id", *colunas_perf],
+        select(TREINOS_ARQUIVO.c.id, *(performances.c[c] for c in colunas_perf))
+        .select_from(performances)
+        .join(treinos, performances.c.treino_id == treinos.c.id)
+        .join(TREINOS_ARQUIVO, (TREINOS_ARQUIVO.c.data == treinos.c.data)
+              & (TREINOS_ARQUIVO.c.categoria_alvo == treinos.c.categoria_alvo))
+        .where(na_janela),
+    )
+    copia_perf = copia_perf.on_conflict_do_update(
+        index_elements=["treino_id", "atleta_id"],
+        set_={c: copia_perf.excluded[c] for c in colunas_perf if c != "atleta_id"},
+    )
+
+    with engine.connect() as conn:
+        # ATTACH não pode rodar dentro de uma transação: anexa antes de abrir a da cópia
+        if not arquivo_anexado(conn):
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARQUIVO_SCHEMA}", (caminho,))
+        conn.commit()
+        with conn.begin():
+            n_treinos = conn.execute(copia_treinos).rowcount
+            n_perf = conn.execute(copia_perf).rowcount
+            conn.execute(delete(performances).where(
+                performances.c.treino_id.in_(select(treinos.c.id).where(na_janela))
+            ))
+            conn.execute(delete(treinos).where(na_janela))
+
+    db = Session(bind=engine)
+    try:
+        AgregadoService(db).reconstruir()
+    finally:
+        db.close()
+    df_cache.invalidar()
+    return {"treinos": n_treinos, "performances": n_perf}
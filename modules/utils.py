@@ -1,13 +1,20 @@
 """
 Módulo de Utilitários (Utils)
 -----------------------------
-Funções auxiliares para geração de dados falsos (Populate).
+Funções auxiliares para geração de dados falsos (Populate) e dados sintéticos em volume
+para testes de carga.
 """
 import random
 from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
 from modules.database import db_engine
-from modules.services import AtletaService, TreinoService
-from config import CATEGORY_RULES, VALID_ATHLETE_FLAGS, TRAINING_TYPES, VALID_TRAINING_FLAGS
+from modules.models import Atleta, Treino, Performance
+from modules.services import AtletaService, TreinoService, AgregadoService
+from modules.cache import df_cache
+from config import (CATEGORY_RULES, CURRENT_YEAR, VALID_ATHLETE_FLAGS, TRAINING_TYPES, VALID_TRAINING_FLAGS,
+                    janela_temporada, tipos_para_mask)
 
 def populate_dummy_data():
     """Gera dados massivos para testes visuais"""
@@ -16,8 +23,8 @@ def populate_dummy_data():
     treino_service = TreinoService(db)
 
     # 1. Limpar Banco (Opcional, mas bom para testes)
-    # Por segurança, apenas adiciona se estiver vazio
-    if len(atleta_service.listar_atletas()) > 0:
+    # Por segurança, apenas adiciona se estiver vazio (EXISTS: não carrega os atletas)
+    if db.execute(select(select(Atleta.id).exists())).scalar():
         return # Já populado
 
     print("Gerando dados fictícios...")
@@ -72,3 +79,140 @@ def populate_dummy_data():
         current += timedelta(days=1)
 
     print("Dados gerados com sucesso!")
+
+
+# --- GERADOR SINTÉTICO (LOAD TEST) ---
+
+PRIMEIROS_NOMES = [
+    "Gabriel", "Lucas", "Matheus", "Enzo", "Pedro", "João", "Felipe", "Rafael", "Bruno", "Gustavo",
+    "Thiago", "Nicolas", "Arthur", "Davi", "Bernardo", "Heitor", "Miguel", "Samuel", "Vitor", "Caio"
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Pereira", "Rocha", "Souza", "Costa", "Lima", "Alves", "Dias",
+    "Mello", "Ferreira", "Ribeiro", "Carvalho", "Gomes", "Martins", "Araújo", "Barbosa", "Teixeira", "Moura"
+]
+POSICOES = ["Goleiro", "Zagueiro", "Lateral", "Volante", "Meia", "Atacante"]
+
+
+def _proximo_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def gerar_dados_sinteticos(atletas_por_categoria: int = 25, categorias=None, temporadas=None,
+                           seed: int = 42, lote: int = 50_000, engine=None, progresso=None) -> dict:
+    """
+    Gera dados sintéticos em volume (atletas, treinos de segunda a sábado e performances
+    de todo o elenco) com inserts em lote (executemany na conexão Core), numa única transação.
+    Os inserts respeitam os índices únicos: dias em que a categoria já tem treino são pulados
+    (o treino existente e suas performances ficam intactos).
+    Parâmetros:
+        atletas_por_categoria -> tamanho do elenco de cada categoria
+        categorias            -> lista de categorias (padrão: todas de CATEGORY_RULES)
+        temporadas            -> temporadas (ano de início; janela de config.janela_temporada, padrão: [CURRENT_YEAR])
+        seed                  -> semente para resultados reprodutíveis
+        lote                  -> linhas por executemany
+        engine                -> engine alvo (padrão: db_engine.engine)
+        progresso             -> callback progresso(fracao, mensagem) chamado por temporada
+    Retorna {"atletas": n, "treinos": n, "performances": n}.
+    """
+    engine = engine or db_engine.engine
+    categorias = list(categorias or CATEGORY_RULES.keys())
+    temporadas = list(temporadas or [CURRENT_YEAR])
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+
+    def inserir(conn, tabela, colunas, linhas, conflito=None):
+        # executemany direto no driver com tuplas: evita o custo de montar parâmetros por linha.
+        # `conflito`: colunas de um índice único -> linhas já existentes são ignoradas (ON CONFLICT DO NOTHING)
+        sql = f"INSERT INTO {tabela.name} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+        if conflito:
+            sql += f" ON CONFLICT ({', '.join(conflito)}) DO NOTHING"
+        for i in range(0, len(linhas), lote):
+            conn.exec_driver_sql(sql, linhas[i:i + lote])
+
+    contagem = {"atletas": 0, "treinos": 0, "performances": 0}
+    with engine.begin() as conn:
+        atleta_id = _proximo_id(conn, Atleta)
+        treino_id = _proximo_id(conn, Treino)
+        perf_id = _proximo_id(conn, Performance)
+
+        # 1. Atletas (ano de nascimento sorteado entre os anos da categoria)
+        elenco = {}
+        atletas, nomes = [], set()
+        for cat in categorias:
+            elenco[cat] = []
+            for _ in range(atletas_por_categoria):
+                nome = f"{rnd.choice(PRIMEIROS_NOMES)} {rnd.choice(SOBRENOMES)}"
+                while nome in nomes:
+                    nome = f"{rnd.choice(PRIMEIROS_NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+                    if nome in nomes:
+                        nome = f"{nome} {len(nomes)}"
+                nomes.add(nome)
+                nasc = date(rnd.choice(CATEGORY_RULES[cat]), rnd.randint(1, 12), rnd.randint(1, 28))
+                atletas.append((
+                    atleta_id, nome, nasc.isoformat(), nasc.year, rnd.choice(POSICOES), "ATIVO", "(11) 9999-9999"
+                ))
+                elenco[cat].append(atleta_id)
+                atleta_id += 1
+        inserir(conn, Atleta.__table__,
+                ("id", "nome", "data_nascimento", "ano_nascimento", "posicao", "status", "contato_pais"), atletas)
+        contagem["atletas"] = len(atletas)
+
+        # 2. Treinos (segunda a sábado) e 3. Performances, temporada a temporada
+        for i, ano in enumerate(temporadas):
+            if progresso:
+                progresso(i / (len(temporadas) + 1), f"Temporada {ano}")
+            # Janela da temporada (começa em TEMPORADA_MES_INICIO), a mesma de filtro_janela/arquivamento
+            inicio, fim = janela_temporada(ano)
+            dias = [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+            dias = [d for d in dias if d.weekday() != 6] # Ignora Domingos
+            treinos, ids_por_cat = [], {}
+            for cat in categorias:
+                ids_por_cat[cat] = np.arange(treino_id, treino_id + len(dias))
+                treino_id += len(dias)
+                for tid, d in zip(ids_por_cat[cat], dias):
+                    treinos.append((
+                        int(tid), d.isoformat(), cat, rnd.choice(VALID_TRAINING_FLAGS),
+                        tipos_para_mask(rnd.sample(TRAINING_TYPES, rnd.randint(1, 3)))
+                    ))
+            # Dias que já têm treino da categoria ficam como estão (índice único data/categoria);
+            # só os treinos efetivamente inseridos recebem performances
+            inserir(conn, Treino.__table__, ("id", "data", "categoria_alvo", "flag_geral", "tipos_mask"), treinos,
+                    conflito=("data", "categoria_alvo"))
+            inseridos = np.fromiter(conn.execute(
+                select(Treino.id).where(Treino.id.between(treinos[0][0], treinos[-1][0]))
+            ).scalars(), dtype=np.int64) if treinos else np.array([], dtype=np.int64)
+
+            perfs = []
+            for cat in categorias:
+                ids_treino = ids_por_cat[cat][np.isin(ids_por_cat[cat], inseridos)]
+                # Grade treino x atleta sorteada de uma vez: 5% Falta, 3% DM, resto nota 1-3 (10/50/40)
+                atl = np.asarray(elenco[cat])
+                n = len(ids_treino) * len(atl)
+                if n == 0:
+                    continue
+                dado = rng.random(n)
+                notas = rng.choice([1, 2, 3], size=n, p=[0.1, 0.5, 0.4])
+                falta, dm = dado < 0.05, (dado >= 0.05) & (dado < 0.08)
+                presenca = np.where(falta, "F", np.where(dm, "J", "P"))
+                flag = np.where(falta, "F", np.where(dm, "DM", notas.astype(str)))
+                nota = np.where(falta | dm, None, notas).tolist()
+                t_col = np.repeat(ids_treino, len(atl)).tolist()
+                a_col = np.tile(atl, len(ids_treino)).tolist()
+                perfs.extend(zip(range(perf_id, perf_id + n), t_col, a_col, presenca.tolist(), nota, flag.tolist()))
+                perf_id += n
+            inserir(conn, Performance.__table__, ("id", "treino_id", "atleta_id", "presenca", "nota", "flag_atleta"), perfs,
+                    conflito=("treino_id", "atleta_id"))
+            contagem["treinos"] += len(inseridos)
+            contagem["performances"] += len(perfs)
+
+    # Agregados materializados e cache de analytics refletem a carga
+    if progresso:
+        progresso(len(temporadas) / (len(temporadas) + 1), "Agregados")
+    db = Session(bind=engine)
+    try:
+        AgregadoService(db).reconstruir()
+    finally:
+        db.close()
+    df_cache.invalidar()
+    return contagem
@@ -0,0 +1,76 @@
+"""
+Backup completo após fechar uma temporada: as linhas movidas para o banco de arquivo
+continuam no export (abas *_Arquivo), nada some do backup.
+"""
+
+import io
+
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+from modules.database import Base, DatabaseEngine
+from modules.export import exportar_excel
+from modules.migrations import aplicar_migracoes
+from modules.models import Treino, Performance
+from modules.temporadas import fechar_temporada
+from modules.utils import gerar_dados_sinteticos
+
+
+def _engine(tmp_path):
+    """Banco isolado com o mesmo attach do arquivo (no checkout) que o engine do app"""
+    arquivo = str(tmp_path / "arquivo.db")
+    engine = create_engine(f"sqlite:///{tmp_path / 'g5.db'}")
+    event.listen(engine, "checkout",
+                 lambda dbapi_conn, registro, _: DatabaseEngine._anexar_arquivo(dbapi_conn, registro, arquivo))
+    Base.metadata.create_all(engine)
+    aplicar_migracoes(engine)
+    return engine, arquivo
+
+
+def _contar(engine) -> dict:
+    with engine.connect() as conn:
+        return {
+            "Treinos": conn.execute(select(func.count()).select_from(Treino.__table__)).scalar(),
+            "Performances": conn.execute(select(func.count()).select_from(Performance.__table__)).scalar(),
+        }
+
+
+def _linhas_por_aba(destino) -> dict:
+    wb = load_workbook(destino, read_only=True)
+    try:
+        return {ws.title: sum(1 for _ in ws.iter_rows()) - 1 for ws in wb.worksheets} # - cabeçalho
+    finally:
+        wb.close()
+
+
+def test_export_inclui_temporada_arquivada(tmp_path):
+    engine, arquivo = _engine(tmp_path)
+    gerar_dados_sinteticos(atletas_por_categoria=3, categorias=["Sub 14"], temporadas=[2024, 2025], engine=engine)
+    antes = _contar(engine)
+
+    movidos = fechar_temporada(2024, engine=engine, caminho=arquivo)
+    assert movidos["treinos"] > 0 and movidos["performances"] > 0
+
+    destino = io.BytesIO()
+    with Session(bind=engine) as db:
+        contagem = exportar_excel(db, destino)
+    destino.seek(0)
+    abas = _linhas_por_aba(destino)
+
+    assert abas == contagem
+    assert abas["Treinos"] == antes["Treinos"] - movidos["treinos"]
+    assert abas["Treinos_Arquivo"] == movidos["treinos"]
+    assert abas["Performances"] + abas["Performances_Arquivo"] == antes["Performances"]
+    engine.dispose()
+
+
+def test_export_sem_arquivo(tmp_path):
+    engine, _ = _engine(tmp_path)
+    gerar_dados_sinteticos(atletas_por_categoria=2, categorias=["Sub 14"], temporadas=[2025], engine=engine)
+    destino = io.BytesIO()
+    with Session(bind=engine) as db:
+        contagem = exportar_excel(db, destino)
+    assert set(contagem) == {"Atletas", "Treinos", "Performances"}
+    assert {k: contagem[k] for k in ("Treinos", "Performances")} == _contar(engine)
+    engine.dispose()